@@ -0,0 +1,30 @@
+"""Running external commands."""
+import asyncio
+import subprocess
+
+
+async def run_command(*cmd: str, cwd: str | None = None) -> str:
+    """
+    Run the given command in a subprocess and return the stdout as plain text.
+
+    :param cmd: The command to run.
+    :param cwd: The working directory to run the command in.
+    :return: The stdout result
+    """
+    process = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        cwd=cwd,
+    )
+
+    stdout, stderr = await process.communicate()
+
+    if process.returncode != 0:
+        raise RuntimeError(
+            f"Command '{cmd}' failed with exit code '{process.returncode}':\n"
+            f"[stdout]: '{stdout.decode()}'\n"
+            f"[stderr]: '{stderr.decode()}'"
+        )
+
+    return stdout.decode()
@@ -7,6 +7,7 @@ from typing import Literal
 import pytest
 import stamina
 from dirty_equals import IsList
+from polyfactory.pytest_plugin import register_fixture
 from sqlalchemy.ext.asyncio import (
     AsyncConnection,
     AsyncEngine,
@@ -20,6 +21,10 @@ from app.factories import DependencyCreateDataFactory
 from app.source_graph.factories import SourceGraphRepoDataFactory
 from app.source_graph.models import SourceGraphRepoData
 
+#: The fixtures of the factories, named after them.
+dependency_create_data_factory_fixture = register_fixture(DependencyCreateDataFactory)
+source_graph_repo_data_factory_fixture = register_fixture(SourceGraphRepoDataFactory)
+
 
 @pytest.fixture(autouse=True, scope="session")
 def anyio_backend() -> Literal["asyncio"]:
@@ -12,13 +12,35 @@ The module defines the following models:
 - `Repo`: A repository that is being tracked.
 - `Dependency`: A dependency of a repository.
 - `RepoDependency`: A relationship between a repository and a dependency.
+- `ScrapeCheckpoint`: The progress of a scraping, to resume it from.
 
 The database is accessed asynchronously using SQLAlchemy's async API.
+
+The engines are tuned for the workload with the engine profiles:
+
+- ``default``: the SQLite defaults.
+- ``bulk-write``: for the scraping; the write-ahead log, the relaxed
+  synchronization, a large page cache and waiting on a locked database.
+- ``read-only``: for the indexing; an immutable, memory-mapped snapshot
+  of the database. Nothing may write to the database while it is open.
 """
+import functools
+from collections.abc import Mapping, Sequence
+from enum import StrEnum
 from pathlib import PurePath
 from typing import Final
 
-from sqlalchemy import BigInteger, ForeignKey, MetaData, String, Text, UniqueConstraint
+from sqlalchemy import (
+    BigInteger,
+    Boolean,
+    ForeignKey,
+    MetaData,
+    String,
+    Text,
+    UniqueConstraint,
+    event,
+)
+from sqlalchemy.engine.interfaces import DBAPIConnection
 from sqlalchemy.ext.asyncio import (
     AsyncAttrs,
     AsyncEngine,
@@ -32,6 +54,7 @@ from sqlalchemy.orm import (
     mapped_column,
     relationship,
 )
+from sqlalchemy.pool import ConnectionPoolEntry
 
 from app.types import RevisionHash, SourceGraphRepoId
 
@@ -39,10 +62,113 @@ _DB_PATH: Final[PurePath] = PurePath(__file__).parent.parent / "db.sqlite3"
 
 _SQLALCHEMY_DATABASE_URL: Final[str] = f"sqlite+aiosqlite:///{_DB_PATH}"
 
-engine: Final[AsyncEngine] = create_async_engine(_SQLALCHEMY_DATABASE_URL)
 
-async_session_maker: Final[async_sessionmaker[AsyncSession]] = async_sessionmaker(
-    engine, expire_on_commit=False, autoflush=False, autocommit=False
+class EngineProfile(StrEnum):
+    """The profile of the database engine, tuned for a workload."""
+
+    DEFAULT = "default"
+    BULK_WRITE = "bulk-write"
+    READ_ONLY = "read-only"
+
+
+#: The ``PRAGMA`` statements run on each new connection, per engine profile.
+_PROFILE_PRAGMAS: Final[Mapping[EngineProfile, Sequence[str]]] = {
+    EngineProfile.DEFAULT: (),
+    EngineProfile.BULK_WRITE: (
+        # The readers do not block the writer, and a commit does not
+        # rewrite the database file
+        "PRAGMA journal_mode=WAL",
+        # Only sync at the checkpoints; a commit can be lost on a power loss,
+        # but the database cannot be corrupted
+        "PRAGMA synchronous=NORMAL",
+        # 256 MiB
+        "PRAGMA cache_size=-262144",
+        "PRAGMA temp_store=MEMORY",
+        # Wait for the lock instead of failing with "database is locked"
+        "PRAGMA busy_timeout=30000",
+    ),
+    EngineProfile.READ_ONLY: (
+        "PRAGMA query_only=ON",
+        # 1 GiB, more than the whole database
+        "PRAGMA mmap_size=1073741824",
+        # 64 MiB
+        "PRAGMA cache_size=-65536",
+        "PRAGMA temp_store=MEMORY",
+    ),
+}
+
+
+def _database_url(profile: EngineProfile, db_path: PurePath) -> str:
+    """
+    Return the database URL for the engine profile.
+
+    :param profile: The engine profile.
+    :param db_path: The path of the database file.
+    :return: The database URL.
+    """
+    if profile == EngineProfile.READ_ONLY:
+        # An immutable database is read without any locking
+        # and without checking for the changes
+        return f"sqlite+aiosqlite:///file:{db_path}?mode=ro&immutable=1&uri=true"
+    return f"sqlite+aiosqlite:///{db_path}"
+
+
+def create_engine(
+    profile: EngineProfile = EngineProfile.DEFAULT, db_path: PurePath = _DB_PATH
+) -> AsyncEngine:
+    """
+    Create a database engine with the given profile.
+
+    :param profile: The engine profile.
+    :param db_path: The path of the database file.
+    :return: The database engine.
+    """
+    profile_engine = create_async_engine(_database_url(profile, db_path))
+    pragmas = _PROFILE_PRAGMAS[profile]
+
+    @event.listens_for(profile_engine.sync_engine, "connect")
+    def _set_pragmas(
+        dbapi_connection: DBAPIConnection, connection_record: ConnectionPoolEntry
+    ) -> None:
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+    return profile_engine
+
+
+def create_session_maker(
+    profile_engine: AsyncEngine,
+) -> async_sessionmaker[AsyncSession]:
+    """
+    Create a session maker bound to the engine.
+
+    :param profile_engine: The database engine.
+    :return: The session maker.
+    """
+    return async_sessionmaker(
+        profile_engine, expire_on_commit=False, autoflush=False, autocommit=False
+    )
+
+
+@functools.cache
+def get_session_maker(profile: EngineProfile) -> async_sessionmaker[AsyncSession]:
+    """
+    Return the session maker for the engine profile, creating it once.
+
+    :param profile: The engine profile.
+    :return: The session maker.
+    """
+    if profile == EngineProfile.DEFAULT:
+        return async_session_maker
+    return create_session_maker(create_engine(profile))
+
+
+engine: Final[AsyncEngine] = create_engine()
+
+async_session_maker: Final[async_sessionmaker[AsyncSession]] = create_session_maker(
+    engine
 )
 
 metadata = MetaData(
@@ -100,3 +226,14 @@ class RepoDependency(Base):
     dependency_id: Mapped[int] = mapped_column(
         ForeignKey(Dependency.id, ondelete="CASCADE"), primary_key=True
     )
+
+
+class ScrapeCheckpoint(Base):
+    """The progress of a scraping of a stream, to resume it from."""
+
+    __tablename__ = "scrape_checkpoint"
+    name: Mapped[str] = mapped_column(String(255), primary_key=True)
+    last_event_id: Mapped[str | None] = mapped_column(String(255), nullable=True)
+    events_seen: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    repos_upserted: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    completed: Mapped[bool] = mapped_column(Boolean, nullable=False)
@@ -1,149 +1,116 @@
 """Dependencies parsing."""
 import asyncio
-import subprocess
-from collections.abc import Sequence
+from concurrent.futures import Executor
 
-import aiofiles.tempfile
-import stamina
 from loguru import logger
 
 from app.database import Repo
+from app.git_mirror import Checkout, list_tree_blobs
+from app.import_cache import BlobImportsCache
+from app.imports import (
+    extract_imports_from_files,
+    extract_third_party_imports,
+    filter_third_party_imports,
+    is_python_source_path,
+)
+from app.log import repo_log
+from app.metrics import metrics
 from app.models import DependencyCreateData
-from app.types import RevisionHash
 
 
-async def run_command(*cmd: str, cwd: str | None = None) -> str:
+async def _extract_third_party_imports_with_cache(
+    checkout: Checkout,
+    executor: Executor | None,
+    imports_cache: BlobImportsCache,
+) -> list[str]:
     """
-    Run the given command in a subprocess and return the stdout as plain text.
+    Extract the third-party imports, parsing only the files missing from the cache.
 
-    :param cmd: The command to run.
-    :param cwd: The working directory to run the command in.
-    :return: The stdout result
+    :param checkout: The checkout of a repository.
+    :param executor: The executor to parse the files in.
+    :param imports_cache: The cache of the imports per blob.
+    :return: The sorted names of the third-party dependencies.
     """
-    process = await asyncio.create_subprocess_exec(
-        *cmd,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        cwd=cwd,
-    )
-
-    stdout, stderr = await process.communicate()
-
-    if process.returncode != 0:
-        raise RuntimeError(
-            f"Command '{cmd}' failed with exit code '{process.returncode}':\n"
-            f"[stdout]: '{stdout.decode()}'\n"
-            f"[stderr]: '{stderr.decode()}'"
+    blob_shas = {
+        path: blob_sha
+        for path, blob_sha in (
+            await list_tree_blobs(checkout.directory, checkout.revision)
+        ).items()
+        if is_python_source_path(path)
+    }
+    # The cache queries block, so they are kept off the event loop
+    with metrics.span("imports_cache_get"):
+        cached_imports = await asyncio.to_thread(
+            imports_cache.get_many, blob_shas.values()
         )
-
-    return stdout.decode()
+    with metrics.span("extract_imports"):
+        parsed_imports = await extract_imports_from_files(
+            checkout.directory,
+            [
+                path
+                for path, blob_sha in blob_shas.items()
+                if blob_sha not in cached_imports
+            ],
+            executor,
+        )
+    metrics.count("files_cached", len(cached_imports))
+    metrics.count("files_parsed", len(parsed_imports))
+    with metrics.span("imports_cache_put"):
+        await asyncio.to_thread(
+            imports_cache.put_many,
+            {blob_shas[path]: imports for path, imports in parsed_imports.items()},
+        )
+    return filter_third_party_imports(
+        {
+            path: cached_imports[blob_sha]
+            if blob_sha in cached_imports
+            else parsed_imports[path]
+            for path, blob_sha in blob_shas.items()
+        }
+    )
 
 
-async def acquire_dependencies_data_for_repository(
+async def parse_dependencies_data_for_checkout(
     repo: Repo,
-) -> tuple[RevisionHash, list[DependencyCreateData]]:
+    checkout: Checkout,
+    executor: Executor | None = None,
+    imports_cache: BlobImportsCache | None = None,
+) -> list[DependencyCreateData]:
     """
-    Acquire dependencies for the given repository.
+    Parse the dependencies of the checked out repository.
 
-    The function will use the "third-party-imports" tool to
-    parse the third-party dependencies of the repository.
+    The third-party dependencies are the imports of the repository sources,
+    parsed in-process with the :mod:`app.imports` extractor. The files
+    are parsed in parallel on the given executor, e.g. a process pool.
+    With an imports cache, only the files never seen before are parsed.
 
-    Since this tool has been written in Rust and is basically
-    a CLI tool, the parsing will happen is a subprocess.
-
-    :param repo: A repository for which to return the dependencies.
+    :param repo: The repository the checkout belongs to.
+    :param checkout: The checkout of the repository.
+    :param executor: The executor to parse the files in.
+    :param imports_cache: The cache of the imports per blob.
     :return: The dependencies data required to create the dependencies in the DB.
     """
-    logger.info(
-        "Acquiring the dependencies data for the repo with id {repo_id}.",
-        repo_id=repo.id,
-        enqueue=True,
-    )
-    async with aiofiles.tempfile.TemporaryDirectory() as directory:
-        # Clone the repository
-        logger.info(
-            "Cloning the repo with id {repo_id} into the directory {directory}.",
+    if repo_log.detailed():
+        logger.debug(
+            "Parsing the dependencies for the repo with id {repo_id}.",
             repo_id=repo.id,
-            directory=directory,
             enqueue=True,
         )
-        await run_command(
-            "git",
-            "clone",
-            "--depth",
-            "1",
-            repo.url,
-            directory,
+    with metrics.span("third_party_imports"):
+        dependencies = (
+            await extract_third_party_imports(checkout.directory, executor)
+            if imports_cache is None
+            else await _extract_third_party_imports_with_cache(
+                checkout, executor, imports_cache
+            )
         )
-
-        # Get the latest commit hash
-        logger.info(
-            "Getting the latest commit hash for the repo with id {repo_id}.",
+    metrics.count("dependencies_parsed", len(dependencies))
+    repo_log.note(dependencies=len(dependencies))
+    if repo_log.detailed():
+        logger.debug(
+            "Found {count} dependencies for the repo with id {repo_id}.",
+            count=len(dependencies),
             repo_id=repo.id,
             enqueue=True,
         )
-        revision: str = await run_command(
-            "git",
-            "rev-parse",
-            "HEAD",
-            cwd=directory,
-        )
-
-        if repo.last_checked_revision == revision:
-            # Assume there are no new dependencies to return
-            # since all the repo dependencies have already
-            # been parsed.
-            logger.info(
-                "The repo with id {repo_id} has already been updated.",
-                repo_id=repo.id,
-                enqueue=True,
-            )
-            return RevisionHash(revision), []
-
-        # Parse the dependencies
-        async for attempt in stamina.retry_context(on=RuntimeError, attempts=3):
-            with attempt:
-                logger.info(
-                    "Parsing the dependencies for the repo with id {repo_id}.",
-                    repo_id=repo.id,
-                    enqueue=True,
-                )
-                dependencies: str = await run_command(
-                    "third-party-imports",
-                    directory,
-                )
-        if dependencies:
-            logger.info(
-                "Successfully parsed the dependencies for the repo with id {repo_id}.",
-                repo_id=repo.id,
-                enqueue=True,
-            )
-            # Split the dependencies by new line
-            dependencies_list: Sequence[str] = dependencies.split("\n")
-            # Drop the first two lines (the info lines)
-            dependencies_list = (
-                dependencies_list[2:] if len(dependencies_list) > 2 else []
-            )
-            logger.info(
-                "Found {count} dependencies for the repo with id {repo_id}.",
-                count=len(dependencies_list),
-                repo_id=repo.id,
-                enqueue=True,
-            )
-        else:
-            logger.info(
-                "No dependencies found for the repo with id {repo_id}.",
-                repo_id=repo.id,
-                enqueue=True,
-            )
-            dependencies_list = []
-        return (
-            RevisionHash(revision),
-            [
-                DependencyCreateData(
-                    name=dependency.strip(),
-                )
-                for dependency in dependencies_list
-                if dependency.strip()
-            ],
-        )
+    return [DependencyCreateData(name=dependency) for dependency in dependencies]
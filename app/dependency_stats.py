@@ -0,0 +1,125 @@
+"""
+The popularity and the co-occurrence statistics of the dependencies.
+
+The repos and their dependencies are loaded straight from ``repo_dependency``
+into a sparse repo × dependency matrix ``M``, with a one for each repo
+using a dependency. Then:
+
+- the number of the repos using each dependency is the column sums of ``M``,
+- the star-weighted number is ``Mᵀ · stars``,
+- the number of the repos using each pair of the dependencies together
+  is the off-diagonal of the co-occurrence matrix ``Mᵀ · M``.
+
+The top co-occurring dependencies are selected by sorting all the entries
+of the co-occurrence matrix at once, so the work is vectorised end-to-end.
+"""
+from collections.abc import Mapping
+from typing import Final
+
+import numpy as np
+import numpy.typing as npt
+import scipy.sparse
+
+from app.models import DependencyStats, DependencyStatsIndex
+
+#: The default maximum number of the co-occurring dependencies per dependency.
+DEFAULT_TOP_K: Final[int] = 10
+
+
+def _top_co_occurrences(
+    matrix: scipy.sparse.csr_array, top_k: int
+) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.int64], npt.NDArray[np.int64]]:
+    """
+    Select the top co-occurring dependencies of each dependency.
+
+    :param matrix: The repo × dependency matrix.
+    :param top_k: The maximum number of the co-occurring dependencies.
+    :return: The boundaries of the rows per dependency, and the ids of the
+        co-occurring dependencies with their counts, by row.
+    """
+    dependencies = matrix.shape[1]
+    co_occurrences = (matrix.T @ matrix).tocsr()
+    co_occurrences.sort_indices()
+    rows = np.repeat(
+        np.arange(dependencies, dtype=np.int64), np.diff(co_occurrences.indptr)
+    )
+    columns = co_occurrences.indices.astype(np.int64)
+    counts = co_occurrences.data.astype(np.int64)
+    off_diagonal = rows != columns
+    rows, columns, counts = (
+        rows[off_diagonal],
+        columns[off_diagonal],
+        counts[off_diagonal],
+    )
+    # Within each row, the most co-occurring first; the rows are already
+    # in order, and the stable sort keeps the same counts ordered by the id
+    max_count = int(counts.max(initial=0))
+    order = np.argsort(rows * (max_count + 1) + (max_count - counts), kind="stable")
+    columns, counts = columns[order], counts[order]
+    lengths = np.bincount(rows, minlength=dependencies)
+    ends = np.cumsum(lengths)
+    ranks = np.arange(len(rows)) - np.repeat(ends - lengths, lengths)
+    top = ranks < top_k
+    bounds = np.zeros(dependencies + 1, dtype=np.int64)
+    bounds[1:] = np.cumsum(np.minimum(lengths, top_k))
+    return bounds, columns[top], counts[top]
+
+
+def compute_dependency_stats(
+    edges: npt.NDArray[np.int64],
+    repos: npt.NDArray[np.int64],
+    dependencies: Mapping[int, str],
+    top_k: int = DEFAULT_TOP_K,
+) -> DependencyStatsIndex:
+    """
+    Compute the statistics of the dependencies.
+
+    :param edges: The ids of the repos and of their dependencies, in two columns.
+    :param repos: The ids of the repos and their stars, in two columns.
+    :param dependencies: The names of the dependencies to compute
+        the statistics of per their ids; the other ones are ignored.
+    :param top_k: The maximum number of the co-occurring dependencies
+        per dependency.
+    :return: The statistics of the dependencies.
+    """
+    repo_ids = repos[:, 0]
+    repo_order = np.argsort(repo_ids)
+    repo_ids, stars = repo_ids[repo_order], repos[repo_order, 1]
+    dependency_ids = np.array(sorted(dependencies), dtype=np.int64)
+    # Map the ids to the dense indexes of the rows and the columns
+    rows = np.searchsorted(repo_ids, edges[:, 0])
+    columns = np.searchsorted(dependency_ids, edges[:, 1])
+    known = (rows < len(repo_ids)) & (columns < len(dependency_ids))
+    known[known] = (repo_ids[rows[known]] == edges[known, 0]) & (
+        dependency_ids[columns[known]] == edges[known, 1]
+    )
+    matrix = scipy.sparse.csr_array(
+        (
+            np.ones(np.count_nonzero(known), dtype=np.int64),
+            (rows[known], columns[known]),
+        ),
+        shape=(len(repo_ids), len(dependency_ids)),
+    )
+    repo_counts = np.asarray(matrix.sum(axis=0)).ravel().tolist()
+    star_counts = (matrix.T @ stars).tolist()
+    bounds, co_columns, co_counts = _top_co_occurrences(matrix, top_k)
+    bounds_list = bounds.tolist()
+    co_ids = dependency_ids[co_columns].tolist()
+    co_counts_list = co_counts.tolist()
+    stats = [
+        DependencyStats(
+            id=dependency_id,
+            name=dependencies[dependency_id],
+            repo_count=repo_counts[column],
+            star_count=star_counts[column],
+            co_occurrence_ids=co_ids[bounds_list[column] : bounds_list[column + 1]],
+            co_occurrence_counts=co_counts_list[
+                bounds_list[column] : bounds_list[column + 1]
+            ],
+        )
+        for column, dependency_id in enumerate(dependency_ids.tolist())
+    ]
+    stats.sort(key=lambda dependency: (-dependency.repo_count, dependency.id))
+    return DependencyStatsIndex(
+        repo_count=len(repo_ids), top_k=top_k, dependencies=stats
+    )
@@ -0,0 +1,444 @@
+"""
+A persistent on-disk cache of bare git mirrors.
+
+Each repository gets a bare mirror under the cache root, keyed by a hash of
+its URL. The first checkout of a repository creates the mirror with a shallow
+fetch of the remote ``HEAD``, later checkouts only fetch what has changed
+since. The fetched revision is checked out into a temporary worktree, which
+is removed as soon as the caller is done with it.
+
+In the sparse clone mode the mirror is a partial clone without any blobs,
+and only the Python sources (and, optionally, the dependency manifests) are
+checked out, so the rest of the blobs are never downloaded. The mode falls
+back to a full shallow checkout when the sparse one fails.
+
+The cache is bounded in size: after each checkout the least recently used
+mirrors are evicted until the whole cache fits into the configured limit.
+The evictions and the size updates are serialized, so the concurrent
+checkouts never evict the same mirror twice. The checkouts of the same
+mirror are serialized as well, so their fetches never race for its refs.
+"""
+import asyncio
+import contextlib
+import hashlib
+import os
+import shutil
+import stat
+from collections import Counter
+from collections.abc import AsyncGenerator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from enum import StrEnum
+from pathlib import Path, PurePath
+from typing import Final, Self
+
+import aiofiles.tempfile
+from loguru import logger
+
+from app.commands import run_command
+from app.log import repo_log
+from app.metrics import metrics
+from app.types import RevisionHash
+
+#: The default directory to store the mirrors in.
+DEFAULT_CACHE_ROOT: Final[Path] = Path(__file__).parent.parent / ".cache" / "mirrors"
+#: The default upper bound of the cache size in bytes.
+DEFAULT_CACHE_MAX_SIZE: Final[int] = 10 * 1024**3
+
+#: The ref the fetched remote ``HEAD`` is stored under in a mirror.
+_MIRROR_REF: Final[str] = "refs/heads/mirrored-head"
+#: The name of the remote of a mirror.
+_MIRROR_REMOTE: Final[str] = "origin"
+
+#: The patterns of the files checked out in the sparse clone mode.
+SPARSE_CHECKOUT_PATTERNS: Final[tuple[str, ...]] = ("*.py",)
+#: The patterns of the dependency manifests optionally checked out as well.
+MANIFEST_PATTERNS: Final[tuple[str, ...]] = ("pyproject.toml", "requirements*.txt")
+
+
+class CloneMode(StrEnum):
+    """The way the repositories are fetched and checked out."""
+
+    #: Fetch and check out all the files.
+    FULL = "full"
+    #: Fetch the blobs lazily and check out only the selected files.
+    SPARSE = "sparse"
+
+
+async def resolve_remote_head(url: str) -> RevisionHash:
+    """
+    Resolve the revision of the remote ``HEAD`` without cloning the repository.
+
+    :param url: The repository URL.
+    :return: The revision the remote ``HEAD`` points to.
+    """
+    with metrics.span("git_ls_remote"):
+        output = await run_command("git", "ls-remote", url, "HEAD")
+    revision, _, _ = output.partition("\t")
+    if not revision.strip():
+        raise RuntimeError(f"The remote '{url}' does not advertise a HEAD.")
+    return RevisionHash(revision.strip())
+
+
+async def list_tree_blobs(directory: Path, revision: str) -> dict[PurePath, str]:
+    """
+    List the blobs of the revision tree without reading them.
+
+    :param directory: A worktree or a repository directory.
+    :param revision: The revision to list the tree of.
+    :return: The mapping of the file paths to the blob SHAs.
+    """
+    with metrics.span("git_ls_tree"):
+        output = await run_command(
+            "git", "ls-tree", "-r", "-z", "--full-tree", revision, cwd=str(directory)
+        )
+    blobs: dict[PurePath, str] = {}
+    for entry in output.split("\0"):
+        info, _, path = entry.partition("\t")
+        _, object_type, object_sha = (info.split(" ") + ["", "", ""])[:3]
+        if object_type == "blob":
+            blobs[PurePath(path)] = object_sha
+    return blobs
+
+
+def _directory_size(path: Path) -> int:
+    """
+    Calculate the total size of the files in the directory.
+
+    :param path: The directory.
+    :return: The size in bytes.
+    """
+    size = 0
+    # The files removed by a concurrent checkout while walking are skipped
+    for directory, _, file_names in os.walk(path):
+        for file_name in file_names:
+            with contextlib.suppress(FileNotFoundError):
+                file_stat = (Path(directory) / file_name).lstat()
+                if stat.S_ISREG(file_stat.st_mode):
+                    size += file_stat.st_size
+    return size
+
+
+def _touch_mirror(mirror: Path) -> int:
+    """
+    Mark the mirror as the most recently used one.
+
+    :param mirror: The path of the bare mirror.
+    :return: The size of the mirror in bytes.
+    """
+    os.utime(mirror)
+    return _directory_size(mirror)
+
+
+@dataclass(frozen=True, slots=True)
+class Checkout:
+    """A revision of a repository checked out into a worktree."""
+
+    #: The revision of the checked out commit.
+    revision: RevisionHash
+    #: The directory of the worktree.
+    directory: Path
+    #: The number of bytes added to the mirror object store by the checkout.
+    bytes_transferred: int
+
+
+class GitMirrorCache:
+    """
+    A size-bounded cache of bare git mirrors keyed by the repository URL.
+
+    The least recently used mirrors are evicted first. The last use of a mirror
+    is tracked by the modification time of its directory, so the order survives
+    between runs.
+    """
+
+    def __init__(
+        self: Self,
+        root: Path = DEFAULT_CACHE_ROOT,
+        max_size: int = DEFAULT_CACHE_MAX_SIZE,
+        mode: CloneMode = CloneMode.FULL,
+        include_manifests: bool = False,
+    ) -> None:
+        """
+        Initialize the cache.
+
+        :param root: The directory to store the mirrors in.
+        :param max_size: The upper bound of the cache size in bytes.
+        :param mode: The way the repositories are fetched and checked out.
+        :param include_manifests: Whether to check out the dependency manifests
+            in the sparse clone mode.
+        """
+        self._root = root
+        self._max_size = max_size
+        self._mode = mode
+        self._sparse_patterns = SPARSE_CHECKOUT_PATTERNS + (
+            MANIFEST_PATTERNS if include_manifests else ()
+        )
+        self._sizes: dict[Path, int] | None = None
+        # The number of the checkouts of each mirror in progress
+        self._in_use: Counter[Path] = Counter()
+        # The concurrent fetches into the same mirror would race for its refs
+        self._mirror_locks: dict[Path, asyncio.Lock] = {}
+        self._lock = asyncio.Lock()
+
+    @property
+    def root(self: Self) -> Path:
+        """The directory the mirrors are stored in."""
+        return self._root
+
+    def mirror_path(self: Self, url: str) -> Path:
+        """
+        Return the path of the mirror for the given repository URL.
+
+        :param url: The repository URL.
+        :return: The path of the bare mirror.
+        """
+        return self._root / hashlib.sha256(url.encode()).hexdigest()
+
+    async def _fetch(
+        self: Self, url: str, mirror: Path, mode: CloneMode
+    ) -> RevisionHash:
+        """
+        Create or update the mirror with the remote ``HEAD``.
+
+        :param url: The repository URL.
+        :param mirror: The path of the bare mirror.
+        :param mode: The way the repository is fetched.
+        :return: The fetched revision.
+        """
+        if not (mirror / "HEAD").exists():
+            repo_log.note(mirror_created=True)
+            if repo_log.detailed():
+                logger.debug(
+                    "Creating a mirror for the repo {url} in {mirror}.",
+                    url=url,
+                    mirror=mirror,
+                    enqueue=True,
+                )
+            mirror.parent.mkdir(parents=True, exist_ok=True)
+            await run_command("git", "init", "--bare", "--quiet", str(mirror))
+        await run_command(
+            "git", "config", f"remote.{_MIRROR_REMOTE}.url", url, cwd=str(mirror)
+        )
+        with metrics.span("git_fetch"):
+            await run_command(
+                "git",
+                "fetch",
+                "--depth",
+                "1",
+                "--no-tags",
+                "--quiet",
+                *(("--filter=blob:none",) if mode is CloneMode.SPARSE else ()),
+                _MIRROR_REMOTE,
+                f"+HEAD:{_MIRROR_REF}",
+                cwd=str(mirror),
+            )
+        # Drop the worktrees left behind by the interrupted runs
+        await run_command("git", "worktree", "prune", cwd=str(mirror))
+        with metrics.span("git_rev_parse"):
+            revision = await run_command(
+                "git", "rev-parse", _MIRROR_REF, cwd=str(mirror)
+            )
+        return RevisionHash(revision.strip())
+
+    async def _add_worktree(
+        self: Self,
+        mirror: Path,
+        worktree: Path,
+        revision: RevisionHash,
+        mode: CloneMode,
+    ) -> None:
+        """
+        Check out the revision into a new worktree.
+
+        :param mirror: The path of the bare mirror.
+        :param worktree: The directory of the worktree.
+        :param revision: The revision to check out.
+        :param mode: The way the revision is checked out.
+        """
+        with metrics.span("git_worktree_add"):
+            await run_command(
+                "git",
+                "worktree",
+                "add",
+                "--detach",
+                "--quiet",
+                *(("--no-checkout",) if mode is CloneMode.SPARSE else ()),
+                str(worktree),
+                revision,
+                cwd=str(mirror),
+            )
+        if mode is CloneMode.SPARSE:
+            await run_command(
+                "git",
+                "sparse-checkout",
+                "set",
+                "--no-cone",
+                *self._sparse_patterns,
+                cwd=str(worktree),
+            )
+            # Fetches the missing blobs of the selected files only
+            with metrics.span("git_sparse_checkout"):
+                await run_command("git", "checkout", "--quiet", cwd=str(worktree))
+
+    async def _remove_worktree(self: Self, mirror: Path, worktree: Path) -> None:
+        """
+        Remove the worktree.
+
+        :param mirror: The path of the bare mirror.
+        :param worktree: The directory of the worktree.
+        """
+        await run_command(
+            "git", "worktree", "remove", "--force", str(worktree), cwd=str(mirror)
+        )
+
+    async def _checkout(
+        self: Self, url: str, mirror: Path, worktree: Path, mode: CloneMode
+    ) -> RevisionHash:
+        """
+        Fetch the remote ``HEAD`` and check it out into the worktree.
+
+        :param url: The repository URL.
+        :param mirror: The path of the bare mirror.
+        :param worktree: The directory of the worktree.
+        :param mode: The way the repository is fetched and checked out.
+        :return: The checked out revision.
+        """
+        revision = await self._fetch(url, mirror, mode)
+        await self._add_worktree(mirror, worktree, revision, mode)
+        return revision
+
+    async def _checkout_with_fallback(
+        self: Self, url: str, mirror: Path, worktree: Path
+    ) -> RevisionHash:
+        """
+        Check out the repository, falling back to a full checkout if a sparse one fails.
+
+        :param url: The repository URL.
+        :param mirror: The path of the bare mirror.
+        :param worktree: The directory of the worktree.
+        :return: The checked out revision.
+        """
+        try:
+            return await self._checkout(url, mirror, worktree, self._mode)
+        except RuntimeError:
+            if self._mode is CloneMode.FULL:
+                raise
+            logger.warning(
+                "Failed to make a sparse checkout of the repo {url}, "
+                "falling back to a full one.",
+                url=url,
+                enqueue=True,
+            )
+            if worktree.exists():
+                await self._remove_worktree(mirror, worktree)
+            return await self._checkout(url, mirror, worktree, CloneMode.FULL)
+
+    @asynccontextmanager
+    async def checkout(self: Self, url: str) -> AsyncGenerator[Checkout, None]:
+        """
+        Check out the remote ``HEAD`` of the repository into a temporary worktree.
+
+        :param url: The repository URL.
+        :return: The checkout, valid until the context manager exits.
+        """
+        mirror = self.mirror_path(url)
+        self._in_use[mirror] += 1
+        mirror_lock = self._mirror_locks.setdefault(mirror, asyncio.Lock())
+        try:
+            async with aiofiles.tempfile.TemporaryDirectory() as directory:
+                worktree = Path(directory) / "worktree"
+                async with mirror_lock:
+                    objects_size_before = await asyncio.to_thread(
+                        _directory_size, mirror / "objects"
+                    )
+                    with metrics.span("checkout"):
+                        revision = await self._checkout_with_fallback(
+                            url, mirror, worktree
+                        )
+                    bytes_transferred = max(
+                        await asyncio.to_thread(_directory_size, mirror / "objects")
+                        - objects_size_before,
+                        0,
+                    )
+                repo_log.note(bytes_transferred=bytes_transferred)
+                if repo_log.detailed():
+                    logger.debug(
+                        "Transferred {bytes_transferred} bytes for the repo {url}.",
+                        bytes_transferred=bytes_transferred,
+                        url=url,
+                        enqueue=True,
+                    )
+                metrics.count("bytes_transferred", bytes_transferred)
+                try:
+                    yield Checkout(
+                        revision=revision,
+                        directory=worktree,
+                        bytes_transferred=bytes_transferred,
+                    )
+                finally:
+                    async with mirror_lock:
+                        await self._remove_worktree(mirror, worktree)
+        finally:
+            self._in_use[mirror] -= 1
+            if not self._in_use[mirror]:
+                del self._in_use[mirror]
+                del self._mirror_locks[mirror]
+            async with self._lock:
+                if mirror.exists():
+                    sizes = await self._load_sizes()
+                    sizes[mirror] = await asyncio.to_thread(_touch_mirror, mirror)
+            await self.evict()
+
+    async def _load_sizes(self: Self) -> dict[Path, int]:
+        """
+        Return the sizes of the mirrors, scanning the cache root on the first call.
+
+        :return: The mapping of the mirror paths to their sizes in bytes.
+        """
+        if self._sizes is None:
+            mirrors = (
+                [path for path in self._root.iterdir() if path.is_dir()]
+                if self._root.exists()
+                else []
+            )
+            self._sizes = {
+                mirror: await asyncio.to_thread(_directory_size, mirror)
+                for mirror in mirrors
+            }
+        return self._sizes
+
+    async def evict(self: Self) -> list[Path]:
+        """
+        Evict the least recently used mirrors until the cache fits into its limit.
+
+        The mirrors that are currently checked out are never evicted,
+        and the mirrors removed from the disk meanwhile are forgotten.
+
+        :return: The evicted mirrors.
+        """
+        async with self._lock:
+            sizes = await self._load_sizes()
+            total_size = sum(sizes.values())
+            evicted: list[Path] = []
+            if total_size <= self._max_size:
+                return evicted
+            modified_at: dict[Path, float] = {}
+            for mirror in list(sizes):
+                try:
+                    modified_at[mirror] = mirror.stat().st_mtime
+                except FileNotFoundError:
+                    total_size -= sizes.pop(mirror, 0)
+            for mirror in sorted(modified_at, key=modified_at.__getitem__):
+                if total_size <= self._max_size:
+                    break
+                if self._in_use[mirror]:
+                    continue
+                logger.info(
+                    "Evicting the mirror {mirror} from the cache.",
+                    mirror=mirror,
+                    enqueue=True,
+                )
+                await asyncio.to_thread(shutil.rmtree, mirror, ignore_errors=True)
+                total_size -= sizes.pop(mirror, 0)
+                evicted.append(mirror)
+            return evicted
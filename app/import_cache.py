@@ -0,0 +1,144 @@
+"""
+A content-addressed cache of the imports per file.
+
+The imports of a file depend only on its content, so they are cached by the
+git blob SHA of the file. A repository with a new commit only has to parse
+the files that changed, and the files shared between the repositories
+(e.g. generated from the same template) are parsed only once.
+
+The cache is a sidecar SQLite database, separate from the application one.
+The entries that have not been used for a while are evicted.
+
+The cache may be used from the worker threads, e.g. with
+:func:`asyncio.to_thread` to keep the blocking queries off the event loop;
+the queries are serialized with a lock.
+"""
+import sqlite3
+import threading
+import time
+from collections.abc import Collection, Mapping
+from datetime import timedelta
+from pathlib import Path
+from types import TracebackType
+from typing import Final, Self
+
+#: The default path of the cache database.
+DEFAULT_IMPORTS_CACHE_PATH: Final[Path] = (
+    Path(__file__).parent.parent / ".cache" / "imports.sqlite3"
+)
+#: The default time after which the unused entries are evicted.
+DEFAULT_IMPORTS_CACHE_MAX_AGE: Final[timedelta] = timedelta(days=30)
+
+#: The maximum number of the bound parameters in a single statement.
+_MAX_VARIABLES: Final[int] = 500
+
+
+class BlobImportsCache:
+    """A cache of the top-level imports per git blob SHA."""
+
+    def __init__(self: Self, path: Path = DEFAULT_IMPORTS_CACHE_PATH) -> None:
+        """
+        Open the cache, creating the database if it does not exist.
+
+        :param path: The path of the cache database.
+        """
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS blob_imports ("
+            "blob_sha TEXT PRIMARY KEY, "
+            "imports TEXT NOT NULL, "
+            "last_used_at REAL NOT NULL"
+            ")"
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS ix_blob_imports_last_used_at "
+            "ON blob_imports (last_used_at)"
+        )
+        #: The number of the blobs found in the cache.
+        self.hits = 0
+        #: The number of the blobs missing from the cache.
+        self.misses = 0
+
+    def __enter__(self: Self) -> Self:
+        """Enter the context manager."""
+        return self
+
+    def __exit__(
+        self: Self,
+        exc_type: type[BaseException] | None = None,
+        exc_val: BaseException | None = None,
+        exc_tb: TracebackType | None = None,
+    ) -> None:
+        """Exit the context manager, closing the cache."""
+        self.close()
+
+    def close(self: Self) -> None:
+        """Close the cache database."""
+        with self._lock:
+            self._connection.close()
+
+    def get_many(self: Self, blob_shas: Collection[str]) -> dict[str, set[str]]:
+        """
+        Return the cached imports of the blobs, marking them as used.
+
+        :param blob_shas: The blob SHAs to look up.
+        :return: The imports of the blobs found in the cache.
+        """
+        unique_blob_shas = list(set(blob_shas))
+        found: dict[str, set[str]] = {}
+        now = time.time()
+        with self._lock, self._connection:
+            for start in range(0, len(unique_blob_shas), _MAX_VARIABLES):
+                chunk = unique_blob_shas[start : start + _MAX_VARIABLES]
+                placeholders = ", ".join("?" * len(chunk))
+                # Only the placeholders are interpolated into the query
+                rows = self._connection.execute(
+                    "SELECT blob_sha, imports FROM blob_imports "  # noqa: S608
+                    f"WHERE blob_sha IN ({placeholders})",
+                    chunk,
+                ).fetchall()
+                found.update(
+                    (blob_sha, set(filter(None, imports.split("\n"))))
+                    for blob_sha, imports in rows
+                )
+                self._connection.execute(
+                    "UPDATE blob_imports SET last_used_at = ? "  # noqa: S608
+                    f"WHERE blob_sha IN ({placeholders})",
+                    [now, *chunk],
+                )
+            self.hits += len(found)
+            self.misses += len(unique_blob_shas) - len(found)
+        return found
+
+    def put_many(self: Self, imports_by_blob_sha: Mapping[str, set[str]]) -> None:
+        """
+        Store the imports of the blobs.
+
+        :param imports_by_blob_sha: The imports per blob SHA.
+        """
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO blob_imports (blob_sha, imports, last_used_at) "
+                "VALUES (?, ?, ?)",
+                [
+                    (blob_sha, "\n".join(sorted(imports)), now)
+                    for blob_sha, imports in imports_by_blob_sha.items()
+                ],
+            )
+
+    def evict(self: Self, max_age: timedelta = DEFAULT_IMPORTS_CACHE_MAX_AGE) -> int:
+        """
+        Evict the entries that have not been used for longer than the given time.
+
+        :param max_age: The time after which the unused entries are evicted.
+        :return: The number of the evicted entries.
+        """
+        with self._lock, self._connection:
+            return self._connection.execute(
+                "DELETE FROM blob_imports WHERE last_used_at < ?",
+                [time.time() - max_age.total_seconds()],
+            ).rowcount
@@ -0,0 +1,301 @@
+"""
+Third-party imports extraction.
+
+The imports are extracted from the Python sources of a repository with
+the :mod:`ast` module. The sources that cannot be parsed (e.g. written for
+Python 2) are scanned with the :mod:`tokenize` module instead.
+
+Only the top-level names of the absolute imports are kept. The names of the
+standard library modules and of the first-party modules and packages of the
+repository are dropped, and what is left are the third-party dependencies.
+
+The files are parsed in parallel in a process pool, in chunks, to keep the
+inter-process communication overhead low.
+"""
+import ast
+import asyncio
+import io
+import sys
+import tokenize
+from collections.abc import Iterable, Iterator, Sequence
+from concurrent.futures import Executor
+from pathlib import Path, PurePath
+from typing import Final
+
+#: The number of files parsed by a single process pool task.
+FILES_CHUNK_SIZE: Final[int] = 64
+
+#: The names of the standard library modules.
+_STDLIB_MODULE_NAMES: Final[frozenset[str]] = frozenset(sys.stdlib_module_names)
+
+#: The names of the directories that never contain the repository sources.
+_IGNORED_DIRECTORY_NAMES: Final[frozenset[str]] = frozenset(
+    {"__pycache__", "node_modules", "site-packages", "venv"}
+)
+
+#: The types of the tokens after which a new statement can start.
+_STATEMENT_BOUNDARY_TOKEN_TYPES: Final[frozenset[int]] = frozenset(
+    {
+        tokenize.ENCODING,
+        tokenize.NEWLINE,
+        tokenize.NL,
+        tokenize.INDENT,
+        tokenize.DEDENT,
+    }
+)
+
+#: The directories the packages are commonly placed in (the "src layout").
+_SOURCE_ROOTS: Final[frozenset[str]] = frozenset({"src", "lib"})
+
+
+def _extract_imports_from_tree(tree: ast.AST) -> set[str]:
+    """
+    Extract the top-level names of the absolute imports from the syntax tree.
+
+    :param tree: The syntax tree of a module.
+    :return: The top-level names of the imported modules.
+    """
+    imports: set[str] = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            imports.update(alias.name.partition(".")[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+            imports.add(node.module.partition(".")[0])
+    return imports
+
+
+def _is_statement_boundary(token: tokenize.TokenInfo) -> bool:
+    """
+    Check whether the token ends a statement (or precedes the first one).
+
+    :param token: A token.
+    :return: ``True`` if the next token can start a new statement.
+    """
+    return token.type in _STATEMENT_BOUNDARY_TOKEN_TYPES or (
+        token.type == tokenize.OP and token.string == ";"
+    )
+
+
+def _read_imported_names(tokens: Iterator[tokenize.TokenInfo]) -> set[str]:
+    """
+    Read the top-level names of an ``import`` statement, up to its end.
+
+    E.g. ``{"a", "d"}`` for ``import a.b as c, d``.
+
+    :param tokens: The tokens following the ``import`` keyword.
+    :return: The top-level names of the imported modules.
+    """
+    names: set[str] = set()
+    expect_name = True
+    for token in tokens:
+        if _is_statement_boundary(token):
+            break
+        if expect_name and token.type == tokenize.NAME:
+            names.add(token.string)
+        expect_name = token.string == ","
+    return names
+
+
+def _extract_imports_from_tokens(source: bytes) -> set[str]:
+    """
+    Extract the top-level names of the absolute imports by scanning the tokens.
+
+    This is a fallback for the sources that are not valid Python 3 syntax.
+    The scan stops at the first token that cannot be read.
+
+    :param source: The source code of a module.
+    :return: The top-level names of the imported modules.
+    """
+    imports: set[str] = set()
+    tokens = tokenize.tokenize(io.BytesIO(source).readline)
+    at_statement_start = True
+    try:
+        for token in tokens:
+            if _is_statement_boundary(token):
+                at_statement_start = True
+                continue
+            if token.type == tokenize.COMMENT:
+                continue
+            if at_statement_start and token.type == tokenize.NAME:
+                if token.string == "from":
+                    # The relative imports start with a dot instead of a name
+                    name_token = next(tokens, None)
+                    if name_token is not None and name_token.type == tokenize.NAME:
+                        imports.add(name_token.string)
+                elif token.string == "import":
+                    imports.update(_read_imported_names(tokens))
+                    continue
+            at_statement_start = False
+    except (tokenize.TokenError, SyntaxError):
+        pass
+    return imports
+
+
+def extract_imports_from_source(source: bytes) -> set[str]:
+    """
+    Extract the top-level names of the absolute imports from the source code.
+
+    :param source: The source code of a module.
+    :return: The top-level names of the imported modules.
+    """
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError, RecursionError):
+        return _extract_imports_from_tokens(source)
+    return _extract_imports_from_tree(tree)
+
+
+def _extract_imports_from_files(paths: Sequence[Path]) -> list[set[str]]:
+    """
+    Extract the imports from the files.
+
+    This function is meant to be run in a worker process.
+
+    :param paths: The paths to the Python source files.
+    :return: The top-level names of the imported modules, per file.
+    """
+    imports: list[set[str]] = []
+    for path in paths:
+        try:
+            source = path.read_bytes()
+        except OSError:
+            imports.append(set())
+            continue
+        imports.append(extract_imports_from_source(source))
+    return imports
+
+
+def is_python_source_path(path: PurePath) -> bool:
+    """
+    Check whether the path is a Python source file of the repository.
+
+    The files in the hidden directories and in the directories of the virtual
+    environments and the caches are not the repository sources.
+
+    :param path: The path of a file, relative to the repository root.
+    :return: ``True`` if the file should be parsed.
+    """
+    return path.suffix == ".py" and not any(
+        part.startswith(".") or part in _IGNORED_DIRECTORY_NAMES
+        for part in path.parts[:-1]
+    )
+
+
+def find_python_files(directory: Path) -> list[PurePath]:
+    """
+    Find the Python source files in the directory.
+
+    :param directory: The root directory of a repository.
+    :return: The paths to the Python source files, relative to the directory.
+    """
+    return sorted(
+        relative_path
+        for path in directory.rglob("*.py")
+        if path.is_file()
+        and is_python_source_path(relative_path := path.relative_to(directory))
+    )
+
+
+def _module_name(path: PurePath) -> str:
+    """
+    Return the name a path is imported by.
+
+    :param path: The path of a Python file or a package directory.
+    :return: The module name.
+    """
+    return path.stem if path.suffix == ".py" else path.name
+
+
+def find_first_party_names(paths: Iterable[PurePath]) -> set[str]:
+    """
+    Find the names of the modules and packages defined by the repository itself.
+
+    These are the top-level modules and packages of the repository root and
+    of the source roots (e.g. ``src/``).
+
+    :param paths: The paths of the Python files, relative to the repository root.
+    :return: The first-party module names.
+    """
+    names: set[str] = set()
+    for path in paths:
+        names.add(_module_name(PurePath(path.parts[0])))
+        if len(path.parts) > 1 and path.parts[0] in _SOURCE_ROOTS:
+            names.add(_module_name(PurePath(path.parts[1])))
+    return names
+
+
+def filter_third_party_imports(
+    imports_by_path: dict[PurePath, set[str]],
+) -> list[str]:
+    """
+    Drop the standard library and the first-party imports.
+
+    :param imports_by_path: The imports per file, relative to the repository root.
+    :return: The sorted names of the third-party dependencies.
+    """
+    first_party_names = find_first_party_names(imports_by_path)
+    # A script run directly can import its sibling modules and packages
+    names_by_directory: dict[PurePath, set[str]] = {}
+    for path in imports_by_path:
+        for parent, child in zip(path.parents, (path, *path.parents), strict=False):
+            names_by_directory.setdefault(parent, set()).add(_module_name(child))
+    third_party_imports: set[str] = set()
+    for path, imports in imports_by_path.items():
+        third_party_imports.update(
+            imports
+            - _STDLIB_MODULE_NAMES
+            - first_party_names
+            - names_by_directory.get(path.parent, set())
+        )
+    return sorted(third_party_imports)
+
+
+async def extract_imports_from_files(
+    directory: Path, paths: Sequence[PurePath], executor: Executor | None = None
+) -> dict[PurePath, set[str]]:
+    """
+    Extract the imports from the files in the directory.
+
+    :param directory: The root directory of a repository.
+    :param paths: The paths of the files, relative to the directory.
+    :param executor: The executor to parse the files in,
+        the default one of the event loop if not provided.
+    :return: The top-level names of the imported modules, per file.
+    """
+    loop = asyncio.get_running_loop()
+    chunks = [
+        paths[start : start + FILES_CHUNK_SIZE]
+        for start in range(0, len(paths), FILES_CHUNK_SIZE)
+    ]
+    results = await asyncio.gather(
+        *(
+            loop.run_in_executor(
+                executor,
+                _extract_imports_from_files,
+                [directory / path for path in chunk],
+            )
+            for chunk in chunks
+        )
+    )
+    return {
+        path: imports
+        for chunk, chunk_imports in zip(chunks, results, strict=True)
+        for path, imports in zip(chunk, chunk_imports, strict=True)
+    }
+
+
+async def extract_third_party_imports(
+    directory: Path, executor: Executor | None = None
+) -> list[str]:
+    """
+    Extract the third-party dependencies imported by the sources in the directory.
+
+    :param directory: The root directory of a repository.
+    :param executor: The executor to parse the files in,
+        the default one of the event loop if not provided.
+    :return: The sorted names of the third-party dependencies.
+    """
+    paths = await asyncio.to_thread(find_python_files, directory)
+    return filter_third_party_imports(
+        await extract_imports_from_files(directory, paths, executor)
+    )
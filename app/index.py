@@ -5,21 +5,107 @@ This script creates can create two indexes:
 
 - ``repos_index.json``: Contains all the repositories and their dependencies.
 - ``dependencies_index.json``: Contains all the dependencies and the
-    repositories that depend on them.
+    repositories that depend on them, as the delta-encoded postings lists
+    of their ids (see :mod:`app.postings`).
 
 The indexes are used by the frontend to display the data and perform searches.
+
+The indexes are written in one of the two formats:
+
+- ``verbose``: pretty-printed, with the dependencies embedded into the repos.
+- ``compact``: minified, with the short keys, and with the repos referencing
+    the dependencies by their ids. The compact indexes have a ``schema_version``
+    field, and are precompressed into the ``.gz`` and ``.br`` files next to them.
+
+The full-text search index of the repo descriptions, ``search_index.json``,
+is built here as well (see :mod:`app.search_index`), so the client does not
+have to index the descriptions itself.
+
+The popularity of the dependencies, and the dependencies used together with
+each one, are precomputed into ``dependency_stats.json``
+(see :mod:`app.dependency_stats`).
+
+The tables can also be exported into the Arrow IPC and Parquet files,
+for the analytics that do not need to decode the JSON indexes.
+
+The indexes can also be split into the shards of a fixed size, with the repos
+ordered by the stars. The shard files are named after the hashes of their
+content, and listed in ``manifest.json`` along with their counts.
+
+The indexes are regenerated incrementally: only the items changed since the
+previous generation are serialised again (see :mod:`app.index_manifest`),
+and an index file is not rewritten at all if its content is the same.
 """
 import asyncio
-import json
+import contextlib
+import functools
+import hashlib
+import itertools
+import mmap
+import os
+import zlib
+from collections.abc import (
+    AsyncGenerator,
+    AsyncIterable,
+    Awaitable,
+    Callable,
+    Generator,
+    Mapping,
+    Sequence,
+)
+from dataclasses import dataclass
+from enum import StrEnum
 from pathlib import Path
-from typing import Final
+from types import TracebackType
+from typing import Annotated, Any, Final, Optional, Self, TypeVar
 
 import aiofiles
+import aiofiles.os
+import brotli
+import numpy as np
+import numpy.typing as npt
+import pyarrow as pa
+import pyarrow.ipc
+import pyarrow.parquet as pq
 import sqlalchemy.orm
 import typer
+from aiofiles.threadpool.binary import AsyncBufferedIOBase
+from loguru import logger
+from pydantic import TypeAdapter
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
-from app.database import Dependency, Repo, async_session_maker
-from app.models import DependencyDetail, RepoDetail
+from app.database import (
+    Dependency,
+    EngineProfile,
+    Repo,
+    RepoDependency,
+    async_session_maker,
+    get_session_maker,
+)
+from app.dependency_stats import DEFAULT_TOP_K, compute_dependency_stats
+from app.index_manifest import (
+    IndexManifest,
+    IndexManifestItem,
+    ManifestReader,
+    hash_row,
+    manifest_path_of,
+    open_manifest,
+    pack_header,
+    pack_item,
+)
+from app.models import (
+    CompactDependencyDetail,
+    CompactRepoDetail,
+    DependencyIndexDetail,
+    DependencyStatsIndex,
+    IndexShard,
+    IndexShardsManifest,
+    RepoDetail,
+    SearchIndex,
+    ShardedIndex,
+)
+from app.postings import encode_postings
+from app.search_index import build_search_index
 from app.uow import async_session_uow
 
 #: The path to the repos index file.
@@ -28,76 +114,1360 @@ REPOS_INDEX_PATH: Final[Path] = Path(__file__).parent.parent / "repos_index.json
 DEPENDENCIES_INDEX_PATH: Final[Path] = (
     Path(__file__).parent.parent / "dependencies_index.json"
 )
+#: The number of the bytes buffered before writing them to an index file.
+WRITE_CHUNK_SIZE: Final[int] = 64 * 1024
+#: The number of the rows loaded from the database at once.
+YIELD_PER: Final[int] = 500
+
+#: The path to the search index file.
+SEARCH_INDEX_PATH: Final[Path] = Path(__file__).parent.parent / "search_index.json"
+#: The path to the dependency statistics file.
+DEPENDENCY_STATS_PATH: Final[Path] = (
+    Path(__file__).parent.parent / "dependency_stats.json"
+)
+#: The directory of the columnar exports.
+COLUMNAR_DIRECTORY: Final[Path] = Path(__file__).parent.parent / "columnar"
+#: The number of the rows written into the columnar files at once.
+COLUMNAR_BATCH_SIZE: Final[int] = 64 * 1024
+#: The directory of the sharded indexes, served along with the frontend.
+SHARDS_DIRECTORY: Final[Path] = (
+    Path(__file__).parent.parent / "frontend" / "public" / "index"
+)
+#: The name of the manifest of the sharded indexes.
+SHARDS_MANIFEST_NAME: Final[str] = "manifest.json"
+#: The default maximum number of the items in a shard.
+DEFAULT_SHARD_SIZE: Final[int] = 1000
+#: The number of the hex digits of the content hash in the name of a shard file.
+SHARD_HASH_LENGTH: Final[int] = 16
+
+#: The version of the schema of the compact indexes.
+#: The verbose indexes have no version, and are considered to be the first one.
+COMPACT_SCHEMA_VERSION: Final[int] = 2
+
+#: The indentation of the items of the top-level array of an index.
+_ITEM_INDENT: Final[bytes] = b"\n" + b" " * 8
+
+_REPO_DETAIL_ADAPTER: Final[TypeAdapter[RepoDetail]] = TypeAdapter(RepoDetail)
+_DEPENDENCY_INDEX_DETAIL_ADAPTER: Final[
+    TypeAdapter[DependencyIndexDetail]
+] = TypeAdapter(DependencyIndexDetail)
+_SEARCH_INDEX_ADAPTER: Final[TypeAdapter[SearchIndex]] = TypeAdapter(SearchIndex)
+_DEPENDENCY_STATS_INDEX_ADAPTER: Final[TypeAdapter[DependencyStatsIndex]] = TypeAdapter(
+    DependencyStatsIndex
+)
+_COMPACT_REPO_DETAIL_ADAPTER: Final[TypeAdapter[CompactRepoDetail]] = TypeAdapter(
+    CompactRepoDetail
+)
+_COMPACT_DEPENDENCY_DETAIL_ADAPTER: Final[
+    TypeAdapter[CompactDependencyDetail]
+] = TypeAdapter(CompactDependencyDetail)
+
+
+class IndexFormat(StrEnum):
+    """The format of the index files."""
+
+    VERBOSE = "verbose"
+    COMPACT = "compact"
+
+
+class ColumnarFormat(StrEnum):
+    """The format of the columnar exports."""
+
+    #: The Arrow IPC file format, uncompressed, so it can be memory-mapped.
+    ARROW = "arrow"
+    #: The Parquet format, compressed with Zstandard.
+    PARQUET = "parquet"
+
+
+#: The schemas of the tables in the columnar exports.
+#: The ``*_index`` columns are the dense row numbers in the referenced tables.
+COLUMNAR_SCHEMAS: Final[dict[str, pa.Schema]] = {
+    "repo": pa.schema(
+        [
+            pa.field("id", pa.int64(), nullable=False),
+            pa.field("url", pa.string(), nullable=False),
+            pa.field("description", pa.string(), nullable=False),
+            pa.field("stars", pa.int64(), nullable=False),
+            pa.field("source_graph_repo_id", pa.int64()),
+            pa.field("last_checked_revision", pa.string()),
+        ]
+    ),
+    "dependency": pa.schema(
+        [
+            pa.field("id", pa.int64(), nullable=False),
+            pa.field("name", pa.string(), nullable=False),
+        ]
+    ),
+    "repo_dependency": pa.schema(
+        [
+            pa.field("repo_index", pa.int32(), nullable=False),
+            pa.field("dependency_index", pa.int32(), nullable=False),
+            pa.field("repo_id", pa.int64(), nullable=False),
+            pa.field("dependency_id", pa.int64(), nullable=False),
+        ]
+    ),
+}
+
 
 app = typer.Typer()
 
 
-async def create_repos_index() -> None:
+def _temp_path(path: Path) -> Path:
     """
-    Create repos_index.json file from database.
+    Return the path of the temporary file to write the file through.
 
-    :return: None
-    """
-    async with async_session_maker() as session, async_session_uow(
-        session
-    ), aiofiles.open(REPOS_INDEX_PATH, "w") as index_file:
-        await index_file.write(
-            json.dumps(
-                {
-                    "repos": [
-                        RepoDetail.model_validate(repo).model_dump()
-                        async for repo in (
-                            await session.stream_scalars(
-                                sqlalchemy.select(Repo)
-                                .order_by(Repo.id)
-                                .options(sqlalchemy.orm.selectinload(Repo.dependencies))
-                            )
-                        )
-                    ],
-                },
-                indent=4,
+    :param path: The path of the file to write.
+    :return: The path of a hidden file in the same directory.
+    """
+    return path.with_name(f".{path.name}.{os.getpid()}.tmp")
+
+
+@dataclass(slots=True)
+class _AtomicWrite:
+    """A file being written atomically."""
+
+    #: The temporary file to write the content into.
+    file: AsyncBufferedIOBase
+    #: Whether to leave the target file as it is, discarding the written content.
+    discard: bool = False
+
+
+@contextlib.asynccontextmanager
+async def _open_atomically(path: Path) -> AsyncGenerator[_AtomicWrite, None]:
+    """
+    Open a file for writing, replacing it only once it is completely written.
+
+    The content is written into a temporary file next to the target one,
+    which is then renamed over the target. If the writing fails, or the
+    content is discarded, the target file is left untouched.
+
+    :param path: The path of the file to write.
+    :return: The file being written.
+    """
+    temp_path = _temp_path(path)
+    try:
+        async with aiofiles.open(temp_path, "wb") as temp_file:
+            atomic_write = _AtomicWrite(file=temp_file)
+            yield atomic_write
+            if not atomic_write.discard:
+                await temp_file.flush()
+                await asyncio.to_thread(os.fsync, temp_file.fileno())
+        if atomic_write.discard:
+            await aiofiles.os.remove(temp_path)
+        else:
+            await aiofiles.os.replace(temp_path, path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            await aiofiles.os.remove(temp_path)
+        raise
+
+
+@dataclass(frozen=True, slots=True)
+class _PreviousIndex:
+    """The previous generation of an index."""
+
+    #: The manifest of the index, if it matches the index file.
+    manifest: ManifestReader | None = None
+    #: The content of the index file.
+    content: bytes | mmap.mmap = b""
+    #: The SHA-256 digest of the index file, if it exists.
+    digest: str | None = None
+
+    def find(self: Self, item_id: int) -> IndexManifestItem | None:
+        """
+        Find the item in the manifest, the ids looked up in ascending order.
+
+        :param item_id: The id of the item.
+        :return: The item, or ``None`` if it is not in the previous generation.
+        """
+        return self.manifest.find(item_id) if self.manifest else None
+
+    def data(self: Self, entry: IndexManifestItem) -> bytes:
+        """
+        Return the item as serialised in the index file.
+
+        :param entry: The item in the manifest.
+        :return: The serialised item.
+        """
+        return self.content[entry.offset : entry.offset + entry.length]
+
+
+@contextlib.contextmanager
+def _open_previous_index(
+    path: Path, index_format: IndexFormat
+) -> Generator[_PreviousIndex, None, None]:
+    """
+    Open the previous generation of the index, memory-mapping the index file.
+
+    :param path: The path of the index file.
+    :param index_format: The format of the next generation of the index.
+    :return: The previous generation of the index.
+    """
+    with contextlib.ExitStack() as stack:
+        manifest = stack.enter_context(open_manifest(path))
+        content: bytes | mmap.mmap = b""
+        digest = None
+        if path.is_file():
+            index_file = stack.enter_context(path.open("rb"))
+            if os.fstat(index_file.fileno()).st_size:
+                content = stack.enter_context(
+                    mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ)
+                )
+            digest = hashlib.sha256(content).hexdigest()
+        if manifest is not None and (
+            manifest.header.digest != digest
+            or manifest.header.index_format != index_format
+        ):
+            manifest = None
+        yield _PreviousIndex(manifest=manifest, content=content, digest=digest)
+
+
+#: The type of the rows the items of an index are serialised from.
+_RowT = TypeVar("_RowT")
+#: A dependency with the ids of the repos depending on it, as ``group_concat``-ed.
+_DependencyRow = tuple[int, str, str | None]
+
+
+@dataclass(frozen=True, slots=True)
+class _IndexItem:
+    """An item of an index."""
+
+    #: The id of the item.
+    id: int
+    #: The hash of the content the item is serialised from.
+    hash: bytes
+    #: The item, serialised as it is written into the index file.
+    data: bytes
+    #: The hash of the item in the previous generation, if it was in it.
+    previous_hash: bytes | None = None
+
+
+@dataclass(slots=True)
+class IndexChanges:
+    """The changes of an index since its previous generation."""
+
+    #: The number of the items not in the previous generation.
+    added: int = 0
+    #: The number of the items whose content has changed.
+    changed: int = 0
+    #: The number of the items no longer in the index.
+    removed: int = 0
+    #: The number of the items whose content has not changed.
+    unchanged: int = 0
+    #: Whether the index file has been rewritten.
+    written: bool = False
+
+    def record(self: Self, item: _IndexItem) -> None:
+        """
+        Record the change of an item.
+
+        :param item: The item of the index.
+        """
+        if item.previous_hash is None:
+            self.added += 1
+        elif item.previous_hash != item.hash:
+            self.changed += 1
+        else:
+            self.unchanged += 1
+
+
+async def _aiter_index_items(
+    pages: AsyncIterable[Sequence[tuple[int, bytes, _RowT]]],
+    serialize: Callable[[list[_RowT]], Awaitable[Mapping[int, bytes]]],
+    previous: _PreviousIndex,
+) -> AsyncGenerator[_IndexItem, None]:
+    """
+    Serialise the items whose content has changed, and reuse the rest.
+
+    :param pages: The pages of the item ids with the hashes of their content,
+        and the rows the items are serialised from.
+    :param serialize: The function serialising the items of the given rows.
+    :param previous: The previous generation of the index.
+    :return: The items of the index, one by one.
+    """
+    async for page in pages:
+        entries = [previous.find(item_id) for item_id, _, _ in page]
+        serialized = await serialize(
+            [
+                row
+                for (_, item_hash, row), entry in zip(page, entries, strict=True)
+                if entry is None or entry.hash != item_hash
+            ]
+        )
+        for (item_id, item_hash, _), entry in zip(page, entries, strict=True):
+            yield _IndexItem(
+                id=item_id,
+                hash=item_hash,
+                data=(
+                    previous.data(entry)
+                    if entry is not None and entry.hash == item_hash
+                    else serialized[item_id]
+                ),
+                previous_hash=entry.hash if entry is not None else None,
+            )
+
+
+def _compact_index_header(key: str) -> bytes:
+    """
+    Return the beginning of a compact index, up to its first item.
+
+    :param key: The key of the array of the items.
+    :return: The header of the index.
+    """
+    return b'{"schema_version":%d,"%s":[' % (COMPACT_SCHEMA_VERSION, key.encode())
+
+
+async def _write_index(
+    path: Path,
+    key: str,
+    items: AsyncIterable[_IndexItem],
+    index_format: IndexFormat = IndexFormat.VERBOSE,
+    previous: _PreviousIndex | None = None,
+) -> IndexChanges:
+    """
+    Write an index file as the items arrive, in the chunks of a fixed size.
+
+    The index is a JSON object with a single array under the given key.
+    A verbose index is formatted as by ``json.dumps(..., indent=4)``,
+    and a compact one is minified and has the ``schema_version`` field.
+
+    The index file is left untouched if the new content is the same.
+    The manifest is written next to the index file as the items arrive,
+    so neither the index nor its manifest is held in memory.
+
+    :param path: The path of the index file.
+    :param key: The key of the array of the items.
+    :param items: The items of the index, in the order of their ids.
+    :param index_format: The format of the index.
+    :param previous: The previous generation of the index.
+    :return: The changes of the index.
+    """
+    previous = previous or _PreviousIndex()
+    compact = index_format == IndexFormat.COMPACT
+    changes = IndexChanges()
+    count = 0
+    digest = hashlib.sha256()
+    flushed = 0
+    manifest_buffer = bytearray()
+    async with _open_atomically(manifest_path_of(path)) as manifest_file:
+        async with _open_atomically(path) as index_file:
+            if compact:
+                buffer = bytearray(_compact_index_header(key))
+            else:
+                buffer = bytearray(b'{\n    "%s": [' % key.encode())
+            async for item in items:
+                if count:
+                    buffer += b","
+                if not compact:
+                    buffer += _ITEM_INDENT
+                manifest_buffer += pack_item(
+                    IndexManifestItem(
+                        id=item.id,
+                        hash=item.hash,
+                        offset=flushed + len(buffer),
+                        length=len(item.data),
+                    )
+                )
+                buffer += item.data
+                count += 1
+                changes.record(item)
+                if len(buffer) >= WRITE_CHUNK_SIZE:
+                    digest.update(buffer)
+                    await index_file.file.write(buffer)
+                    flushed += len(buffer)
+                    buffer.clear()
+                if len(manifest_buffer) >= WRITE_CHUNK_SIZE:
+                    await manifest_file.file.write(manifest_buffer)
+                    manifest_buffer.clear()
+            if compact:
+                buffer += b"]}"
+            else:
+                buffer += b"\n    ]\n}" if count else b"]\n}"
+            digest.update(buffer)
+            await index_file.file.write(buffer)
+            index_file.discard = digest.hexdigest() == previous.digest
+        previous_header = previous.manifest.header if previous.manifest else None
+        changes.removed = (
+            previous_header.count - changes.changed - changes.unchanged
+            if previous_header
+            else 0
+        )
+        changes.written = not index_file.discard
+        manifest_file.discard = not changes.written and previous_header is not None
+        manifest_buffer += pack_header(
+            IndexManifest(
+                index_format=index_format,
+                generation=(previous_header.generation if previous_header else 0)
+                + changes.written,
+                digest=digest.hexdigest(),
+                count=count,
+            )
+        )
+        await manifest_file.file.write(manifest_buffer)
+    return changes
+
+
+def _create_compressors() -> (
+    dict[str, tuple[Callable[[bytes], bytes], Callable[[], bytes]]]
+):
+    """
+    Create the compressors of the precompressed variants of an index.
+
+    The output does not depend on the time, so an unchanged index is
+    compressed into the same bytes.
+
+    :return: The functions compressing a chunk and finishing the output,
+        per the suffix of the variant.
+    """
+    # The gzip header, without a file name and with a zero modification time
+    gzip_compressor = zlib.compressobj(9, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    brotli_compressor = brotli.Compressor(mode=brotli.MODE_TEXT, quality=11)
+    return {
+        ".gz": (gzip_compressor.compress, gzip_compressor.flush),
+        ".br": (brotli_compressor.process, brotli_compressor.finish),
+    }
+
+
+def _precompress_index(path: Path) -> None:
+    """
+    Write the precompressed variants of the index next to it.
+
+    Each variant is written into a temporary file first, and replaces
+    the previous one only once completely written.
+
+    :param path: The path of the index file.
+    """
+    compressors = _create_compressors()
+    variant_paths = {
+        suffix: path.with_name(path.name + suffix) for suffix in compressors
+    }
+    try:
+        with contextlib.ExitStack() as stack:
+            source = stack.enter_context(path.open("rb"))
+            outputs = {
+                suffix: stack.enter_context(_temp_path(variant_path).open("wb"))
+                for suffix, variant_path in variant_paths.items()
+            }
+            while chunk := source.read(WRITE_CHUNK_SIZE):
+                for suffix, (compress, _) in compressors.items():
+                    outputs[suffix].write(compress(chunk))
+            for suffix, (_, finish) in compressors.items():
+                outputs[suffix].write(finish())
+                outputs[suffix].flush()
+                os.fsync(outputs[suffix].fileno())
+        for variant_path in variant_paths.values():
+            _temp_path(variant_path).replace(variant_path)
+    except BaseException:
+        for variant_path in variant_paths.values():
+            _temp_path(variant_path).unlink(missing_ok=True)
+        raise
+
+
+def _has_precompressed_variants(path: Path) -> bool:
+    """
+    Check whether all the precompressed variants of the index exist.
+
+    :param path: The path of the index file.
+    :return: ``True`` if all the variants exist.
+    """
+    return all(
+        path.with_name(path.name + suffix).exists() for suffix in _create_compressors()
+    )
+
+
+def _serialize_repo(repo: Repo, index_format: IndexFormat) -> bytes:
+    """
+    Serialise the repo as it is written into the index file.
+
+    :param repo: The repo with its dependencies loaded.
+    :param index_format: The format of the index.
+    :return: The JSON-encoded repo.
+    """
+    if index_format == IndexFormat.COMPACT:
+        return _COMPACT_REPO_DETAIL_ADAPTER.dump_json(
+            CompactRepoDetail(
+                id=repo.id,
+                url=repo.url,
+                description=repo.description,
+                stars=repo.stars,
+                source_graph_repo_id=repo.source_graph_repo_id,
+                dependency_ids=sorted(
+                    dependency.id for dependency in repo.dependencies
+                ),
+                last_checked_revision=repo.last_checked_revision,
+            ),
+            by_alias=True,
+        )
+    return _REPO_DETAIL_ADAPTER.dump_json(
+        RepoDetail.model_validate(repo), indent=4
+    ).replace(b"\n", _ITEM_INDENT)
+
+
+def _serialize_dependency(
+    dependency_id: int, name: str, repo_ids: list[int], index_format: IndexFormat
+) -> bytes:
+    """
+    Serialise the dependency as it is written into the index file.
+
+    :param dependency_id: The id of the dependency.
+    :param name: The name of the dependency.
+    :param repo_ids: The ids of the repos depending on the dependency.
+    :param index_format: The format of the index.
+    :return: The JSON-encoded dependency.
+    """
+    if index_format == IndexFormat.COMPACT:
+        return _COMPACT_DEPENDENCY_DETAIL_ADAPTER.dump_json(
+            CompactDependencyDetail(
+                id=dependency_id,
+                name=name,
+                repo_id_deltas=encode_postings(repo_ids),
+            ),
+            by_alias=True,
+        )
+    return _DEPENDENCY_INDEX_DETAIL_ADAPTER.dump_json(
+        DependencyIndexDetail(
+            id=dependency_id, name=name, repo_id_deltas=encode_postings(repo_ids)
+        ),
+        indent=4,
+    ).replace(b"\n", _ITEM_INDENT)
+
+
+def _split_ids(ids: str | None) -> list[int]:
+    """
+    Split the ids concatenated by ``group_concat``.
+
+    :param ids: The comma-separated ids, or ``None`` for none.
+    :return: The sorted ids.
+    """
+    return sorted(map(int, ids.split(","))) if ids else []
+
+
+def _select_dependencies() -> sqlalchemy.Select[tuple[int, str, str | None]]:
+    """
+    Select the dependencies with the ids of the repos depending on them.
+
+    The postings lists of all the dependencies are built in a single
+    grouped pass over ``repo_dependency``.
+
+    :return: The statement selecting the ids, the names,
+        and the comma-separated ids of the repos of the dependencies.
+    """
+    return (
+        sqlalchemy.select(
+            Dependency.id,
+            Dependency.name,
+            sqlalchemy.func.group_concat(RepoDependency.repo_id),
+        )
+        .outerjoin(RepoDependency, RepoDependency.dependency_id == Dependency.id)
+        .where(Dependency.name != "")
+        .group_by(Dependency.id)
+        .order_by(Dependency.id)
+    )
+
+
+async def _aiter_repo_hashes(
+    session: AsyncSession,
+) -> AsyncGenerator[list[tuple[int, bytes, int]], None]:
+    """
+    Stream the ids of the repos with the hashes of their content.
+
+    The content of a repo is its row and the ids of its dependencies,
+    so the repos do not have to be loaded to find the changed ones.
+
+    :param session: The database session.
+    :return: The pages of the repo ids with their hashes, and their ids again
+        to load the changed repos by.
+    """
+    result = await session.stream(
+        sqlalchemy.select(
+            Repo.id,
+            Repo.url,
+            Repo.description,
+            Repo.stars,
+            Repo.source_graph_repo_id,
+            Repo.last_checked_revision,
+            sqlalchemy.func.group_concat(RepoDependency.dependency_id),
+        )
+        .outerjoin(RepoDependency, RepoDependency.repo_id == Repo.id)
+        .group_by(Repo.id)
+        .order_by(Repo.id)
+        .execution_options(yield_per=YIELD_PER)
+    )
+    async for rows in result.partitions():
+        yield [
+            (
+                row[0],
+                hash_row(
+                    [
+                        *row[:-1],
+                        _split_ids(row[-1]),
+                    ]
+                ),
+                row[0],
+            )
+            for row in rows
+        ]
+
+
+async def _aiter_dependency_hashes(
+    session: AsyncSession,
+) -> AsyncGenerator[list[tuple[int, bytes, _DependencyRow]], None]:
+    """
+    Stream the ids of the dependencies with the hashes of their content.
+
+    The content of a dependency is its name and the ids of its repos.
+    The changed dependencies are serialised from the same rows, so the
+    postings lists are only grouped once, in a single pass.
+
+    :param session: The database session.
+    :return: The pages of the dependency ids with their hashes and rows.
+    """
+    result = await session.stream(
+        _select_dependencies().execution_options(yield_per=YIELD_PER)
+    )
+    async for rows in result.partitions():
+        yield [
+            (
+                dependency_id,
+                hash_row([dependency_id, name, _split_ids(repo_ids)]),
+                (dependency_id, name, repo_ids),
             )
+            for dependency_id, name, repo_ids in rows
+        ]
+
+
+async def _serialize_repos(
+    session: AsyncSession, index_format: IndexFormat, repo_ids: list[int]
+) -> dict[int, bytes]:
+    """
+    Load and serialise the repos with the given ids.
+
+    :param session: The database session.
+    :param index_format: The format of the index.
+    :param repo_ids: The ids of the repos.
+    :return: The serialised repos per their ids.
+    """
+    if not repo_ids:
+        return {}
+    repos = await session.scalars(
+        sqlalchemy.select(Repo)
+        .where(Repo.id.in_(repo_ids))
+        .options(sqlalchemy.orm.selectinload(Repo.dependencies))
+    )
+    return {repo.id: _serialize_repo(repo, index_format) for repo in repos}
+
+
+async def _serialize_dependencies(
+    index_format: IndexFormat, rows: list[_DependencyRow]
+) -> dict[int, bytes]:
+    """
+    Serialise the dependencies from their rows.
+
+    :param index_format: The format of the index.
+    :param rows: The dependencies with the ids of their repos.
+    :return: The serialised dependencies per their ids.
+    """
+    return {
+        dependency_id: _serialize_dependency(
+            dependency_id, name, _split_ids(repo_ids), index_format
         )
+        for dependency_id, name, repo_ids in rows
+    }
+
+
+async def _finish_index(
+    index_path: Path, index_format: IndexFormat, changes: IndexChanges
+) -> None:
+    """
+    Precompress the compact index if needed, and report the changes.
+
+    :param index_path: The path of the index file.
+    :param index_format: The format of the index.
+    :param changes: The changes of the index.
+    """
+    if index_format == IndexFormat.COMPACT and (
+        changes.written or not _has_precompressed_variants(index_path)
+    ):
+        await asyncio.to_thread(_precompress_index, index_path)
+    logger.info(
+        "{index}: {added} added, {changed} changed, {removed} removed, "
+        "{unchanged} unchanged; {status}.",
+        index=index_path.name,
+        added=changes.added,
+        changed=changes.changed,
+        removed=changes.removed,
+        unchanged=changes.unchanged,
+        status="rewritten" if changes.written else "identical, not rewritten",
+        enqueue=True,
+    )
+
 
+async def create_repos_index(
+    session_maker: async_sessionmaker[AsyncSession] = async_session_maker,
+    index_path: Path = REPOS_INDEX_PATH,
+    index_format: IndexFormat = IndexFormat.VERBOSE,
+) -> IndexChanges:
+    """
+    Create repos_index.json file from database.
+
+    The repos are written as they are loaded, and the manifests of both
+    generations are streamed, so the memory usage does not grow with the
+    number of the repos. Only the repos changed since the
+    previous generation of the index are serialised again.
 
-async def create_dependencies_index() -> None:
+    :param session_maker: The session maker of the database engine.
+    :param index_path: The path of the index file.
+    :param index_format: The format of the index.
+    :return: The changes of the index.
+    """
+    async with session_maker() as session, async_session_uow(session):
+        with _open_previous_index(index_path, index_format) as previous:
+            changes = await _write_index(
+                index_path,
+                "repos",
+                _aiter_index_items(
+                    _aiter_repo_hashes(session),
+                    functools.partial(_serialize_repos, session, index_format),
+                    previous,
+                ),
+                index_format,
+                previous,
+            )
+    await _finish_index(index_path, index_format, changes)
+    return changes
+
+
+async def create_dependencies_index(
+    session_maker: async_sessionmaker[AsyncSession] = async_session_maker,
+    index_path: Path = DEPENDENCIES_INDEX_PATH,
+    index_format: IndexFormat = IndexFormat.VERBOSE,
+) -> IndexChanges:
     """
     Create dependencies_index.json file from database.
 
-    :return: None
+    :param session_maker: The session maker of the database engine.
+    :param index_path: The path of the index file.
+    :param index_format: The format of the index.
+    :return: The changes of the index.
+    """
+    async with session_maker() as session, async_session_uow(session):
+        with _open_previous_index(index_path, index_format) as previous:
+            changes = await _write_index(
+                index_path,
+                "dependencies",
+                _aiter_index_items(
+                    _aiter_dependency_hashes(session),
+                    functools.partial(_serialize_dependencies, index_format),
+                    previous,
+                ),
+                index_format,
+                previous,
+            )
+    await _finish_index(index_path, index_format, changes)
+    return changes
+
+
+async def _write_shard(
+    directory: Path, key: str, number: int, items: list[bytes]
+) -> IndexShard:
+    """
+    Write a shard of a sharded index, unless it already exists.
+
+    The name of the shard file includes the hash of its content, so an
+    existing file with the same name already has the same content.
+
+    :param directory: The directory of the sharded indexes.
+    :param key: The key of the array of the items.
+    :param number: The number of the shard, from zero.
+    :param items: The serialised items of the shard.
+    :return: The shard.
+    """
+    content = _compact_index_header(key) + b",".join(items) + b"]}"
+    content_hash = hashlib.sha256(content).hexdigest()[:SHARD_HASH_LENGTH]
+    path = directory / f"{key}-{number:04d}.{content_hash}.json"
+    if not path.exists():
+        async with _open_atomically(path) as shard_file:
+            await shard_file.file.write(content)
+    if not _has_precompressed_variants(path):
+        await asyncio.to_thread(_precompress_index, path)
+    return IndexShard(path=path.name, count=len(items), hash=content_hash)
+
+
+async def _write_shards(
+    directory: Path, key: str, pages: AsyncIterable[list[bytes]]
+) -> ShardedIndex:
+    """
+    Write the shards of a sharded index, one per page of the items.
+
+    :param directory: The directory of the sharded indexes.
+    :param key: The key of the array of the items.
+    :param pages: The pages of the serialised items.
+    :return: The sharded index.
+    """
+    shards: list[IndexShard] = []
+    async for page in pages:
+        shards.append(await _write_shard(directory, key, len(shards), page))
+    return ShardedIndex(count=sum(shard.count for shard in shards), shards=shards)
+
+
+def _remove_stale_shards(directory: Path, manifest: IndexShardsManifest) -> None:
+    """
+    Remove the shard files not listed in the manifest.
+
+    :param directory: The directory of the sharded indexes.
+    :param manifest: The manifest of the sharded indexes.
+    """
+    current = {
+        shard.path
+        for sharded_index in (manifest.repos, manifest.dependencies)
+        for shard in sharded_index.shards
+    }
+    for key in ("repos", "dependencies"):
+        for path in directory.glob(f"{key}-*.json*"):
+            if path.name.removesuffix(".gz").removesuffix(".br") not in current:
+                path.unlink(missing_ok=True)
+
+
+async def create_sharded_indexes(
+    session_maker: async_sessionmaker[AsyncSession] = async_session_maker,
+    directory: Path = SHARDS_DIRECTORY,
+    shard_size: int = DEFAULT_SHARD_SIZE,
+) -> IndexShardsManifest:
+    """
+    Create the compact indexes split into the shards of a fixed size.
+
+    The repos are ordered by the stars, so the first shard has the most
+    relevant ones. The shard files are named after the hashes of their
+    content, and listed in ``manifest.json``: a client can cache a shard
+    forever, and only download the shards whose hashes have changed.
+
+    :param session_maker: The session maker of the database engine.
+    :param directory: The directory of the sharded indexes.
+    :param shard_size: The maximum number of the items in a shard.
+    :return: The manifest of the sharded indexes.
+    """
+    await aiofiles.os.makedirs(directory, exist_ok=True)
+    async with session_maker() as session, async_session_uow(session):
+        repos = await session.stream_scalars(
+            sqlalchemy.select(Repo)
+            .order_by(Repo.stars.desc(), Repo.id)
+            .options(sqlalchemy.orm.selectinload(Repo.dependencies))
+            .execution_options(yield_per=shard_size)
+        )
+        repos_index = await _write_shards(
+            directory,
+            "repos",
+            (
+                [_serialize_repo(repo, IndexFormat.COMPACT) for repo in page]
+                async for page in repos.partitions()
+            ),
+        )
+        dependencies = await session.stream(
+            _select_dependencies().execution_options(yield_per=shard_size)
+        )
+        dependencies_index = await _write_shards(
+            directory,
+            "dependencies",
+            (
+                [
+                    _serialize_dependency(
+                        dependency_id,
+                        name,
+                        _split_ids(repo_ids),
+                        IndexFormat.COMPACT,
+                    )
+                    for dependency_id, name, repo_ids in page
+                ]
+                async for page in dependencies.partitions()
+            ),
+        )
+    manifest = IndexShardsManifest(
+        schema_version=COMPACT_SCHEMA_VERSION,
+        shard_size=shard_size,
+        repos=repos_index,
+        dependencies=dependencies_index,
+    )
+    manifest_content = manifest.model_dump_json().encode()
+    manifest_path = directory / SHARDS_MANIFEST_NAME
+    if not (manifest_path.is_file() and manifest_path.read_bytes() == manifest_content):
+        async with _open_atomically(manifest_path) as manifest_file:
+            await manifest_file.file.write(manifest_content)
+    await asyncio.to_thread(_remove_stale_shards, directory, manifest)
+    logger.info(
+        "Sharded {repos} repos into {repos_shards} shards, "
+        "and {dependencies} dependencies into {dependencies_shards} shards.",
+        repos=manifest.repos.count,
+        repos_shards=len(manifest.repos.shards),
+        dependencies=manifest.dependencies.count,
+        dependencies_shards=len(manifest.dependencies.shards),
+        enqueue=True,
+    )
+    return manifest
+
+
+def _to_array(rows: Sequence[Sequence[int]]) -> npt.NDArray[np.int64]:
+    """
+    Convert the rows of the integer pairs into a two-column array.
+
+    :param rows: The rows of the integer pairs.
+    :return: The array of the shape ``(len(rows), 2)``.
+    """
+    return np.fromiter(
+        itertools.chain.from_iterable(rows), dtype=np.int64, count=2 * len(rows)
+    ).reshape(-1, 2)
+
+
+async def _write_artifact(path: Path, content: bytes) -> bool:
+    """
+    Write and precompress an artifact built at once, unless it is the same.
+
+    :param path: The path of the artifact.
+    :param content: The content of the artifact.
+    :return: Whether the artifact has been rewritten.
+    """
+    written = not (path.is_file() and path.read_bytes() == content)
+    if written:
+        async with _open_atomically(path) as artifact_file:
+            await artifact_file.file.write(content)
+    if written or not _has_precompressed_variants(path):
+        await asyncio.to_thread(_precompress_index, path)
+    return written
+
+
+async def create_search_index(
+    session_maker: async_sessionmaker[AsyncSession] = async_session_maker,
+    index_path: Path = SEARCH_INDEX_PATH,
+) -> bool:
+    """
+    Create search_index.json file from database.
+
+    The index file is only rewritten, and precompressed, if its content
+    has changed.
+
+    :param session_maker: The session maker of the database engine.
+    :param index_path: The path of the index file.
+    :return: Whether the index file has been rewritten.
+    """
+    async with session_maker() as session, async_session_uow(session):
+        result = await session.stream(
+            sqlalchemy.select(Repo.id, Repo.description)
+            .order_by(Repo.id)
+            .execution_options(yield_per=YIELD_PER)
+        )
+        documents = [(repo_id, description) async for repo_id, description in result]
+    search_index = await asyncio.to_thread(build_search_index, documents)
+    written = await _write_artifact(
+        index_path, _SEARCH_INDEX_ADAPTER.dump_json(search_index)
+    )
+    logger.info(
+        "{index}: {documents} documents, {terms} terms; {status}.",
+        index=index_path.name,
+        documents=len(documents),
+        terms=len(search_index.terms),
+        status="rewritten" if written else "identical, not rewritten",
+        enqueue=True,
+    )
+    return written
+
+
+async def create_dependency_stats(
+    session_maker: async_sessionmaker[AsyncSession] = async_session_maker,
+    stats_path: Path = DEPENDENCY_STATS_PATH,
+    top_k: int = DEFAULT_TOP_K,
+) -> bool:
     """
-    async with async_session_maker() as session, async_session_uow(
-        session
-    ) as session, aiofiles.open(DEPENDENCIES_INDEX_PATH, "w") as index_file:
-        dependencies = [
-            DependencyDetail.model_validate(dependency).model_dump()
-            async for dependency in (
-                await session.stream_scalars(
-                    sqlalchemy.select(Dependency).order_by(Dependency.id)
+    Create dependency_stats.json file from database.
+
+    :param session_maker: The session maker of the database engine.
+    :param stats_path: The path of the statistics file.
+    :param top_k: The maximum number of the co-occurring dependencies
+        per dependency.
+    :return: Whether the statistics file has been rewritten.
+    """
+    async with session_maker() as session, async_session_uow(session):
+        edges = (
+            await session.execute(
+                sqlalchemy.select(RepoDependency.repo_id, RepoDependency.dependency_id)
+            )
+        ).all()
+        repos = (await session.execute(sqlalchemy.select(Repo.id, Repo.stars))).all()
+        dependencies = dict(
+            (
+                await session.execute(
+                    sqlalchemy.select(Dependency.id, Dependency.name).where(
+                        Dependency.name != ""
+                    )
                 )
             )
-            if dependency.name
-        ]
-        await index_file.write(
-            json.dumps(
-                {
-                    "dependencies": dependencies,
-                },
-                indent=4,
+            .tuples()
+            .all()
+        )
+    stats = await asyncio.to_thread(
+        compute_dependency_stats,
+        _to_array(edges),
+        _to_array(repos),
+        dependencies,
+        top_k,
+    )
+    written = await _write_artifact(
+        stats_path, _DEPENDENCY_STATS_INDEX_ADAPTER.dump_json(stats)
+    )
+    logger.info(
+        "{stats}: {dependencies} dependencies of {repos} repos; {status}.",
+        stats=stats_path.name,
+        dependencies=len(stats.dependencies),
+        repos=stats.repo_count,
+        status="rewritten" if written else "identical, not rewritten",
+        enqueue=True,
+    )
+    return written
+
+
+#: A column of a batch of the rows: the values, or an array of them.
+_Column = Sequence[object] | npt.NDArray[np.int32] | npt.NDArray[np.int64]
+
+
+class _ColumnarTableWriter:
+    """
+    A writer of a table into the columnar files, one per format.
+
+    The files are written into the temporary files first, and replace
+    the previous ones only once completely written.
+    """
+
+    def __init__(
+        self: Self,
+        directory: Path,
+        table: str,
+        formats: Sequence[ColumnarFormat],
+    ) -> None:
+        """
+        Initialize the writer.
+
+        :param directory: The directory of the columnar files.
+        :param table: The name of the table.
+        :param formats: The formats to write the table in.
+        """
+        self.schema = COLUMNAR_SCHEMAS[table]
+        self.rows = 0
+        self._paths = {
+            columnar_format: directory / f"{table}.{columnar_format}"
+            for columnar_format in formats
+        }
+        self._writers: list[pa.ipc.RecordBatchFileWriter | pq.ParquetWriter] = []
+
+    def __enter__(self: Self) -> Self:
+        """Open the temporary files."""
+        for columnar_format, path in self._paths.items():
+            if columnar_format == ColumnarFormat.ARROW:
+                self._writers.append(pa.ipc.new_file(_temp_path(path), self.schema))
+            else:
+                self._writers.append(
+                    pq.ParquetWriter(_temp_path(path), self.schema, compression="zstd")
+                )
+        return self
+
+    def __exit__(
+        self: Self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        """Close the temporary files, and replace the previous files with them."""
+        for writer in self._writers:
+            writer.close()
+        for path in self._paths.values():
+            if exc_type is None:
+                _temp_path(path).replace(path)
+            else:
+                _temp_path(path).unlink(missing_ok=True)
+
+    def write(self: Self, columns: Sequence[_Column]) -> None:
+        """
+        Write a batch of the rows.
+
+        :param columns: The columns of the rows, in the order of the schema.
+        """
+        batch = pa.RecordBatch.from_arrays(
+            [
+                pa.array(column, type=field.type)
+                for column, field in zip(columns, self.schema, strict=True)
+            ],
+            schema=self.schema,
+        )
+        for writer in self._writers:
+            writer.write_batch(batch)
+        self.rows += batch.num_rows
+
+
+async def _aiter_columns(
+    session: AsyncSession, statement: sqlalchemy.Select[Any]
+) -> AsyncGenerator[list[tuple[object, ...]], None]:
+    """
+    Stream the columns of the selected rows, a batch at a time.
+
+    :param session: The database session.
+    :param statement: The statement selecting the rows.
+    :return: The batches of the columns.
+    """
+    result = await session.stream(
+        statement.execution_options(yield_per=COLUMNAR_BATCH_SIZE)
+    )
+    async for rows in result.partitions():
+        yield list(zip(*rows, strict=True))
+
+
+async def _export_table(
+    session: AsyncSession,
+    statement: sqlalchemy.Select[Any],
+    writer: _ColumnarTableWriter,
+) -> npt.NDArray[np.int64]:
+    """
+    Export the selected rows ordered by their ids.
+
+    :param session: The database session.
+    :param statement: The statement selecting the rows, the ids first.
+    :param writer: The writer of the table.
+    :return: The sorted ids of the rows, to map them to the row numbers.
+    """
+    ids: list[npt.NDArray[np.int64]] = [np.empty(0, dtype=np.int64)]
+    async for columns in _aiter_columns(session, statement):
+        await asyncio.to_thread(writer.write, columns)
+        ids.append(np.array(columns[0], dtype=np.int64))
+    return np.concatenate(ids)
+
+
+async def export_columnar(
+    session_maker: async_sessionmaker[AsyncSession] = async_session_maker,
+    directory: Path = COLUMNAR_DIRECTORY,
+    formats: Sequence[ColumnarFormat] = (
+        ColumnarFormat.ARROW,
+        ColumnarFormat.PARQUET,
+    ),
+) -> dict[str, int]:
+    """
+    Export the tables into the columnar files.
+
+    The rows are streamed from the database and written in batches, so the
+    memory usage is bounded by the batch size and the ids of the rows.
+    The ``repo_dependency`` table references the repos and the dependencies
+    by both their ids and their dense row numbers, so the tables can be
+    joined by position, without a hash join.
+
+    :param session_maker: The session maker of the database engine.
+    :param directory: The directory of the columnar files.
+    :param formats: The formats to export the tables in.
+    :return: The number of the rows per table.
+    """
+    await aiofiles.os.makedirs(directory, exist_ok=True)
+    async with session_maker() as session, async_session_uow(session):
+        with _ColumnarTableWriter(directory, "repo", formats) as repo_writer:
+            repo_ids = await _export_table(
+                session,
+                sqlalchemy.select(
+                    Repo.id,
+                    Repo.url,
+                    Repo.description,
+                    Repo.stars,
+                    Repo.source_graph_repo_id,
+                    Repo.last_checked_revision,
+                ).order_by(Repo.id),
+                repo_writer,
             )
+        with _ColumnarTableWriter(
+            directory, "dependency", formats
+        ) as dependency_writer:
+            dependency_ids = await _export_table(
+                session,
+                sqlalchemy.select(Dependency.id, Dependency.name).order_by(
+                    Dependency.id
+                ),
+                dependency_writer,
+            )
+        with _ColumnarTableWriter(
+            directory, "repo_dependency", formats
+        ) as repo_dependency_writer:
+            async for columns in _aiter_columns(
+                session,
+                sqlalchemy.select(
+                    RepoDependency.repo_id, RepoDependency.dependency_id
+                ).order_by(RepoDependency.repo_id, RepoDependency.dependency_id),
+            ):
+                edge_repo_ids = np.array(columns[0], dtype=np.int64)
+                edge_dependency_ids = np.array(columns[1], dtype=np.int64)
+                await asyncio.to_thread(
+                    repo_dependency_writer.write,
+                    [
+                        np.searchsorted(repo_ids, edge_repo_ids).astype(np.int32),
+                        np.searchsorted(dependency_ids, edge_dependency_ids).astype(
+                            np.int32
+                        ),
+                        edge_repo_ids,
+                        edge_dependency_ids,
+                    ],
+                )
+    rows = {
+        "repo": repo_writer.rows,
+        "dependency": dependency_writer.rows,
+        "repo_dependency": repo_dependency_writer.rows,
+    }
+    logger.info(
+        "Exported {rows} into {directory} as {formats}.",
+        rows=rows,
+        directory=directory,
+        formats=", ".join(formats),
+        enqueue=True,
+    )
+    return rows
+
+
+@app.command()
+def index_repos(
+    db_profile: Annotated[
+        EngineProfile, typer.Option(help="The profile of the database engine.")
+    ] = EngineProfile.READ_ONLY,
+    index_format: Annotated[
+        IndexFormat, typer.Option(help="The format of the index.")
+    ] = IndexFormat.VERBOSE,
+) -> None:
+    """
+    Create ``repos_index.json``.
+
+    :param db_profile: The profile of the database engine.
+    :param index_format: The format of the index.
+    """
+    asyncio.run(
+        create_repos_index(
+            session_maker=get_session_maker(db_profile), index_format=index_format
         )
+    )
+
+
+@app.command()
+def index_dependencies(
+    db_profile: Annotated[
+        EngineProfile, typer.Option(help="The profile of the database engine.")
+    ] = EngineProfile.READ_ONLY,
+    index_format: Annotated[
+        IndexFormat, typer.Option(help="The format of the index.")
+    ] = IndexFormat.VERBOSE,
+) -> None:
+    """
+    Create ``dependencies_index.json``.
+
+    :param db_profile: The profile of the database engine.
+    :param index_format: The format of the index.
+    """
+    asyncio.run(
+        create_dependencies_index(
+            session_maker=get_session_maker(db_profile), index_format=index_format
+        )
+    )
+
+
+@app.command()
+def index_search(
+    db_profile: Annotated[
+        EngineProfile, typer.Option(help="The profile of the database engine.")
+    ] = EngineProfile.READ_ONLY,
+) -> None:
+    """
+    Create ``search_index.json``.
+
+    :param db_profile: The profile of the database engine.
+    """
+    asyncio.run(create_search_index(session_maker=get_session_maker(db_profile)))
 
 
 @app.command()
-def index_repos() -> None:
-    """Create ``repos_index.json``."""
-    asyncio.run(create_repos_index())
+def index_dependency_stats(
+    top_k: Annotated[
+        int,
+        typer.Option(
+            help="The maximum number of the co-occurring dependencies "
+            "per dependency.",
+            min=0,
+        ),
+    ] = DEFAULT_TOP_K,
+    db_profile: Annotated[
+        EngineProfile, typer.Option(help="The profile of the database engine.")
+    ] = EngineProfile.READ_ONLY,
+) -> None:
+    """
+    Create ``dependency_stats.json``.
+
+    :param top_k: The maximum number of the co-occurring dependencies
+        per dependency.
+    :param db_profile: The profile of the database engine.
+    """
+    asyncio.run(
+        create_dependency_stats(
+            session_maker=get_session_maker(db_profile), top_k=top_k
+        )
+    )
 
 
 @app.command()
-def index_dependencies() -> None:
-    """Create ``dependencies_index.json``."""
-    asyncio.run(create_dependencies_index())
+def index_shards(
+    directory: Annotated[
+        Path, typer.Option(help="The directory of the sharded indexes.")
+    ] = SHARDS_DIRECTORY,
+    shard_size: Annotated[
+        int, typer.Option(help="The maximum number of the items in a shard.", min=1)
+    ] = DEFAULT_SHARD_SIZE,
+    db_profile: Annotated[
+        EngineProfile, typer.Option(help="The profile of the database engine.")
+    ] = EngineProfile.READ_ONLY,
+) -> None:
+    """
+    Create the sharded indexes with their ``manifest.json``.
+
+    :param directory: The directory of the sharded indexes.
+    :param shard_size: The maximum number of the items in a shard.
+    :param db_profile: The profile of the database engine.
+    """
+    asyncio.run(
+        create_sharded_indexes(
+            session_maker=get_session_maker(db_profile),
+            directory=directory,
+            shard_size=shard_size,
+        )
+    )
+
+
+@app.command("export-columnar")
+def export_columnar_command(
+    directory: Annotated[
+        Path, typer.Option(help="The directory of the columnar files.")
+    ] = COLUMNAR_DIRECTORY,
+    columnar_formats: Annotated[
+        Optional[  # noqa: UP007 - typer does not support the union syntax
+            list[ColumnarFormat]
+        ],
+        typer.Option(
+            "--format",
+            help="The format to export the tables in; repeat for more formats. "
+            "All the formats by default.",
+        ),
+    ] = None,
+    db_profile: Annotated[
+        EngineProfile, typer.Option(help="The profile of the database engine.")
+    ] = EngineProfile.READ_ONLY,
+) -> None:
+    """
+    Export the tables into the Arrow IPC and Parquet files.
+
+    :param directory: The directory of the columnar files.
+    :param columnar_formats: The formats to export the tables in.
+    :param db_profile: The profile of the database engine.
+    """
+    asyncio.run(
+        export_columnar(
+            session_maker=get_session_maker(db_profile),
+            directory=directory,
+            formats=columnar_formats or list(ColumnarFormat),
+        )
+    )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,185 @@
+"""
+The manifests of the index files.
+
+A manifest is stored next to its index, and records the content hash of each
+item of the index, and where the item is in the index file. The next
+generation of the index only serialises the items whose content hash has
+changed, and copies the rest from the previous index file.
+
+The manifest is only trusted if the digest of the index file matches the one
+recorded in it, so an index edited or regenerated without the manifest is
+simply rebuilt from scratch.
+
+The items of a manifest are fixed-size binary records in the order of their
+ids, followed by the JSON header and its length. The items are written as
+they arrive, and read through a memory map with a cursor moving forward in
+step with the ids of the next generation, so neither generation is ever
+held in memory.
+"""
+import contextlib
+import hashlib
+import json
+import mmap
+import struct
+from collections.abc import Generator, Iterable
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Final, Self
+
+from pydantic import BaseModel, NonNegativeInt
+
+#: The size of the content hashes of the items in bytes.
+HASH_SIZE: Final[int] = 16
+#: The layout of an item: its id, offset, length and content hash.
+_ITEM: Final[struct.Struct] = struct.Struct(f"<qQQ{HASH_SIZE}s")
+#: The layout of the length of the header at the end of a manifest.
+_HEADER_LENGTH: Final[struct.Struct] = struct.Struct("<I")
+
+
+@dataclass(frozen=True, slots=True)
+class IndexManifestItem:
+    """An item of an index file."""
+
+    #: The id of the item.
+    id: int
+    #: The hash of the content the item is serialised from.
+    hash: bytes
+    #: The offset of the serialised item in the index file.
+    offset: int
+    #: The length of the serialised item in bytes.
+    length: int
+
+
+class IndexManifest(BaseModel):
+    """The header of the manifest of an index file."""
+
+    #: The format of the index file.
+    index_format: str
+    #: The number of the times the index file has been changed.
+    generation: NonNegativeInt
+    #: The SHA-256 digest of the index file.
+    digest: str
+    #: The number of the items of the index file.
+    count: NonNegativeInt
+
+
+class ManifestReader:
+    """The items of a manifest, looked up in the order of their ids."""
+
+    def __init__(self: Self, header: IndexManifest, content: mmap.mmap) -> None:
+        """
+        Initialize the reader at the first item.
+
+        :param header: The header of the manifest.
+        :param content: The content of the manifest file, the items first.
+        """
+        self.header = header
+        self._content = content
+        self._position = 0
+
+    def find(self: Self, item_id: int) -> IndexManifestItem | None:
+        """
+        Find the item with the given id.
+
+        The items skipped on the way are never looked at again, so the ids
+        have to be looked up in ascending order.
+
+        :param item_id: The id of the item.
+        :return: The item, or ``None`` if it is not in the manifest.
+        """
+        while self._position < self.header.count:
+            record_id, offset, length, item_hash = _ITEM.unpack_from(
+                self._content, self._position * _ITEM.size
+            )
+            if record_id > item_id:
+                return None
+            self._position += 1
+            if record_id == item_id:
+                return IndexManifestItem(
+                    id=record_id, hash=item_hash, offset=offset, length=length
+                )
+        return None
+
+
+def pack_item(item: IndexManifestItem) -> bytes:
+    """
+    Pack an item into its record in the manifest file.
+
+    :param item: The item of the index file.
+    :return: The record of the item.
+    """
+    return _ITEM.pack(item.id, item.offset, item.length, item.hash)
+
+
+def pack_header(header: IndexManifest) -> bytes:
+    """
+    Pack the header written at the end of the manifest file, after the items.
+
+    :param header: The header of the manifest.
+    :return: The header followed by its length.
+    """
+    header_json = header.model_dump_json().encode()
+    return header_json + _HEADER_LENGTH.pack(len(header_json))
+
+
+def manifest_path_of(index_path: Path) -> Path:
+    """
+    Return the path of the manifest of the index.
+
+    :param index_path: The path of the index file.
+    :return: The path of the manifest file next to the index.
+    """
+    return index_path.with_name(f"{index_path.stem}.manifest")
+
+
+@contextlib.contextmanager
+def open_manifest(index_path: Path) -> Generator[ManifestReader | None, None, None]:
+    """
+    Open the manifest of the index, memory-mapping the manifest file.
+
+    :param index_path: The path of the index file.
+    :return: The reader of the manifest, or ``None`` if it does not exist
+        or cannot be read.
+    """
+    with contextlib.ExitStack() as stack:
+        reader = None
+        with contextlib.suppress(OSError, ValueError):
+            manifest_file = stack.enter_context(manifest_path_of(index_path).open("rb"))
+            reader = _read_manifest(
+                stack.enter_context(
+                    mmap.mmap(manifest_file.fileno(), 0, access=mmap.ACCESS_READ)
+                )
+            )
+        yield reader
+
+
+def _read_manifest(content: mmap.mmap) -> ManifestReader | None:
+    """
+    Read the header of a manifest, and check the size of its items.
+
+    :param content: The content of the manifest file.
+    :return: The reader of the manifest, or ``None`` if it is malformed.
+    """
+    header_end = len(content) - _HEADER_LENGTH.size
+    if header_end < 0:
+        return None
+    (header_length,) = _HEADER_LENGTH.unpack_from(content, header_end)
+    items_size = header_end - header_length
+    if items_size < 0:
+        return None
+    header = IndexManifest.model_validate_json(content[items_size:header_end])
+    if header.count * _ITEM.size != items_size:
+        return None
+    return ManifestReader(header, content)
+
+
+def hash_row(values: Iterable[object]) -> bytes:
+    """
+    Hash the values an index item is serialised from.
+
+    :param values: The JSON-serialisable values.
+    :return: The digest of the values.
+    """
+    return hashlib.blake2b(
+        json.dumps(list(values), ensure_ascii=False).encode(), digest_size=HASH_SIZE
+    ).digest()
@@ -0,0 +1,168 @@
+"""
+The logging of the repos handled by the scraping and the parsing runs.
+
+In the verbose mode, the default, every step of every repo is logged.
+In the summary mode the steps of a repo are collapsed into a single summary
+record, logged once the repo is finished, with the details noted on the way
+bound to the record as the extra fields. The steps are only logged in
+detail for a sample of the repos, every n-th one by its id.
+
+A progress line is logged every given number of the finished repos in both
+modes.
+
+The detail logs are guarded with :meth:`RepoLog.detailed`, so no record is
+created at all for the repos out of the sample. The repo a step belongs to
+is taken from the :meth:`RepoLog.repo` context, so the steps deep in the call
+stack need no repo id passed down to them.
+"""
+import time
+from collections import Counter
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from enum import StrEnum
+from typing import Final, Self
+
+from loguru import logger
+
+
+class LogMode(StrEnum):
+    """The way the repos are logged."""
+
+    #: Log every step of every repo.
+    VERBOSE = "verbose"
+    #: Log a summary record per repo, and the steps of a sample of the repos.
+    SUMMARY = "summary"
+
+
+#: The default number of the finished repos between the progress lines.
+DEFAULT_PROGRESS_EVERY: Final[int] = 1000
+#: The default sampling of the detail logs in the summary mode,
+#: every n-th repo by its id is logged in detail.
+DEFAULT_SAMPLE_EVERY: Final[int] = 100
+
+#: The id of the repo the current step belongs to.
+_current_repo_id: ContextVar[int | None] = ContextVar("_current_repo_id", default=None)
+
+
+class RepoLog:
+    """The logging of the repos of a run."""
+
+    def __init__(self: Self) -> None:
+        """Initialize the logging in the verbose mode."""
+        self.configure(LogMode.VERBOSE, DEFAULT_PROGRESS_EVERY, DEFAULT_SAMPLE_EVERY)
+
+    def configure(
+        self: Self, mode: LogMode, progress_every: int, sample_every: int
+    ) -> None:
+        """
+        Set the logging up for a new run.
+
+        :param mode: The way the repos are logged.
+        :param progress_every: The number of the finished repos
+            between the progress lines.
+        :param sample_every: Log every n-th repo in detail in the summary mode.
+        """
+        if progress_every < 1 or sample_every < 1:
+            raise ValueError(
+                "The progress and the sampling intervals must be positive."
+            )
+        self.mode = mode
+        self._progress_every = progress_every
+        self._sample_every = sample_every
+        self._started_at = time.monotonic()
+        self._outcomes: Counter[str] = Counter()
+        self._summaries: dict[int, dict[str, object]] = {}
+
+    @property
+    def outcomes(self: Self) -> dict[str, int]:
+        """The number of the finished repos per their outcomes."""
+        return dict(self._outcomes)
+
+    @contextmanager
+    def repo(self: Self, repo_id: int) -> Iterator[None]:
+        """
+        Attribute the steps in the block to the repo.
+
+        :param repo_id: The id of the repo.
+        :return: The context manager of the repo.
+        """
+        token = _current_repo_id.set(repo_id)
+        try:
+            yield
+        finally:
+            _current_repo_id.reset(token)
+
+    def detailed(self: Self, key: int | None = None) -> bool:
+        """
+        Return whether to log the current step in detail.
+
+        :param key: The id to sample by, the current repo id if not given.
+            The steps of no repo are only logged in the verbose mode.
+        :return: Whether the step is logged.
+        """
+        if self.mode is LogMode.VERBOSE:
+            return True
+        if key is None and (key := _current_repo_id.get()) is None:
+            return False
+        return key % self._sample_every == 0
+
+    def note(self: Self, **fields: object) -> None:
+        """
+        Note the details of the current repo for its summary record.
+
+        :param fields: The details, e.g. the number of its dependencies.
+        """
+        if self.mode is LogMode.VERBOSE:
+            return
+        if (repo_id := _current_repo_id.get()) is not None:
+            self._summaries.setdefault(repo_id, {}).update(fields)
+
+    def finish(self: Self, repo_id: int, outcome: str, **fields: object) -> None:
+        """
+        Log the summary record of the finished repo in the summary mode.
+
+        :param repo_id: The id of the repo.
+        :param outcome: How the repo has finished, e.g. ``persisted``.
+        :param fields: The details of the repo not noted yet.
+        """
+        summary = self._summaries.pop(repo_id, {}) | fields
+        if self.mode is LogMode.SUMMARY:
+            logger.info(
+                "Repo {repo_id} {outcome}: {details}."
+                if summary
+                else "Repo {repo_id} {outcome}.",
+                repo_id=repo_id,
+                outcome=outcome,
+                details=" ".join(f"{name}={value}" for name, value in summary.items()),
+                enqueue=True,
+                **summary,
+            )
+        self.progress(outcome)
+
+    def progress(self: Self, outcome: str, count: int = 1) -> None:
+        """
+        Count the finished repos, and log a progress line every so many.
+
+        :param outcome: How the repos have finished.
+        :param count: The number of the finished repos.
+        """
+        finished_before = self._outcomes.total()
+        self._outcomes[outcome] += count
+        finished = finished_before + count
+        if finished // self._progress_every == finished_before // self._progress_every:
+            return
+        elapsed = time.monotonic() - self._started_at
+        logger.info(
+            "Progress: {finished} repos finished ({rate:.1f}/s), {outcomes}.",
+            finished=finished,
+            rate=finished / elapsed if elapsed else 0.0,
+            outcomes=", ".join(
+                f"{name} {value}" for name, value in sorted(self._outcomes.items())
+            ),
+            enqueue=True,
+        )
+
+
+#: The logging of the repos of the current run.
+repo_log: Final[RepoLog] = RepoLog()
@@ -0,0 +1,320 @@
+"""
+The runtime metrics of the scraping and the parsing runs.
+
+The stages of a run are wrapped in the timing spans: each span counts its
+duration into the fixed buckets of the histogram of its name, so the memory
+does not grow with the length of a run, counts its errors, and tracks how
+many spans of that name are in flight. The counters count the items handled
+by a run, e.g. the scraped repos.
+
+At the end of a run the metrics are written out as a JSON run report with
+the p50, p95 and p99 durations of the spans estimated from the buckets, and
+as a file in the Prometheus text format, e.g. for the textfile collector of
+the node exporter.
+
+The metrics are collected into the module-level :data:`metrics` registry,
+the same way the logs go to the :mod:`loguru` logger, so the spans deep in
+the call stack need no registry passed down to them.
+"""
+import bisect
+import itertools
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Final, Self
+
+from pydantic import BaseModel, NonNegativeFloat, NonNegativeInt
+
+#: The default directory of the run reports.
+DEFAULT_METRICS_DIRECTORY: Final[Path] = Path(__file__).parent.parent / "metrics"
+#: The prefix of the names of the Prometheus metrics.
+METRICS_PREFIX: Final[str] = "awesome_fastapi_projects"
+#: The upper bounds of the buckets of the Prometheus histograms in seconds.
+HISTOGRAM_BUCKETS: Final[tuple[float, ...]] = (
+    0.001,
+    0.005,
+    0.01,
+    0.05,
+    0.1,
+    0.5,
+    1.0,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    300.0,
+)
+
+
+class Histogram:
+    """The durations of the spans of a name, counted into the fixed buckets."""
+
+    def __init__(self: Self) -> None:
+        """Initialize the histogram."""
+        # The last bucket counts the durations above the highest bound
+        self._counts = [0] * (len(HISTOGRAM_BUCKETS) + 1)
+        #: The number of the observed durations.
+        self.count = 0
+        #: The sum of the observed durations in seconds.
+        self.sum = 0.0
+        #: The longest observed duration in seconds.
+        self.max = 0.0
+
+    def observe(self: Self, duration: float) -> None:
+        """
+        Observe a duration.
+
+        :param duration: The duration in seconds.
+        """
+        self._counts[bisect.bisect_left(HISTOGRAM_BUCKETS, duration)] += 1
+        self.count += 1
+        self.sum += duration
+        self.max = max(self.max, duration)
+
+    def quantile(self: Self, q: float) -> float:
+        """
+        Estimate the quantile of the durations, as Prometheus does.
+
+        The quantile is interpolated linearly within the bucket it falls into,
+        and is never above the longest duration.
+
+        :param q: The quantile between 0 and 1.
+        :return: The duration in seconds, 0 if nothing has been observed.
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        below = 0
+        lower_bound = 0.0
+        for upper_bound, count in zip(HISTOGRAM_BUCKETS, self._counts, strict=False):
+            if count and below + count >= rank:
+                estimate = lower_bound + (upper_bound - lower_bound) * (
+                    (rank - below) / count
+                )
+                return min(estimate, self.max)
+            below += count
+            lower_bound = upper_bound
+        return self.max
+
+    def cumulative_counts(self: Self) -> list[int]:
+        """
+        Return the number of the durations up to each bucket bound.
+
+        :return: The cumulative counts per bound of :data:`HISTOGRAM_BUCKETS`.
+        """
+        return list(itertools.accumulate(self._counts[:-1]))
+
+
+class SpanReport(BaseModel):
+    """The statistics of the spans of a name in a run report."""
+
+    #: The number of the finished spans.
+    count: NonNegativeInt
+    #: The number of the spans finished with an exception.
+    errors: NonNegativeInt
+    #: The total duration of the spans in seconds.
+    total: NonNegativeFloat
+    #: The median duration of the spans in seconds.
+    p50: NonNegativeFloat
+    #: The 95th percentile of the durations of the spans in seconds.
+    p95: NonNegativeFloat
+    #: The 99th percentile of the durations of the spans in seconds.
+    p99: NonNegativeFloat
+    #: The longest duration of the spans in seconds.
+    max: NonNegativeFloat
+    #: The maximum number of the spans in flight at once.
+    max_in_flight: NonNegativeInt
+
+
+class RunReport(BaseModel):
+    """The report of a run."""
+
+    #: The name of the run, e.g. the command.
+    run: str
+    #: The Unix time the run has started at.
+    started_at: float
+    #: The duration of the run in seconds.
+    duration: NonNegativeFloat
+    #: The statistics of the spans per their names.
+    spans: dict[str, SpanReport]
+    #: The values of the counters per their names.
+    counters: dict[str, NonNegativeInt]
+
+
+class Metrics:
+    """The registry of the spans and the counters of a run."""
+
+    def __init__(self: Self) -> None:
+        """Initialize the registry."""
+        self.reset()
+
+    def reset(self: Self) -> None:
+        """Drop all the metrics and start a new run."""
+        self._started_at = time.time()
+        self._started_at_monotonic = time.perf_counter()
+        self._histograms: dict[str, Histogram] = {}
+        self._errors: dict[str, int] = {}
+        self._in_flight: dict[str, int] = {}
+        self._max_in_flight: dict[str, int] = {}
+        self._counters: dict[str, int] = {}
+
+    @contextmanager
+    def span(self: Self, name: str) -> Iterator[None]:
+        """
+        Time the block as a span of the given name.
+
+        The span also wraps the awaits of the block, so it times a whole
+        coroutine step, waiting on the network or the database included.
+
+        :param name: The name of the span, e.g. the stage.
+        :return: The context manager of the span.
+        """
+        in_flight = self._in_flight.get(name, 0) + 1
+        self._in_flight[name] = in_flight
+        if in_flight > self._max_in_flight.get(name, 0):
+            self._max_in_flight[name] = in_flight
+        started_at = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self._errors[name] = self._errors.get(name, 0) + 1
+            raise
+        finally:
+            if (histogram := self._histograms.get(name)) is None:
+                histogram = self._histograms[name] = Histogram()
+            histogram.observe(time.perf_counter() - started_at)
+            self._in_flight[name] -= 1
+
+    def count(self: Self, name: str, value: int = 1) -> None:
+        """
+        Increment the counter of the given name.
+
+        :param name: The name of the counter.
+        :param value: The increment.
+        """
+        self._counters[name] = self._counters.get(name, 0) + value
+
+    def in_flight(self: Self, name: str) -> int:
+        """
+        Return the number of the spans of the given name in flight right now.
+
+        :param name: The name of the spans.
+        :return: The number of the unfinished spans.
+        """
+        return self._in_flight.get(name, 0)
+
+    def report(self: Self, run: str) -> RunReport:
+        """
+        Return the report of the run so far.
+
+        :param run: The name of the run.
+        :return: The run report.
+        """
+        return RunReport(
+            run=run,
+            started_at=self._started_at,
+            duration=time.perf_counter() - self._started_at_monotonic,
+            spans={
+                name: SpanReport(
+                    count=histogram.count,
+                    errors=self._errors.get(name, 0),
+                    total=histogram.sum,
+                    p50=histogram.quantile(0.5),
+                    p95=histogram.quantile(0.95),
+                    p99=histogram.quantile(0.99),
+                    max=histogram.max,
+                    max_in_flight=self._max_in_flight.get(name, 0),
+                )
+                for name, histogram in sorted(self._histograms.items())
+            },
+            counters=dict(sorted(self._counters.items())),
+        )
+
+    def to_prometheus(self: Self, report: RunReport) -> str:
+        """
+        Return the metrics of the run in the Prometheus text format.
+
+        :param report: The report of the run, named in the ``run`` label.
+        :return: The text of the metrics.
+        """
+        run = report.run
+        lines = [
+            f"# HELP {METRICS_PREFIX}_run_start_time_seconds "
+            "The Unix time the run has started at.",
+            f"# TYPE {METRICS_PREFIX}_run_start_time_seconds gauge",
+            f'{METRICS_PREFIX}_run_start_time_seconds{{run="{run}"}} '
+            f"{report.started_at}",
+            f"# HELP {METRICS_PREFIX}_run_duration_seconds The duration of the run.",
+            f"# TYPE {METRICS_PREFIX}_run_duration_seconds gauge",
+            f'{METRICS_PREFIX}_run_duration_seconds{{run="{run}"}} {report.duration}',
+        ]
+        name = f"{METRICS_PREFIX}_span_duration_seconds"
+        lines += [
+            f"# HELP {name} The duration of the spans.",
+            f"# TYPE {name} histogram",
+        ]
+        for span, histogram in sorted(self._histograms.items()):
+            labels = f'run="{run}",span="{span}"'
+            counts = histogram.cumulative_counts()
+            lines += [
+                f'{name}_bucket{{{labels},le="{bound}"}} {count}'
+                for bound, count in zip(HISTOGRAM_BUCKETS, counts, strict=True)
+            ]
+            lines += [
+                f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}',
+                f"{name}_sum{{{labels}}} {histogram.sum}",
+                f"{name}_count{{{labels}}} {histogram.count}",
+            ]
+        for name, help_text, values in (
+            (
+                f"{METRICS_PREFIX}_span_errors_total",
+                "The number of the spans finished with an exception.",
+                {span: stats.errors for span, stats in report.spans.items()},
+            ),
+            (
+                f"{METRICS_PREFIX}_span_max_in_flight",
+                "The maximum number of the spans in flight at once.",
+                {span: stats.max_in_flight for span, stats in report.spans.items()},
+            ),
+        ):
+            kind = "counter" if name.endswith("_total") else "gauge"
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+            lines += [
+                f'{name}{{run="{run}",span="{span}"}} {value}'
+                for span, value in values.items()
+            ]
+        for counter, value in report.counters.items():
+            name = f"{METRICS_PREFIX}_{counter}_total"
+            lines += [
+                f"# TYPE {name} counter",
+                f'{name}{{run="{run}"}} {value}',
+            ]
+        return "\n".join(lines) + "\n"
+
+    def write(self: Self, directory: Path, run: str) -> RunReport:
+        """
+        Write the JSON run report and the Prometheus metrics of the run.
+
+        The files are named after the run, and replace the ones of the previous
+        run of the same name. Each file is written next to its final path first
+        and then renamed, so a collector never reads a partial file.
+
+        :param directory: The directory to write the files into.
+        :param run: The name of the run.
+        :return: The run report.
+        """
+        directory.mkdir(parents=True, exist_ok=True)
+        report = self.report(run)
+        for path, content in (
+            (directory / f"{run}.json", report.model_dump_json(indent=2)),
+            (directory / f"{run}.prom", self.to_prometheus(report)),
+        ):
+            temporary_path = path.with_name(f"{path.name}.tmp")
+            temporary_path.write_text(content)
+            temporary_path.replace(path)
+        return report
+
+
+#: The metrics of the current run.
+metrics: Final[Metrics] = Metrics()
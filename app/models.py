@@ -1,6 +1,6 @@
 """Module contains the models for the application."""
 
-from pydantic import BaseModel, ConfigDict, NonNegativeInt
+from pydantic import BaseModel, ConfigDict, Field, NonNegativeInt
 
 from app.types import DependencyId, RepoId, RevisionHash, SourceGraphRepoId
 
@@ -11,6 +11,14 @@ class DependencyCreateData(BaseModel):
     name: str
 
 
+class RepoDependenciesCreateData(BaseModel):
+    """The dependencies of a repository parsed at a revision."""
+
+    repo_id: RepoId
+    revision: RevisionHash
+    dependencies: list[DependencyCreateData]
+
+
 class DependencyDetail(BaseModel):
     """A dependency of a repository."""
 
@@ -22,6 +30,13 @@ class DependencyDetail(BaseModel):
     name: str
 
 
+class DependencyIndexDetail(DependencyDetail):
+    """A dependency in the dependencies index, with the repos depending on it."""
+
+    #: The delta-encoded sorted ids of the repos, see :mod:`app.postings`.
+    repo_id_deltas: list[int]
+
+
 class RepoDetail(BaseModel):
     """A repository that is being tracked."""
 
@@ -36,3 +51,108 @@ class RepoDetail(BaseModel):
     source_graph_repo_id: SourceGraphRepoId | None
     dependencies: list[DependencyDetail]
     last_checked_revision: RevisionHash | None
+
+
+class CompactDependencyDetail(BaseModel):
+    """A dependency in the compact index, with the repos depending on it."""
+
+    id: DependencyId = Field(serialization_alias="i")
+    name: str = Field(serialization_alias="n")
+    repo_id_deltas: list[int] = Field(serialization_alias="q")
+
+
+class CompactRepoDetail(BaseModel):
+    """A repository in the compact index, referencing its dependencies by id."""
+
+    id: RepoId = Field(serialization_alias="i")
+    url: str = Field(serialization_alias="u")
+    description: str = Field(serialization_alias="d")
+    stars: NonNegativeInt = Field(serialization_alias="s")
+    source_graph_repo_id: SourceGraphRepoId | None = Field(serialization_alias="g")
+    dependency_ids: list[DependencyId] = Field(serialization_alias="p")
+    last_checked_revision: RevisionHash | None = Field(serialization_alias="r")
+
+
+class IndexShard(BaseModel):
+    """A shard of a sharded index."""
+
+    #: The name of the shard file, including the hash of its content.
+    path: str
+    #: The number of the items in the shard.
+    count: NonNegativeInt
+    #: The hash of the content of the shard.
+    hash: str
+
+
+class ShardedIndex(BaseModel):
+    """An index split into the shards."""
+
+    #: The number of the items in all the shards.
+    count: NonNegativeInt
+    #: The shards, in order.
+    shards: list[IndexShard]
+
+
+class IndexShardsManifest(BaseModel):
+    """The manifest of the sharded indexes."""
+
+    #: The version of the schema of the shards.
+    schema_version: int
+    #: The maximum number of the items in a shard.
+    shard_size: NonNegativeInt
+    #: The repos, ordered by the stars, the most starred first.
+    repos: ShardedIndex
+    #: The dependencies, ordered by their ids.
+    dependencies: ShardedIndex
+
+
+class SearchIndex(BaseModel):
+    """The inverted index of the repo descriptions, see :mod:`app.search_index`."""
+
+    #: The version of the schema of the search index.
+    schema_version: int
+    #: The term frequency saturation of BM25.
+    k1: float
+    #: The document length normalisation of BM25.
+    b: float
+    #: The average number of the terms in a document.
+    average_length: float
+    #: The delta-encoded ids of the repos; a document is an index into them.
+    document_id_deltas: list[int]
+    #: The BM25 length norm of each document, ``k1 * (1 - b + b * length / avg)``.
+    norms: list[float]
+    #: The sorted term dictionary.
+    terms: list[str]
+    #: The delta-encoded documents containing each term.
+    posting_deltas: list[list[int]]
+    #: The frequencies of each term in the documents containing it.
+    frequencies: list[list[int]]
+
+
+class DependencyStats(BaseModel):
+    """The popularity of a dependency, and the dependencies used with it."""
+
+    #: The id of the dependency.
+    id: DependencyId
+    #: The name of the dependency.
+    name: str
+    #: The number of the repos using the dependency.
+    repo_count: NonNegativeInt
+    #: The total number of the stars of the repos using the dependency.
+    star_count: NonNegativeInt
+    #: The ids of the dependencies most often used together with this one,
+    #: the most often first.
+    co_occurrence_ids: list[DependencyId]
+    #: The numbers of the repos using each of them together with this one.
+    co_occurrence_counts: list[NonNegativeInt]
+
+
+class DependencyStatsIndex(BaseModel):
+    """The statistics of the dependencies, see :mod:`app.dependency_stats`."""
+
+    #: The number of the repos.
+    repo_count: NonNegativeInt
+    #: The maximum number of the co-occurring dependencies per dependency.
+    top_k: NonNegativeInt
+    #: The statistics of the dependencies, the most used first.
+    dependencies: list[DependencyStats]
@@ -0,0 +1,319 @@
+"""
+A pipeline of stages connected with bounded queues.
+
+Each stage has its own pool of workers, so the stages bound by different
+resources (the network, the CPU, the database) are limited independently.
+A stage hands its results over to the queue of the next stage, and a full
+queue blocks the workers of the previous one, so the work in progress is
+always bounded.
+
+A handler returning ``None`` drops the item, and a handler raising an exception
+fails it; neither stops the pipeline. The queue depths and the throughput of
+the stages are logged periodically while the pipeline runs, and each call
+of a handler is timed as a span named after its stage, see :mod:`app.metrics`.
+
+A batch stage handles the items in batches instead: a batch is handled once
+it is full, or once the given time has passed since its first item arrived.
+"""
+import abc
+import asyncio
+import time
+from collections.abc import AsyncIterable, Awaitable, Callable, Sequence
+from dataclasses import dataclass
+from typing import Any, Final, Generic, Self, TypeVar
+
+from loguru import logger
+
+from app.metrics import metrics
+
+#: The default interval between the progress reports in seconds.
+DEFAULT_REPORT_INTERVAL: Final[float] = 30.0
+
+InputT = TypeVar("InputT")
+OutputT = TypeVar("OutputT")
+
+
+@dataclass(slots=True)
+class StageStats:
+    """The runtime statistics of a stage."""
+
+    #: The number of the items handled without an error, including the dropped ones.
+    processed: int = 0
+    #: The number of the items the handler returned ``None`` for.
+    dropped: int = 0
+    #: The number of the items the handler raised an exception for.
+    failed: int = 0
+    #: The number of the items being handled right now.
+    in_flight: int = 0
+    #: The number of the batches handled, for a batch stage.
+    batches: int = 0
+
+
+class BaseStage(abc.ABC, Generic[InputT, OutputT]):
+    """A stage of a pipeline, handling the items of its queue with its workers."""
+
+    def __init__(self: Self, name: str, workers: int, queue_size: int) -> None:
+        """
+        Initialize the stage.
+
+        :param name: The name of the stage used in the reports.
+        :param workers: The number of the concurrent workers.
+        :param queue_size: The maximum number of the items waiting in the queue.
+        """
+        self.name = name
+        self.workers = workers
+        self.stats = StageStats()
+        # ``None`` tells a worker to stop
+        self._queue: asyncio.Queue[InputT | None] = asyncio.Queue(maxsize=queue_size)
+
+    @property
+    def queue_depth(self: Self) -> int:
+        """The number of the items waiting in the queue."""
+        return self._queue.qsize()
+
+    @property
+    def queue_size(self: Self) -> int:
+        """The maximum number of the items waiting in the queue."""
+        return self._queue.maxsize
+
+    async def put(self: Self, item: InputT) -> None:
+        """
+        Put an item into the queue, waiting for a free slot.
+
+        :param item: The item to handle.
+        """
+        await self._queue.put(item)
+
+    async def stop(self: Self, workers: Sequence[asyncio.Task[None]]) -> None:
+        """
+        Stop the workers once they have handled all the queued items.
+
+        :param workers: The worker tasks of the stage.
+        """
+        for _ in workers:
+            await self._queue.put(None)
+        await asyncio.wait(workers)
+
+    @abc.abstractmethod
+    async def work(self: Self, downstream: "BaseStage[OutputT, Any] | None") -> None:
+        """
+        Handle the queued items until stopped.
+
+        :param downstream: The stage to hand the results over to.
+        """
+
+
+class Stage(BaseStage[InputT, OutputT]):
+    """A stage handling the items one by one."""
+
+    def __init__(
+        self: Self,
+        name: str,
+        handler: Callable[[InputT], Awaitable[OutputT | None]],
+        workers: int,
+        queue_size: int,
+    ) -> None:
+        """
+        Initialize the stage.
+
+        :param name: The name of the stage used in the reports.
+        :param handler: The function to handle an item with.
+        :param workers: The number of the concurrent workers.
+        :param queue_size: The maximum number of the items waiting in the queue.
+        """
+        super().__init__(name=name, workers=workers, queue_size=queue_size)
+        self._handler = handler
+
+    async def work(self: Self, downstream: BaseStage[OutputT, Any] | None) -> None:
+        """
+        Handle the queued items until stopped.
+
+        :param downstream: The stage to hand the results over to.
+        """
+        while (item := await self._queue.get()) is not None:
+            self.stats.in_flight += 1
+            try:
+                with metrics.span(self.name):
+                    result = await self._handler(item)
+            except Exception:
+                self.stats.failed += 1
+                logger.exception(
+                    "The {stage} stage failed to handle an item.",
+                    stage=self.name,
+                    enqueue=True,
+                )
+                continue
+            finally:
+                self.stats.in_flight -= 1
+            self.stats.processed += 1
+            if result is None:
+                self.stats.dropped += 1
+                metrics.count(f"{self.name}_dropped")
+            elif downstream is not None:
+                await downstream.put(result)
+
+
+class BatchStage(BaseStage[InputT, OutputT]):
+    """
+    A stage handling the items in batches.
+
+    A batch is handled once it has the maximum number of the items, or once
+    the maximum delay has passed since its first item arrived. The handler
+    returns a single result per batch.
+    """
+
+    def __init__(
+        self: Self,
+        name: str,
+        handler: Callable[[list[InputT]], Awaitable[OutputT | None]],
+        workers: int,
+        queue_size: int,
+        max_batch_size: int,
+        max_batch_delay: float,
+    ) -> None:
+        """
+        Initialize the stage.
+
+        :param name: The name of the stage used in the reports.
+        :param handler: The function to handle a batch of the items with.
+        :param workers: The number of the concurrent workers.
+        :param queue_size: The maximum number of the items waiting in the queue.
+        :param max_batch_size: The maximum number of the items in a batch.
+        :param max_batch_delay: The maximum time to wait for a batch to fill up
+            in seconds.
+        """
+        super().__init__(name=name, workers=workers, queue_size=queue_size)
+        self._handler = handler
+        self._max_batch_size = max_batch_size
+        self._max_batch_delay = max_batch_delay
+
+    async def _next_batch(self: Self) -> tuple[list[InputT], bool]:
+        """
+        Collect the next batch of the items.
+
+        :return: The batch, and whether the worker has been told to stop.
+        """
+        loop = asyncio.get_running_loop()
+        if (item := await self._queue.get()) is None:
+            return [], True
+        batch = [item]
+        deadline = loop.time() + self._max_batch_delay
+        while len(batch) < self._max_batch_size:
+            try:
+                item = await asyncio.wait_for(
+                    self._queue.get(), timeout=max(deadline - loop.time(), 0)
+                )
+            except TimeoutError:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    async def work(self: Self, downstream: BaseStage[OutputT, Any] | None) -> None:
+        """
+        Handle the queued items in batches until stopped.
+
+        :param downstream: The stage to hand the results over to.
+        """
+        stopped = False
+        while not stopped:
+            batch, stopped = await self._next_batch()
+            if not batch:
+                continue
+            self.stats.in_flight += len(batch)
+            metrics.count(f"{self.name}_items", len(batch))
+            try:
+                with metrics.span(self.name):
+                    result = await self._handler(batch)
+            except Exception:
+                self.stats.failed += len(batch)
+                logger.exception(
+                    "The {stage} stage failed to handle a batch of {count} items.",
+                    stage=self.name,
+                    count=len(batch),
+                    enqueue=True,
+                )
+                continue
+            finally:
+                self.stats.in_flight -= len(batch)
+            self.stats.processed += len(batch)
+            self.stats.batches += 1
+            if result is None:
+                self.stats.dropped += len(batch)
+            elif downstream is not None:
+                await downstream.put(result)
+
+
+def _log_stages_stats(stages: Sequence[BaseStage[Any, Any]], elapsed: float) -> None:
+    """
+    Log the queue depths and the throughput of the stages.
+
+    :param stages: The stages of the pipeline.
+    :param elapsed: The time since the start of the pipeline in seconds.
+    """
+    for stage in stages:
+        logger.info(
+            "Stage {stage}: queue {queue_depth}/{queue_size}, "
+            "in flight {in_flight}/{workers}, processed {processed} "
+            "({throughput:.2f}/s), dropped {dropped}, failed {failed}.",
+            stage=stage.name,
+            queue_depth=stage.queue_depth,
+            queue_size=stage.queue_size,
+            in_flight=stage.stats.in_flight,
+            workers=stage.workers,
+            processed=stage.stats.processed,
+            throughput=stage.stats.processed / elapsed if elapsed else 0.0,
+            dropped=stage.stats.dropped,
+            failed=stage.stats.failed,
+            enqueue=True,
+        )
+
+
+async def _report_periodically(
+    stages: Sequence[BaseStage[Any, Any]], started_at: float, interval: float
+) -> None:
+    """
+    Log the statistics of the stages every interval.
+
+    :param stages: The stages of the pipeline.
+    :param started_at: The start time of the pipeline.
+    :param interval: The interval between the reports in seconds.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        _log_stages_stats(stages, time.monotonic() - started_at)
+
+
+async def run_pipeline(
+    source: AsyncIterable[Any],
+    stages: Sequence[BaseStage[Any, Any]],
+    report_interval: float = DEFAULT_REPORT_INTERVAL,
+) -> None:
+    """
+    Feed the items from the source through the stages until all are handled.
+
+    The results of each stage are handed over to the next one; the results
+    of the last stage are discarded.
+
+    :param source: The items for the first stage.
+    :param stages: The stages of the pipeline, in order.
+    :param report_interval: The interval between the progress reports in seconds.
+    """
+    started_at = time.monotonic()
+    async with asyncio.TaskGroup() as tg:
+        reporter = tg.create_task(
+            _report_periodically(stages, started_at, report_interval)
+        )
+        downstreams: list[BaseStage[Any, Any] | None] = [*stages[1:], None]
+        workers = [
+            [tg.create_task(stage.work(downstream)) for _ in range(stage.workers)]
+            for stage, downstream in zip(stages, downstreams, strict=True)
+        ]
+        async for item in source:
+            await stages[0].put(item)
+        # Stop the stages in order, so that each one drains into the next
+        for stage, stage_workers in zip(stages, workers, strict=True):
+            await stage.stop(stage_workers)
+        reporter.cancel()
+    _log_stages_stats(stages, time.monotonic() - started_at)
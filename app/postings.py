@@ -0,0 +1,34 @@
+"""
+Postings lists: the sorted ids of the items containing a term.
+
+A postings list is stored delta-encoded: the first id as it is, followed by
+the differences between the consecutive ids. The differences of a dense
+list are small numbers, which take fewer digits in JSON and compress better.
+"""
+import itertools
+from collections.abc import Iterable
+
+
+def encode_postings(ids: Iterable[int]) -> list[int]:
+    """
+    Delta-encode the postings list.
+
+    :param ids: The ids, in any order and possibly repeated.
+    :return: The differences between the consecutive sorted unique ids.
+    """
+    previous = 0
+    deltas = []
+    for item_id in sorted(set(ids)):
+        deltas.append(item_id - previous)
+        previous = item_id
+    return deltas
+
+
+def decode_postings(deltas: Iterable[int]) -> list[int]:
+    """
+    Decode the delta-encoded postings list.
+
+    :param deltas: The differences between the consecutive ids.
+    :return: The sorted ids.
+    """
+    return list(itertools.accumulate(deltas))
@@ -1,275 +1,1270 @@
 """The logic for scraping the source graph data processing it."""
 import asyncio
+import os
+from collections import deque
+from collections.abc import AsyncGenerator, Iterable, Sequence
+from concurrent.futures import Executor, ProcessPoolExecutor
+from contextlib import AsyncExitStack
+from dataclasses import dataclass
+from datetime import timedelta
+from pathlib import Path
+from typing import Annotated, Final, Optional, Self, TypeVar
 
+import httpx
 import sqlalchemy.dialects.sqlite
 import typer
 from loguru import logger
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
-from app.database import Dependency, Repo, RepoDependency, async_session_maker
-from app.dependencies import acquire_dependencies_data_for_repository
+from app.database import (
+    Dependency,
+    EngineProfile,
+    Repo,
+    RepoDependency,
+    ScrapeCheckpoint,
+    async_session_maker,
+    get_session_maker,
+)
+from app.dependencies import parse_dependencies_data_for_checkout
+from app.git_mirror import (
+    DEFAULT_CACHE_MAX_SIZE,
+    DEFAULT_CACHE_ROOT,
+    Checkout,
+    CloneMode,
+    GitMirrorCache,
+    resolve_remote_head,
+)
+from app.import_cache import (
+    DEFAULT_IMPORTS_CACHE_MAX_AGE,
+    DEFAULT_IMPORTS_CACHE_PATH,
+    BlobImportsCache,
+)
+from app.log import (
+    DEFAULT_PROGRESS_EVERY,
+    DEFAULT_SAMPLE_EVERY,
+    LogMode,
+    repo_log,
+)
+from app.metrics import DEFAULT_METRICS_DIRECTORY, metrics
+from app.models import RepoDependenciesCreateData
+from app.pipeline import DEFAULT_REPORT_INTERVAL, BatchStage, Stage, run_pipeline
+from app.sharding import Shard, aiter_results, create_results_file, write_results
 from app.source_graph.client import AsyncSourceGraphSSEClient
 from app.source_graph.mapper import create_or_update_repos_from_source_graph_repos_data
 from app.source_graph.models import SourceGraphRepoData
+from app.source_graph.replay import ReplayOptions, ReplayTransport, SSEReplay
+from app.types import RepoId
 from app.uow import async_session_uow
 
+#: The default number of concurrent remote ``HEAD`` resolutions.
+DEFAULT_PREFLIGHT_CONCURRENCY: Final[int] = 32
+#: The default number of the processes to parse the repository files in.
+DEFAULT_PARSE_WORKERS: Final[int] = os.cpu_count() or 1
+#: The default number of concurrent checkouts.
+DEFAULT_CLONE_WORKERS: Final[int] = 10
+#: The default maximum number of the repos persisted in a single transaction.
+DEFAULT_PERSIST_BATCH_SIZE: Final[int] = 50
+#: The default maximum time to wait for a batch of the repos to persist in seconds.
+DEFAULT_PERSIST_BATCH_DELAY: Final[float] = 0.5
+#: The default directory of the results files of the shards.
+DEFAULT_RESULTS_DIRECTORY: Final[Path] = Path(__file__).parent.parent / "results"
+#: The default number of the repos fetched from the database at once.
+DEFAULT_REPOS_PAGE_SIZE: Final[int] = 500
+#: The default maximum number of the scraped repos upserted in a single transaction.
+DEFAULT_SAVE_BATCH_SIZE: Final[int] = 500
+#: The default maximum time to wait for a batch of the scraped repos in seconds.
+DEFAULT_SAVE_BATCH_DELAY: Final[float] = 1.0
+#: The name of the checkpoint of the scraping of the source graph repos.
+SOURCE_GRAPH_CHECKPOINT_NAME: Final[str] = "source-graph-repos"
+#: The default maximum number of the repos waiting for each stage.
+DEFAULT_QUEUE_SIZE: Final[int] = 32
 
-async def _create_dependencies_for_repo(session: AsyncSession, repo: Repo) -> None:
+#: The maximum number of the rows in a single statement,
+#: well below the SQLite limit of the bound parameters.
+_MAX_ROWS_PER_STATEMENT: Final[int] = 400
+
+_RowT = TypeVar("_RowT")
+
+
+def _chunks(rows: Sequence[_RowT], size: int) -> list[Sequence[_RowT]]:
+    """
+    Split the rows into the chunks of the given size.
+
+    :param rows: The rows to split.
+    :param size: The maximum number of the rows in a chunk.
+    :return: The chunks.
+    """
+    return [rows[start : start + size] for start in range(0, len(rows), size)]
+
+
+async def _create_dependencies_for_repos(
+    session: AsyncSession,
+    repos_dependencies_create_data: Sequence[RepoDependenciesCreateData],
+) -> None:
     """
-    Create dependencies for a repo.
+    Create dependencies for a batch of repos.
 
+    Updates the repos with the parsed revisions.
     For each parsed dependency, creates a new record in the database, if such a
     dependency does not exist.
-    Then, assigns the dependencies to the given repo.
+    Then, assigns the dependencies to the given repos.
+
+    Each step is a single multi-row statement per chunk of the rows,
+    rather than one statement per repo.
 
     :param session: An asynchronous session object
-    :param repo: A repo for which to create and assign the dependencies
+    :param repos_dependencies_create_data: The parsed dependencies of the repos
     """
-    # Acquire the dependencies data for the repo
+    revisions = {data.repo_id: data.revision for data in repos_dependencies_create_data}
+    # Update the repos with the revision hashes
     logger.info(
-        "Acquiring the dependencies data for the repo with id {repo_id}.",
-        repo_id=repo.id,
+        "Updating {count} repos with the revision hashes.",
+        count=len(revisions),
         enqueue=True,
     )
-    try:
-        (
-            revision,
-            dependencies_create_data,
-        ) = await acquire_dependencies_data_for_repository(repo)
-    except RuntimeError:
-        # If the parsing fails,
-        # just skip creating the dependencies
-        logger.error(
-            "Failed to acquire the dependencies data for the repo with id {repo_id}.",
-            repo_id=repo.id,
-            enqueue=True,
-        )
-        return
-    if repo.last_checked_revision == revision:
-        # If the repo has already been updated,
-        # just skip creating the dependencies
-        logger.info(
-            "The repo with id {repo_id} has fresh dependencies.",
-            repo_id=repo.id,
-            enqueue=True,
-        )
-        return
-    if not dependencies_create_data:
+    with metrics.span("update_revisions"):
+        for repo_ids in _chunks(list(revisions), _MAX_ROWS_PER_STATEMENT):
+            await session.execute(
+                sqlalchemy.update(Repo)
+                .where(Repo.id.in_(repo_ids))
+                .values(
+                    last_checked_revision=sqlalchemy.case(
+                        {repo_id: revisions[repo_id] for repo_id in repo_ids},
+                        value=Repo.id,
+                    )
+                )
+            )
+    dependency_names = sorted(
+        {
+            dependency_data.name
+            for data in repos_dependencies_create_data
+            for dependency_data in data.dependencies
+        }
+    )
+    if not dependency_names:
         # If there are no dependencies,
         # just skip creating the dependencies
-        logger.info(
-            "The repo with id {repo_id} has no dependencies.",
-            repo_id=repo.id,
-            enqueue=True,
-        )
+        logger.info("The repos have no dependencies.", enqueue=True)
         return
-    # Update the repo with the revision hash
-    logger.info(
-        "Updating the repo with id {repo_id} with the revision hash {revision}.",
-        repo_id=repo.id,
-        revision=revision,
-        enqueue=True,
-    )
-    update_repo_statement = (
-        sqlalchemy.update(Repo)
-        .where(Repo.id == repo.id)
-        .values(last_checked_revision=revision)
-    )
-    await session.execute(update_repo_statement)
     # Create dependencies - on conflict do nothing.
     # This is to avoid creating duplicate dependencies.
     logger.info(
-        "Creating the dependencies for the repo with id {repo_id}.",
-        repo_id=repo.id,
+        "Creating {count} dependencies for {repos_count} repos.",
+        count=len(dependency_names),
+        repos_count=len(revisions),
         enqueue=True,
     )
-    insert_dependencies_statement = sqlalchemy.dialects.sqlite.insert(
-        Dependency
-    ).on_conflict_do_nothing(index_elements=[Dependency.name])
-    await session.execute(
-        insert_dependencies_statement.returning(Dependency),
-        [
-            {
-                "name": dependency_data.name,
-            }
-            for dependency_data in dependencies_create_data
-        ],
-    )
-    # Re-fetch the dependencies from the database
-    dependencies = (
-        await session.scalars(
-            sqlalchemy.select(Dependency).where(
-                Dependency.name.in_(
-                    [
-                        dependency_data.name
-                        for dependency_data in dependencies_create_data
-                    ]
+    with metrics.span("insert_dependencies"):
+        for names in _chunks(dependency_names, _MAX_ROWS_PER_STATEMENT):
+            await session.execute(
+                sqlalchemy.dialects.sqlite.insert(Dependency)
+                .values([{"name": name} for name in names])
+                .on_conflict_do_nothing(index_elements=[Dependency.name])
+            )
+    # Re-fetch the dependency ids from the database
+    dependency_ids: dict[str, int] = {}
+    with metrics.span("select_dependency_ids"):
+        for names in _chunks(dependency_names, _MAX_ROWS_PER_STATEMENT):
+            dependency_ids.update(
+                (
+                    await session.execute(
+                        sqlalchemy.select(Dependency.name, Dependency.id).where(
+                            Dependency.name.in_(names)
+                        )
+                    )
+                )
+                .tuples()
+                .all()
+            )
+    # Add the dependencies to the repos
+    repo_dependencies = [
+        {"repo_id": data.repo_id, "dependency_id": dependency_ids[dependency.name]}
+        for data in repos_dependencies_create_data
+        for dependency in data.dependencies
+    ]
+    with metrics.span("insert_repo_dependencies"):
+        for rows in _chunks(repo_dependencies, _MAX_ROWS_PER_STATEMENT):
+            await session.execute(
+                sqlalchemy.dialects.sqlite.insert(RepoDependency)
+                .values(list(rows))
+                .on_conflict_do_nothing(
+                    [RepoDependency.repo_id, RepoDependency.dependency_id]
                 )
             )
+
+
+async def _persist_batch(
+    session_maker: async_sessionmaker[AsyncSession],
+    repos_dependencies_create_data: Sequence[RepoDependenciesCreateData],
+) -> None:
+    """
+    Create the parsed dependencies of a batch of repos in the database.
+
+    The batch is persisted in a single transaction (a group commit),
+    so a failure rolls back only the repos of this batch.
+
+    :param session_maker: The session maker of the database engine.
+    :param repos_dependencies_create_data: The parsed dependencies of the repos.
+    """
+    async with session_maker() as session, async_session_uow(session):
+        await _create_dependencies_for_repos(
+            session=session,
+            repos_dependencies_create_data=repos_dependencies_create_data,
         )
-    ).all()
-    # Add the dependencies to the repo
-    insert_repo_dependencies_statement = sqlalchemy.dialects.sqlite.insert(
-        RepoDependency
-    ).on_conflict_do_nothing([RepoDependency.repo_id, RepoDependency.dependency_id])
-    await session.execute(
-        insert_repo_dependencies_statement,
-        [
-            {
-                "repo_id": repo.id,
-                "dependency_id": dependency.id,
-            }
-            for dependency in dependencies
-        ],
-    )
+        with metrics.span("commit"):
+            await session.commit()
 
 
 async def _save_scraped_repos_from_source_graph_repos_data(
-    source_graph_repos_data: list[SourceGraphRepoData],
+    source_graph_repos_data: Sequence[SourceGraphRepoData],
+    session_maker: async_sessionmaker[AsyncSession] = async_session_maker,
 ) -> None:
     """
     Save the scraped repos from the source graph repos data.
 
-    .. note::
-        This function is meant to be used in a task group.
-        From the SQLAlchemy documentation:
-        ::
-            https://docs.sqlalchemy.org/en/20/orm/extensions/asyncio.html#using-asyncsession-with-concurrent-tasks
-
-            The AsyncSession object is a mutable, stateful object
-            which represents a single, stateful database
-            transaction in progress. Using concurrent tasks with asyncio,
-            with APIs such as asyncio.gather() for example, should use
-            a separate AsyncSession per individual task.
-
+    The repos are deduplicated by their source graph ids, keeping the data
+    received last, and upserted in a single transaction.
 
     :param source_graph_repos_data: The source graph repos data.
+    :param session_maker: The session maker of the database engine.
     :return: None
-    """  # noqa: E501
-    async with async_session_maker() as session, async_session_uow(session):
-        saved_repos = await create_or_update_repos_from_source_graph_repos_data(
-            session=session,
-            source_graph_repos_data=source_graph_repos_data,
-        )
+    """
+    deduplicated = {
+        repo_data.repo_id: repo_data for repo_data in source_graph_repos_data
+    }
+    async with session_maker() as session, async_session_uow(session):
+        with metrics.span("upsert_repos"):
+            saved_repos = await create_or_update_repos_from_source_graph_repos_data(
+                session=session,
+                source_graph_repos_data=list(deduplicated.values()),
+            )
         logger.info(
             "Saving {count} repos.",
             count=len(saved_repos),
             enqueue=True,
         )
-        await session.commit()
+        with metrics.span("commit"):
+            await session.commit()
+    metrics.count("repos_saved", len(saved_repos))
+    repo_log.progress("saved", len(saved_repos))
+
+
+@dataclass(slots=True)
+class _ReceivedEvent:
+    """An event of the source graph stream with the repos."""
 
+    #: The id of the last event received up to this one.
+    id: str | None
+    #: The number of the events received up to this one, inclusive.
+    events_seen: int
+    #: The number of the repos of the event.
+    repos_count: int
+    #: The number of the repos of the event not saved yet.
+    pending: int
 
-async def scrape_source_graph_repos() -> None:
+
+class _ScrapeProgress:
     """
-    Iterate over the source graph repos and create or update them in the database.
+    The progress of a scraping of the source graph stream.
 
-    :return: None
+    The repos of an event may be saved in different batches, and a batch
+    may fail while the next ones are committed, so the progress only moves
+    past an event once its repos and the repos of all the events before it
+    have been saved.
     """
-    async with AsyncSourceGraphSSEClient() as sg_client, asyncio.TaskGroup() as tg:
-        logger.info(
-            "Creating or updating repos from source graph repos data.",
-            enqueue=True,
+
+    def __init__(
+        self: Self,
+        last_event_id: str | None = None,
+        events_seen: int = 0,
+        repos_upserted: int = 0,
+    ) -> None:
+        """
+        Initialize the progress.
+
+        :param last_event_id: The id of the last event fully saved.
+        :param events_seen: The number of the events received up to it.
+        :param repos_upserted: The number of the repos saved up to it.
+        """
+        self.last_event_id = last_event_id
+        self.events_seen = events_seen
+        self.repos_upserted = repos_upserted
+        #: The number of the events received before the scraping was resumed.
+        self.resumed_events_seen = events_seen
+        #: Serializes the checkpoints, so that they never move backwards.
+        self.lock = asyncio.Lock()
+        self._events: deque[_ReceivedEvent] = deque()
+
+    @classmethod
+    def from_checkpoint(
+        cls: type["_ScrapeProgress"], checkpoint: ScrapeCheckpoint
+    ) -> "_ScrapeProgress":
+        """
+        Restore the progress from a checkpoint.
+
+        :param checkpoint: The checkpoint.
+        :return: The progress.
+        """
+        return cls(
+            last_event_id=checkpoint.last_event_id,
+            events_seen=checkpoint.events_seen,
+            repos_upserted=checkpoint.repos_upserted,
         )
-        async for sg_repos_data in sg_client.aiter_fastapi_repos():
-            logger.info(
+
+    @property
+    def done(self: Self) -> bool:
+        """Whether the repos of all the events received have been saved."""
+        return not self._events
+
+    def receive(
+        self: Self, event_id: str | None, events_seen: int, repos_count: int
+    ) -> _ReceivedEvent:
+        """
+        Record an event received from the stream.
+
+        :param event_id: The id of the last event received.
+        :param events_seen: The number of the events received in this run.
+        :param repos_count: The number of the repos of the event.
+        :return: The event, to record the saved repos of it with.
+        """
+        event = _ReceivedEvent(
+            id=event_id,
+            events_seen=self.resumed_events_seen + events_seen,
+            repos_count=repos_count,
+            pending=repos_count,
+        )
+        self._events.append(event)
+        self._advance()
+        return event
+
+    def save(self: Self, events: Iterable[_ReceivedEvent]) -> bool:
+        """
+        Record the saved repos, one per event given.
+
+        :param events: The events of the saved repos.
+        :return: Whether the progress has moved.
+        """
+        for event in events:
+            event.pending -= 1
+        return self._advance()
+
+    def _advance(self: Self) -> bool:
+        """
+        Move the progress past the events saved in full.
+
+        :return: Whether the progress has moved.
+        """
+        moved = False
+        while self._events and not self._events[0].pending:
+            event = self._events.popleft()
+            self.last_event_id = event.id
+            self.events_seen = event.events_seen
+            self.repos_upserted += event.repos_count
+            moved = True
+        return moved
+
+
+async def _load_checkpoint(
+    session_maker: async_sessionmaker[AsyncSession],
+) -> ScrapeCheckpoint | None:
+    """
+    Load the checkpoint of the scraping of the source graph repos.
+
+    :param session_maker: The session maker of the database engine.
+    :return: The checkpoint, or ``None`` if there is none.
+    """
+    async with session_maker() as session:
+        return await session.get(ScrapeCheckpoint, SOURCE_GRAPH_CHECKPOINT_NAME)
+
+
+async def _save_checkpoint(
+    session_maker: async_sessionmaker[AsyncSession],
+    progress: _ScrapeProgress,
+    completed: bool = False,
+) -> None:
+    """
+    Save the checkpoint of the scraping of the source graph repos.
+
+    :param session_maker: The session maker of the database engine.
+    :param progress: The progress of the scraping.
+    :param completed: Whether the whole stream has been scraped.
+    :return: None
+    """
+    insert_statement = sqlalchemy.dialects.sqlite.insert(ScrapeCheckpoint).values(
+        name=SOURCE_GRAPH_CHECKPOINT_NAME,
+        last_event_id=progress.last_event_id,
+        events_seen=progress.events_seen,
+        repos_upserted=progress.repos_upserted,
+        completed=completed,
+    )
+    with metrics.span("save_checkpoint"):
+        async with session_maker() as session, async_session_uow(session):
+            await session.execute(
+                insert_statement.on_conflict_do_update(
+                    index_elements=[ScrapeCheckpoint.name],
+                    set_={
+                        "last_event_id": insert_statement.excluded.last_event_id,
+                        "events_seen": insert_statement.excluded.events_seen,
+                        "repos_upserted": insert_statement.excluded.repos_upserted,
+                        "completed": insert_statement.excluded.completed,
+                    },
+                )
+            )
+            await session.commit()
+
+
+async def _aiter_source_graph_repos_data(
+    sg_client: AsyncSourceGraphSSEClient, progress: _ScrapeProgress
+) -> AsyncGenerator[tuple[_ReceivedEvent, SourceGraphRepoData], None]:
+    """
+    Iterate over the source graph repos data, one repo at a time.
+
+    :param sg_client: The source graph client.
+    :param progress: The progress of the scraping to record the events in.
+    :return: The source graph repos data with their events, one by one.
+    """
+    async for sg_repos_data in sg_client.aiter_fastapi_repos():
+        if repo_log.detailed(sg_client.events_seen):
+            logger.debug(
                 "Received {count} repos.",
                 count=len(sg_repos_data),
                 enqueue=True,
             )
-            tg.create_task(
-                _save_scraped_repos_from_source_graph_repos_data(
-                    source_graph_repos_data=sg_repos_data
-                )
-            )
+        metrics.count("matches_events_received")
+        metrics.count("repos_received", len(sg_repos_data))
+        event = progress.receive(
+            event_id=sg_client.last_event_id,
+            events_seen=sg_client.events_seen,
+            repos_count=len(sg_repos_data),
+        )
+        for sg_repo_data in sg_repos_data:
+            yield event, sg_repo_data
+
 
+async def _restore_progress(
+    session_maker: async_sessionmaker[AsyncSession], resume: bool
+) -> _ScrapeProgress:
+    """
+    Restore the progress of the scraping to resume, or start it over.
 
-async def parse_dependencies_for_repo(semaphore: asyncio.Semaphore, repo: Repo) -> None:
+    :param session_maker: The session maker of the database engine.
+    :param resume: Whether to resume the scraping from the checkpoint.
+    :return: The progress of the scraping.
     """
-    Parse the dependencies for a given repo and create them in the database.
+    checkpoint = await _load_checkpoint(session_maker) if resume else None
+    if checkpoint is None or checkpoint.completed:
+        if resume:
+            logger.info(
+                "There is no scraping to resume, starting over.",
+                enqueue=True,
+            )
+        return _ScrapeProgress()
+    logger.info(
+        "Resuming the scraping after the event {event_id}: "
+        "{events_seen} events seen, {repos_upserted} repos upserted.",
+        event_id=checkpoint.last_event_id,
+        events_seen=checkpoint.events_seen,
+        repos_upserted=checkpoint.repos_upserted,
+        enqueue=True,
+    )
+    return _ScrapeProgress.from_checkpoint(checkpoint)
 
-    .. note::
-        This function is meant to be used in a task group.
-        From the SQLAlchemy documentation:
-        ::
-            https://docs.sqlalchemy.org/en/20/orm/extensions/asyncio.html#using-asyncsession-with-concurrent-tasks
 
-            The AsyncSession object is a mutable, stateful object
-            which represents a single, stateful database
-            transaction in progress. Using concurrent tasks with asyncio,
-            with APIs such as asyncio.gather() for example, should use
-            a separate AsyncSession per individual task.
+async def scrape_source_graph_repos(
+    session_maker: async_sessionmaker[AsyncSession] = async_session_maker,
+    save_batch_size: int = DEFAULT_SAVE_BATCH_SIZE,
+    save_batch_delay: float = DEFAULT_SAVE_BATCH_DELAY,
+    report_interval: float = DEFAULT_REPORT_INTERVAL,
+    resume: bool = False,
+    sg_transport: httpx.AsyncBaseTransport | None = None,
+) -> None:
+    """
+    Iterate over the source graph repos and create or update them in the database.
 
+    The repos of the events are coalesced into the larger batches, upserted
+    by a single writer. SQLite serializes the writes anyway, and the single
+    writer commits the batches in the order the repos were received in, so
+    a repo received twice is left with the data received last. At most two
+    batches wait in the queue; once it is full, the stream is not read
+    any further until the writer catches up.
 
-    :param semaphore: A semaphore to limit the number of concurrent requests
-    :param repo: A repo for which to create and assign the dependencies
+    A checkpoint is saved after each committed batch: the id of the last
+    event whose repos, and the repos of all the events before it, are saved.
+    A resumed scraping reconnects to the stream after that event.
+
+    :param session_maker: The session maker of the database engine.
+    :param save_batch_size: The maximum number of the repos upserted
+        in a single transaction.
+    :param save_batch_delay: The maximum time to wait for a batch of the repos
+        to fill up in seconds.
+    :param report_interval: The interval between the progress reports in seconds.
+    :param resume: Whether to resume the scraping from the checkpoint.
+    :param sg_transport: The transport of the source graph client, e.g. a replay
+        of a recorded stream; the network by default.
     :return: None
-    """  # noqa: E501
-    async with semaphore, async_session_maker() as session, async_session_uow(session):
-        # Associate the repo object with a fresh session instance
-        repo = await session.merge(repo)
-        # Create the dependencies for the repo
+    """
+    progress = await _restore_progress(session_maker, resume)
+    # Starting over overwrites the checkpoint of the previous scraping
+    await _save_checkpoint(session_maker, progress)
+
+    async def _save(batch: list[tuple[_ReceivedEvent, SourceGraphRepoData]]) -> None:
+        await _save_scraped_repos_from_source_graph_repos_data(
+            source_graph_repos_data=[sg_repo_data for _, sg_repo_data in batch],
+            session_maker=session_maker,
+        )
+        if progress.save(event for event, _ in batch):
+            async with progress.lock:
+                await _save_checkpoint(session_maker, progress)
+
+    save_stage: BatchStage[
+        tuple[_ReceivedEvent, SourceGraphRepoData], None
+    ] = BatchStage(
+        "save",
+        _save,
+        workers=1,
+        queue_size=2 * save_batch_size,
+        max_batch_size=save_batch_size,
+        max_batch_delay=save_batch_delay,
+    )
+    async with AsyncSourceGraphSSEClient(
+        last_event_id=progress.last_event_id, transport=sg_transport
+    ) as sg_client:
         logger.info(
-            "Creating the dependencies for the repo with id {repo_id}.",
-            repo_id=repo.id,
+            "Creating or updating repos from source graph repos data.",
             enqueue=True,
         )
-        await _create_dependencies_for_repo(session=session, repo=repo)
-        await session.commit()
+        await run_pipeline(
+            _aiter_source_graph_repos_data(sg_client, progress),
+            [save_stage],
+            report_interval=report_interval,
+        )
+        if not progress.done:
+            logger.warning(
+                "Some repos have not been saved, resume the scraping "
+                "from the event {event_id}.",
+                event_id=progress.last_event_id,
+                enqueue=True,
+            )
+            return
+        # The events after the last repos, e.g. ``done``, are seen as well
+        progress.last_event_id = sg_client.last_event_id
+        progress.events_seen = progress.resumed_events_seen + sg_client.events_seen
+        await _save_checkpoint(session_maker, progress, completed=True)
 
 
-async def parse_dependencies_for_repos() -> None:
+@dataclass(frozen=True, slots=True)
+class _CheckedOutRepo:
+    """A repo checked out for parsing."""
+
+    #: The checked out repo.
+    repo: Repo
+    #: The checkout of the repo.
+    checkout: Checkout
+    #: The exit stack removing the checkout once it is closed.
+    exit_stack: AsyncExitStack
+
+
+class _ParseDependenciesStages:
     """
-    Parse the dependencies for all the repos in the database.
+    The stages of parsing the dependencies for the repos.
 
-    :return: None.
+    - ``preflight``: drops the repos whose remote ``HEAD`` has not changed.
+    - ``clone``: checks out the repos from the mirror cache (network-bound).
+    - ``parse``: parses the dependencies of the checkouts (CPU-bound).
+    - ``persist``: creates the dependencies in the database in batches
+      (database-bound), or writes them into the results file of a shard.
     """
-    logger.info("Fetching the repos from the database.", enqueue=True)
-    async with async_session_maker() as session:
-        repos = (
-            await session.scalars(
-                sqlalchemy.select(Repo).order_by(
-                    Repo.last_checked_revision.is_(None).desc()
+
+    def __init__(
+        self: Self,
+        mirror_cache: GitMirrorCache,
+        executor: Executor | None = None,
+        imports_cache: BlobImportsCache | None = None,
+        session_maker: async_sessionmaker[AsyncSession] = async_session_maker,
+        results_path: Path | None = None,
+    ) -> None:
+        """
+        Initialize the stages.
+
+        :param mirror_cache: The cache of the repository mirrors.
+        :param executor: The executor to parse the repository files in.
+        :param imports_cache: The cache of the imports per blob.
+        :param session_maker: The session maker of the database engine.
+        :param results_path: The results file to write the parsed dependencies
+            into instead of the database.
+        """
+        self._mirror_cache = mirror_cache
+        self._executor = executor
+        self._imports_cache = imports_cache
+        self._session_maker = session_maker
+        self._results_path = results_path
+
+    async def preflight(self: Self, repo: Repo) -> Repo | None:
+        """
+        Drop the repo if its remote ``HEAD`` is the last checked revision.
+
+        The remote ``HEAD`` is resolved without cloning the repo.
+        The repos that have never been checked, or whose remote ``HEAD``
+        cannot be resolved, are always kept.
+
+        :param repo: The repo to check.
+        :return: The repo if it has to be parsed.
+        """
+        if repo.last_checked_revision is None:
+            return repo
+        try:
+            remote_head = await resolve_remote_head(repo.url)
+        except RuntimeError:
+            logger.error(
+                "Failed to resolve the remote HEAD for the repo with id {repo_id}.",
+                repo_id=repo.id,
+                enqueue=True,
+            )
+            return repo
+        if remote_head == repo.last_checked_revision:
+            if repo_log.detailed(repo.id):
+                logger.debug(
+                    "The repo with id {repo_id} has not changed.",
+                    repo_id=repo.id,
+                    enqueue=True,
                 )
+            repo_log.finish(repo.id, "unchanged")
+            return None
+        return repo
+
+    async def clone(self: Self, repo: Repo) -> _CheckedOutRepo | None:
+        """
+        Check out the repo from the mirror cache.
+
+        :param repo: The repo to check out.
+        :return: The checked out repo, unless the checkout has failed or
+            the repo has already been updated.
+        """
+        if repo_log.detailed(repo.id):
+            logger.debug(
+                "Checking out the repo with id {repo_id} from the mirror cache.",
+                repo_id=repo.id,
+                enqueue=True,
             )
-        ).all()
-    logger.info("Fetched {count} repos.", count=len(repos), enqueue=True)
-    logger.info("Parsing the dependencies for the repos.", enqueue=True)
-    semaphore = asyncio.Semaphore(10)
-    async with asyncio.TaskGroup() as tg:
-        for repo in repos:
-            logger.info(
-                "Parsing the dependencies for repo {repo_id}.",
+        exit_stack = AsyncExitStack()
+        try:
+            with repo_log.repo(repo.id):
+                checkout = await exit_stack.enter_async_context(
+                    self._mirror_cache.checkout(repo.url)
+                )
+        except RuntimeError:
+            # If the checkout fails,
+            # just skip creating the dependencies
+            logger.error(
+                "Failed to check out the repo with id {repo_id}.",
                 repo_id=repo.id,
                 enqueue=True,
             )
-            tg.create_task(parse_dependencies_for_repo(semaphore=semaphore, repo=repo))
+            repo_log.finish(repo.id, "checkout_failed")
+            return None
+        if repo.last_checked_revision == checkout.revision:
+            # If the repo has already been updated,
+            # just skip creating the dependencies
+            if repo_log.detailed(repo.id):
+                logger.debug(
+                    "The repo with id {repo_id} has fresh dependencies.",
+                    repo_id=repo.id,
+                    enqueue=True,
+                )
+            await exit_stack.aclose()
+            repo_log.finish(repo.id, "fresh")
+            return None
+        return _CheckedOutRepo(repo=repo, checkout=checkout, exit_stack=exit_stack)
+
+    async def parse(
+        self: Self, checked_out_repo: _CheckedOutRepo
+    ) -> RepoDependenciesCreateData:
+        """
+        Parse the dependencies of the checked out repo and remove the checkout.
+
+        :param checked_out_repo: The checked out repo.
+        :return: The parsed dependencies of the repo.
+        """
+        repo_id = checked_out_repo.repo.id
+        try:
+            with repo_log.repo(repo_id):
+                dependencies = await parse_dependencies_data_for_checkout(
+                    checked_out_repo.repo,
+                    checked_out_repo.checkout,
+                    self._executor,
+                    self._imports_cache,
+                )
+        except Exception:
+            repo_log.finish(repo_id, "parse_failed")
+            raise
+        finally:
+            await checked_out_repo.exit_stack.aclose()
+        return RepoDependenciesCreateData(
+            repo_id=checked_out_repo.repo.id,
+            revision=checked_out_repo.checkout.revision,
+            dependencies=dependencies,
+        )
+
+    async def persist(
+        self: Self, repos_dependencies_create_data: list[RepoDependenciesCreateData]
+    ) -> list[RepoDependenciesCreateData]:
+        """
+        Persist the parsed dependencies of a batch of repos.
+
+        :param repos_dependencies_create_data: The parsed dependencies of the repos.
+        :return: The persisted dependencies of the repos.
+        """
+        try:
+            if self._results_path is not None:
+                with metrics.span("write_results"):
+                    await write_results(
+                        self._results_path, repos_dependencies_create_data
+                    )
+            else:
+                await _persist_batch(
+                    self._session_maker, repos_dependencies_create_data
+                )
+        except Exception:
+            for data in repos_dependencies_create_data:
+                repo_log.finish(data.repo_id, "persist_failed")
+            raise
+        metrics.count("repos_persisted", len(repos_dependencies_create_data))
+        for data in repos_dependencies_create_data:
+            repo_log.finish(data.repo_id, "persisted", revision=data.revision)
+        return repos_dependencies_create_data
+
+
+async def _aiter_repos_page_by_page(
+    session_maker: async_sessionmaker[AsyncSession],
+    where: sqlalchemy.ColumnElement[bool],
+    page_size: int,
+) -> AsyncGenerator[Repo, None]:
+    """
+    Iterate over the repos matching the condition, in the order of their ids.
+
+    The repos are fetched with the keyset pagination: each page starts
+    after the last id of the previous one, in a short session of its own.
+
+    :param session_maker: The session maker of the database engine.
+    :param where: The condition the repos have to match.
+    :param page_size: The number of the repos fetched at once.
+    :return: The repos, one by one.
+    """
+    last_id: int | None = None
+    while True:
+        statement = sqlalchemy.select(Repo).where(where)
+        if last_id is not None:
+            statement = statement.where(Repo.id > last_id)
+        async with session_maker() as session:
+            repos = (
+                await session.scalars(statement.order_by(Repo.id).limit(page_size))
+            ).all()
+        logger.info("Fetched {count} repos.", count=len(repos), enqueue=True)
+        for repo in repos:
+            yield repo
+        if len(repos) < page_size:
+            return
+        last_id = repos[-1].id
+
+
+async def _aiter_repos(
+    session_maker: async_sessionmaker[AsyncSession],
+    page_size: int,
+    shard: Shard | None = None,
+) -> AsyncGenerator[Repo, None]:
+    """
+    Stream the repos from the database, the never checked ones first.
+
+    Each group is streamed with a keyset cursor of its own, up to the largest
+    repo id at the start of the run, so the repos added during the run are
+    left for the next one and nothing is remembered per repo. The repos checked
+    while the never checked ones are being streamed are streamed again with the
+    rest, and are dropped by the preflight as unchanged.
+
+    :param session_maker: The session maker of the database engine.
+    :param page_size: The number of the repos fetched at once.
+    :param shard: The shard to stream the repos of, all the repos if not provided.
+    :return: The repos, one by one.
+    """
+    async with session_maker() as session:
+        max_repo_id = await session.scalar(sqlalchemy.func.max(Repo.id).select())
+    if max_repo_id is None:
+        return
+    for where in (
+        Repo.last_checked_revision.is_(None),
+        Repo.last_checked_revision.is_not(None),
+    ):
+        async for repo in _aiter_repos_page_by_page(
+            session_maker, where & (Repo.id <= max_repo_id), page_size
+        ):
+            if shard is None or shard.includes(RepoId(repo.id)):
+                yield repo
+
+
+async def parse_dependencies_for_repos(
+    mirror_cache: GitMirrorCache,
+    preflight_concurrency: int = DEFAULT_PREFLIGHT_CONCURRENCY,
+    parse_workers: int | None = None,
+    imports_cache: BlobImportsCache | None = None,
+    clone_workers: int = DEFAULT_CLONE_WORKERS,
+    persist_batch_size: int = DEFAULT_PERSIST_BATCH_SIZE,
+    persist_batch_delay: float = DEFAULT_PERSIST_BATCH_DELAY,
+    queue_size: int = DEFAULT_QUEUE_SIZE,
+    report_interval: float = DEFAULT_REPORT_INTERVAL,
+    session_maker: async_sessionmaker[AsyncSession] = async_session_maker,
+    repos_page_size: int = DEFAULT_REPOS_PAGE_SIZE,
+    shard: Shard | None = None,
+    results_path: Path | None = None,
+) -> None:
+    """
+    Parse the dependencies for all the repos in the database.
+
+    The repos are streamed from the database page by page, the never checked
+    ones first, so the parsing starts right away and only a few pages of the
+    repos are held in memory at once.
+    The repos are fed through a pipeline of the preflight, clone, parse and
+    persist stages, each with its own number of workers and a bounded queue.
+    The repository files are parsed in a process pool shared by all the repos.
+    The results are persisted by a single writer in group commits, so the
+    writes do not contend for the database lock; once the writer falls behind,
+    its full queue blocks the parsing.
+
+    :param mirror_cache: The cache of the repository mirrors.
+    :param preflight_concurrency: The number of concurrent remote ``HEAD``
+        resolutions.
+    :param parse_workers: The number of the processes to parse the files in,
+        the number of CPUs if not provided.
+    :param imports_cache: The cache of the imports per blob.
+    :param clone_workers: The number of concurrent checkouts.
+    :param persist_batch_size: The maximum number of the repos persisted
+        in a single transaction.
+    :param persist_batch_delay: The maximum time to wait for a batch of the repos
+        to persist in seconds.
+    :param queue_size: The maximum number of the repos waiting for each stage.
+    :param report_interval: The interval between the progress reports in seconds.
+    :param session_maker: The session maker of the database engine.
+    :param repos_page_size: The number of the repos fetched from the database
+        at once.
+    :param shard: The shard to parse the dependencies for the repos of,
+        all the repos if not provided.
+    :param results_path: The results file to write the parsed dependencies
+        into instead of the database, truncated first.
+    :return: None.
+    """
+    if results_path is not None:
+        await create_results_file(results_path)
+    logger.info("Parsing the dependencies for the repos.", enqueue=True)
+    with ProcessPoolExecutor(max_workers=parse_workers) as executor:
+        stages = _ParseDependenciesStages(
+            mirror_cache=mirror_cache,
+            executor=executor,
+            imports_cache=imports_cache,
+            session_maker=session_maker,
+            results_path=results_path,
+        )
+        await run_pipeline(
+            source=_aiter_repos(session_maker, repos_page_size, shard),
+            stages=[
+                Stage("preflight", stages.preflight, preflight_concurrency, queue_size),
+                Stage("clone", stages.clone, clone_workers, queue_size),
+                Stage("parse", stages.parse, parse_workers or 1, queue_size),
+                BatchStage(
+                    "persist",
+                    stages.persist,
+                    workers=1,
+                    queue_size=queue_size,
+                    max_batch_size=persist_batch_size,
+                    max_batch_delay=persist_batch_delay,
+                ),
+            ],
+            report_interval=report_interval,
+        )
+
+
+async def merge_results(
+    results_paths: Sequence[Path],
+    session_maker: async_sessionmaker[AsyncSession] = async_session_maker,
+    batch_size: int = DEFAULT_PERSIST_BATCH_SIZE,
+) -> int:
+    """
+    Merge the results files of the shards into the database.
+
+    The results are applied in batches, in the same way as they are persisted
+    by an unsharded run. Applying the same results again changes nothing,
+    so merging is idempotent.
+
+    :param results_paths: The paths of the results files.
+    :param session_maker: The session maker of the database engine.
+    :param batch_size: The maximum number of the repos merged in a single
+        transaction.
+    :return: The number of the merged repos.
+    """
+    merged = 0
+    batch: list[RepoDependenciesCreateData] = []
+    async for repo_dependencies_create_data in aiter_results(results_paths):
+        batch.append(repo_dependencies_create_data)
+        if len(batch) == batch_size:
+            await _persist_batch(session_maker, batch)
+            merged += len(batch)
+            batch = []
+    if batch:
+        await _persist_batch(session_maker, batch)
+        merged += len(batch)
+    return merged
+
+
+def _write_run_report(directory: Path, run: str) -> None:
+    """
+    Write the metrics of the run into the JSON and the Prometheus files.
+
+    :param directory: The directory to write the files into.
+    :param run: The name of the run, naming the files.
+    :return: None
+    """
+    report = metrics.write(directory, run)
+    logger.info(
+        "The {run} run took {duration:.1f}s, its report is in {directory}.",
+        run=run,
+        duration=report.duration,
+        directory=directory,
+        enqueue=True,
+    )
 
 
 app = typer.Typer()
 
 
 @app.command()
-def scrape_repos() -> None:
+def scrape_repos(
+    save_batch_size: Annotated[
+        int,
+        typer.Option(help="The maximum number of the repos upserted per transaction."),
+    ] = DEFAULT_SAVE_BATCH_SIZE,
+    save_batch_delay_ms: Annotated[
+        int,
+        typer.Option(help="The maximum time to wait for a batch of the repos to save."),
+    ] = int(DEFAULT_SAVE_BATCH_DELAY * 1000),
+    report_interval: Annotated[
+        float, typer.Option(help="The interval between the progress reports.")
+    ] = DEFAULT_REPORT_INTERVAL,
+    resume: Annotated[
+        bool,
+        typer.Option(
+            help="Resume the scraping interrupted before from its checkpoint."
+        ),
+    ] = False,
+    replay: Annotated[
+        Optional[Path],  # noqa: UP007 - typer does not support the union syntax
+        typer.Option(
+            help="Scrape a recorded stream instead of the source graph API.",
+            exists=True,
+            dir_okay=False,
+        ),
+    ] = None,
+    replay_speed: Annotated[
+        Optional[float],  # noqa: UP007 - typer does not support the union syntax
+        typer.Option(
+            help="The speed of the replay relative to the recording; "
+            "no delays if not set."
+        ),
+    ] = None,
+    replay_disconnect_every: Annotated[
+        Optional[int],  # noqa: UP007 - typer does not support the union syntax
+        typer.Option(
+            min=1, help="Drop the replayed connection after every that many events."
+        ),
+    ] = None,
+    replay_retry_every: Annotated[
+        Optional[int],  # noqa: UP007 - typer does not support the union syntax
+        typer.Option(
+            min=1, help="Send the retry field with every that many replayed events."
+        ),
+    ] = None,
+    db_profile: Annotated[
+        EngineProfile, typer.Option(help="The profile of the database engine.")
+    ] = EngineProfile.BULK_WRITE,
+    metrics_directory: Annotated[
+        Path, typer.Option(help="The directory to write the run reports into.")
+    ] = DEFAULT_METRICS_DIRECTORY,
+    log_mode: Annotated[
+        LogMode, typer.Option(help="The way the repos are logged.")
+    ] = LogMode.VERBOSE,
+    log_progress_every: Annotated[
+        int, typer.Option(min=1, help="Log the progress every that many repos.")
+    ] = DEFAULT_PROGRESS_EVERY,
+    log_sample_every: Annotated[
+        int,
+        typer.Option(min=1, help="Log every n-th repo in detail in the summary mode."),
+    ] = DEFAULT_SAMPLE_EVERY,
+) -> None:
     """
     Scrape the FastAPI-related repositories utilizing the source graph API.
 
+    :param save_batch_size: The maximum number of the repos upserted
+        in a single transaction.
+    :param save_batch_delay_ms: The maximum time to wait for a batch of the repos
+        to save in milliseconds.
+    :param report_interval: The interval between the progress reports in seconds.
+    :param resume: Whether to resume the scraping from its checkpoint.
+    :param replay: The recorded stream to scrape instead of the source graph API.
+    :param replay_speed: The speed of the replay relative to the recording.
+    :param replay_disconnect_every: Drop the replayed connection after every
+        that many events.
+    :param replay_retry_every: Send the retry field with every that many events
+        of the replay.
+    :param db_profile: The profile of the database engine.
+    :param metrics_directory: The directory to write the run reports into.
+    :param log_mode: The way the repos are logged.
+    :param log_progress_every: The number of the repos between
+        the progress lines.
+    :param log_sample_every: Log every n-th repo in detail in the summary mode.
     :return: None
     """
     logger.info("Scraping the source graph repos.", enqueue=True)
-    asyncio.run(scrape_source_graph_repos())
+    repo_log.configure(log_mode, log_progress_every, log_sample_every)
+    metrics.reset()
+    try:
+        asyncio.run(
+            scrape_source_graph_repos(
+                session_maker=get_session_maker(db_profile),
+                save_batch_size=save_batch_size,
+                save_batch_delay=save_batch_delay_ms / 1000,
+                report_interval=report_interval,
+                resume=resume,
+                sg_transport=(
+                    ReplayTransport(
+                        SSEReplay.from_path(
+                            replay,
+                            ReplayOptions(
+                                speed=replay_speed,
+                                disconnect_every=replay_disconnect_every,
+                                retry_every=replay_retry_every,
+                            ),
+                        )
+                    )
+                    if replay is not None
+                    else None
+                ),
+            )
+        )
+    finally:
+        _write_run_report(metrics_directory, "scrape-repos")
 
 
 @app.command()
-def parse_dependencies() -> None:
+def parse_dependencies(
+    cache_root: Annotated[
+        Path, typer.Option(help="The directory to store the repository mirrors in.")
+    ] = DEFAULT_CACHE_ROOT,
+    cache_max_size: Annotated[
+        int, typer.Option(help="The upper bound of the mirror cache size in bytes.")
+    ] = DEFAULT_CACHE_MAX_SIZE,
+    preflight_concurrency: Annotated[
+        int, typer.Option(help="The number of concurrent remote HEAD resolutions.")
+    ] = DEFAULT_PREFLIGHT_CONCURRENCY,
+    clone_mode: Annotated[
+        CloneMode, typer.Option(help="The way the repositories are checked out.")
+    ] = CloneMode.FULL,
+    include_manifests: Annotated[
+        bool,
+        typer.Option(
+            help="Also check out pyproject.toml and requirements*.txt "
+            "in the sparse clone mode."
+        ),
+    ] = False,
+    parse_workers: Annotated[
+        int,
+        typer.Option(help="The number of the processes to parse the files in."),
+    ] = DEFAULT_PARSE_WORKERS,
+    imports_cache_path: Annotated[
+        Path, typer.Option(help="The path of the imports cache database.")
+    ] = DEFAULT_IMPORTS_CACHE_PATH,
+    imports_cache_max_age_days: Annotated[
+        int,
+        typer.Option(help="The number of days after which unused imports are evicted."),
+    ] = DEFAULT_IMPORTS_CACHE_MAX_AGE.days,
+    clone_workers: Annotated[
+        int, typer.Option(help="The number of concurrent checkouts.")
+    ] = DEFAULT_CLONE_WORKERS,
+    persist_batch_size: Annotated[
+        int,
+        typer.Option(help="The maximum number of the repos persisted per transaction."),
+    ] = DEFAULT_PERSIST_BATCH_SIZE,
+    persist_batch_delay_ms: Annotated[
+        int,
+        typer.Option(
+            help="The maximum time to wait for a batch of the repos to persist."
+        ),
+    ] = int(DEFAULT_PERSIST_BATCH_DELAY * 1000),
+    queue_size: Annotated[
+        int, typer.Option(help="The maximum number of the repos waiting per stage.")
+    ] = DEFAULT_QUEUE_SIZE,
+    report_interval: Annotated[
+        float, typer.Option(help="The interval between the progress reports.")
+    ] = DEFAULT_REPORT_INTERVAL,
+    db_profile: Annotated[
+        EngineProfile, typer.Option(help="The profile of the database engine.")
+    ] = EngineProfile.BULK_WRITE,
+    repos_page_size: Annotated[
+        int, typer.Option(help="The number of the repos fetched at once.")
+    ] = DEFAULT_REPOS_PAGE_SIZE,
+    shard: Annotated[
+        Optional[Shard],  # noqa: UP007 - typer does not support the union syntax
+        typer.Option(
+            parser=Shard.parse,
+            metavar="I/N",
+            help="Only parse the I-th of the N shards of the repos.",
+        ),
+    ] = None,
+    results_path: Annotated[
+        Optional[Path],  # noqa: UP007 - typer does not support the union syntax
+        typer.Option(
+            help="The file to write the results into instead of the database. "
+            "Defaults to a file per shard in the results directory when sharded."
+        ),
+    ] = None,
+    metrics_directory: Annotated[
+        Path, typer.Option(help="The directory to write the run reports into.")
+    ] = DEFAULT_METRICS_DIRECTORY,
+    log_mode: Annotated[
+        LogMode, typer.Option(help="The way the repos are logged.")
+    ] = LogMode.VERBOSE,
+    log_progress_every: Annotated[
+        int, typer.Option(min=1, help="Log the progress every that many repos.")
+    ] = DEFAULT_PROGRESS_EVERY,
+    log_sample_every: Annotated[
+        int,
+        typer.Option(min=1, help="Log every n-th repo in detail in the summary mode."),
+    ] = DEFAULT_SAMPLE_EVERY,
+) -> None:
     """
     Parse the dependencies for all the repos in the database.
 
+    :param cache_root: The directory to store the repository mirrors in.
+    :param cache_max_size: The upper bound of the mirror cache size in bytes.
+    :param preflight_concurrency: The number of concurrent remote HEAD resolutions.
+    :param clone_mode: The way the repositories are checked out.
+    :param include_manifests: Whether to check out the dependency manifests
+        in the sparse clone mode.
+    :param parse_workers: The number of the processes to parse the files in.
+    :param imports_cache_path: The path of the imports cache database.
+    :param imports_cache_max_age_days: The number of days after which
+        the unused imports are evicted from the cache.
+    :param clone_workers: The number of concurrent checkouts.
+    :param persist_batch_size: The maximum number of the repos persisted
+        in a single transaction.
+    :param persist_batch_delay_ms: The maximum time to wait for a batch of the repos
+        to persist in milliseconds.
+    :param queue_size: The maximum number of the repos waiting for each stage.
+    :param report_interval: The interval between the progress reports in seconds.
+    :param db_profile: The profile of the database engine.
+    :param repos_page_size: The number of the repos fetched from the database
+        at once.
+    :param shard: The shard to parse the dependencies for the repos of.
+    :param results_path: The file to write the results into instead
+        of the database.
+    :param metrics_directory: The directory to write the run reports into.
+    :param log_mode: The way the repos are logged.
+    :param log_progress_every: The number of the repos between
+        the progress lines.
+    :param log_sample_every: Log every n-th repo in detail in the summary mode.
+    :return: None.
+    """
+    if shard is not None and results_path is None:
+        DEFAULT_RESULTS_DIRECTORY.mkdir(parents=True, exist_ok=True)
+        results_path = (
+            DEFAULT_RESULTS_DIRECTORY / f"shard-{shard.index}-of-{shard.count}.jsonl"
+        )
+    logger.info(
+        "Parsing the dependencies for the repos of the shard {shard} "
+        "into {destination}.",
+        shard=shard or "1/1",
+        destination=results_path or "the database",
+        enqueue=True,
+    )
+    repo_log.configure(log_mode, log_progress_every, log_sample_every)
+    metrics.reset()
+    try:
+        with BlobImportsCache(imports_cache_path) as imports_cache:
+            asyncio.run(
+                parse_dependencies_for_repos(
+                    mirror_cache=GitMirrorCache(
+                        root=cache_root,
+                        max_size=cache_max_size,
+                        mode=clone_mode,
+                        include_manifests=include_manifests,
+                    ),
+                    preflight_concurrency=preflight_concurrency,
+                    parse_workers=parse_workers,
+                    imports_cache=imports_cache,
+                    clone_workers=clone_workers,
+                    persist_batch_size=persist_batch_size,
+                    persist_batch_delay=persist_batch_delay_ms / 1000,
+                    queue_size=queue_size,
+                    report_interval=report_interval,
+                    session_maker=get_session_maker(db_profile),
+                    repos_page_size=repos_page_size,
+                    shard=shard,
+                    results_path=results_path,
+                )
+            )
+            logger.info(
+                "The imports cache had {hits} hits and {misses} misses.",
+                hits=imports_cache.hits,
+                misses=imports_cache.misses,
+                enqueue=True,
+            )
+            evicted = imports_cache.evict(timedelta(days=imports_cache_max_age_days))
+            logger.info(
+                "Evicted {count} entries from the imports cache.",
+                count=evicted,
+                enqueue=True,
+            )
+            metrics.count("imports_cache_hits", imports_cache.hits)
+            metrics.count("imports_cache_misses", imports_cache.misses)
+    finally:
+        _write_run_report(
+            metrics_directory,
+            "parse-dependencies"
+            if shard is None
+            else f"parse-dependencies-shard-{shard.index}-of-{shard.count}",
+        )
+
+
+@app.command()
+def merge_shards(
+    results_paths: Annotated[
+        list[Path], typer.Argument(help="The results files of the shards.")
+    ],
+    batch_size: Annotated[
+        int,
+        typer.Option(help="The maximum number of the repos merged per transaction."),
+    ] = DEFAULT_PERSIST_BATCH_SIZE,
+    db_profile: Annotated[
+        EngineProfile, typer.Option(help="The profile of the database engine.")
+    ] = EngineProfile.BULK_WRITE,
+) -> None:
+    """
+    Merge the results files of the parse-dependencies shards into the database.
+
+    :param results_paths: The results files of the shards.
+    :param batch_size: The maximum number of the repos merged per transaction.
+    :param db_profile: The profile of the database engine.
     :return: None.
     """
+    merged = asyncio.run(
+        merge_results(
+            results_paths,
+            session_maker=get_session_maker(db_profile),
+            batch_size=batch_size,
+        )
+    )
     logger.info(
-        "Parsing the dependencies for all the repos in the database.", enqueue=True
+        "Merged the dependencies for {count} repos from {files} files.",
+        count=merged,
+        files=len(results_paths),
+        enqueue=True,
     )
-    asyncio.run(parse_dependencies_for_repos())
 
 
 if __name__ == "__main__":
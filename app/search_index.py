@@ -0,0 +1,114 @@
+"""
+The full-text search index of the repo descriptions.
+
+The descriptions are tokenised at the index time: normalised to NFKC,
+lowercased, and split into the runs of the letters and the digits,
+without the stop words and the single characters.
+
+The inverted index has the sorted term dictionary, and for each term
+the postings list of the documents containing it with the term frequencies.
+The length norm of each document is precomputed for ranking with BM25,
+so the client only has to tokenise the query the same way
+(see ``frontend/src/lib/search-index.ts``) and sum up the scores.
+"""
+import re
+import unicodedata
+from collections import Counter
+from collections.abc import Iterable
+from typing import Final
+
+from app.models import SearchIndex
+from app.postings import encode_postings
+
+#: The version of the schema of the search index.
+SEARCH_INDEX_SCHEMA_VERSION: Final[int] = 1
+#: The term frequency saturation of BM25.
+BM25_K1: Final[float] = 1.2
+#: The document length normalisation of BM25.
+BM25_B: Final[float] = 0.75
+#: The number of the decimal places the document norms are rounded to.
+NORM_PRECISION: Final[int] = 4
+
+#: The words too common to be worth indexing.
+STOP_WORDS: Final[frozenset[str]] = frozenset(
+    {
+        "an",
+        "and",
+        "are",
+        "as",
+        "at",
+        "be",
+        "by",
+        "for",
+        "from",
+        "in",
+        "is",
+        "it",
+        "of",
+        "on",
+        "or",
+        "that",
+        "the",
+        "this",
+        "to",
+        "with",
+    }
+)
+
+_TOKEN_PATTERN: Final[re.Pattern[str]] = re.compile(r"[^\W_]+")
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Split the text into the normalised terms.
+
+    :param text: The text to tokenise.
+    :return: The terms, in order and possibly repeated.
+    """
+    return [
+        token
+        for token in _TOKEN_PATTERN.findall(unicodedata.normalize("NFKC", text).lower())
+        if len(token) > 1 and token not in STOP_WORDS
+    ]
+
+
+def build_search_index(documents: Iterable[tuple[int, str]]) -> SearchIndex:
+    """
+    Build the inverted index of the documents.
+
+    :param documents: The ids of the documents with their texts,
+        ordered by the ids.
+    :return: The search index.
+    """
+    document_ids: list[int] = []
+    lengths: list[int] = []
+    postings: dict[str, tuple[list[int], list[int]]] = {}
+    for document_index, (document_id, text) in enumerate(documents):
+        counts = Counter(tokenize(text))
+        document_ids.append(document_id)
+        lengths.append(counts.total())
+        for term, count in counts.items():
+            term_documents, term_frequencies = postings.setdefault(term, ([], []))
+            term_documents.append(document_index)
+            term_frequencies.append(count)
+    average_length = sum(lengths) / len(lengths) if lengths else 0.0
+    terms = sorted(postings)
+    return SearchIndex(
+        schema_version=SEARCH_INDEX_SCHEMA_VERSION,
+        k1=BM25_K1,
+        b=BM25_B,
+        average_length=round(average_length, NORM_PRECISION),
+        document_id_deltas=encode_postings(document_ids),
+        norms=[
+            round(
+                BM25_K1 * (1 - BM25_B + BM25_B * length / average_length),
+                NORM_PRECISION,
+            )
+            if average_length
+            else BM25_K1
+            for length in lengths
+        ],
+        terms=terms,
+        posting_deltas=[encode_postings(postings[term][0]) for term in terms],
+        frequencies=[postings[term][1] for term in terms],
+    )
@@ -0,0 +1,118 @@
+"""
+Sharding of the dependencies parsing across multiple machines.
+
+The repos are split into the shards by a stable hash of their ids, so every
+machine parsing the shard ``I/N`` gets the same repos, regardless of the
+order they are read in.
+
+A shard writes its results into a results file instead of the database:
+one JSON-encoded :class:`~app.models.RepoDependenciesCreateData` per line.
+The results files of all the shards are merged into the database afterwards.
+"""
+import hashlib
+from collections.abc import AsyncGenerator, Iterable
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Self
+
+import aiofiles
+
+from app.models import RepoDependenciesCreateData
+from app.types import RepoId
+
+
+def shard_index_of(repo_id: RepoId, count: int) -> int:
+    """
+    Return the index of the shard the repo belongs to.
+
+    :param repo_id: The id of the repo.
+    :param count: The number of the shards.
+    :return: The index of the shard, from zero.
+    """
+    digest = hashlib.blake2b(str(repo_id).encode(), digest_size=8).digest()
+    return int.from_bytes(digest) % count
+
+
+@dataclass(frozen=True, slots=True)
+class Shard:
+    """A shard of the repos."""
+
+    #: The index of the shard, from zero.
+    index: int
+    #: The number of the shards.
+    count: int
+
+    def __post_init__(self: Self) -> None:
+        """Validate the shard."""
+        if not 0 <= self.index < self.count:
+            raise ValueError(
+                f"The shard index must be from 0 to {self.count - 1}, "
+                f"got {self.index}."
+            )
+
+    @classmethod
+    def parse(cls: type["Shard"], value: str) -> "Shard":
+        """
+        Parse the shard from the ``I/N`` notation.
+
+        :param value: The shard, e.g. ``0/4`` for the first of the four shards.
+        :return: The shard.
+        """
+        index, separator, count = value.partition("/")
+        if not separator:
+            raise ValueError(f"The shard must be in the I/N notation, got {value!r}.")
+        return cls(index=int(index), count=int(count))
+
+    def __str__(self: Self) -> str:
+        """Format the shard in the ``I/N`` notation."""
+        return f"{self.index}/{self.count}"
+
+    def includes(self: Self, repo_id: RepoId) -> bool:
+        """
+        Check whether the repo belongs to the shard.
+
+        :param repo_id: The id of the repo.
+        :return: ``True`` if the repo belongs to the shard.
+        """
+        return shard_index_of(repo_id, self.count) == self.index
+
+
+async def create_results_file(path: Path) -> None:
+    """
+    Create an empty results file, truncating the existing one.
+
+    :param path: The path of the results file.
+    """
+    async with aiofiles.open(path, "w"):
+        pass
+
+
+async def write_results(
+    path: Path, results: Iterable[RepoDependenciesCreateData]
+) -> None:
+    """
+    Append the results to the results file.
+
+    :param path: The path of the results file.
+    :param results: The parsed dependencies of the repos.
+    """
+    async with aiofiles.open(path, "a") as results_file:
+        await results_file.writelines(
+            f"{result.model_dump_json()}\n" for result in results
+        )
+
+
+async def aiter_results(
+    paths: Iterable[Path],
+) -> AsyncGenerator[RepoDependenciesCreateData, None]:
+    """
+    Iterate over the results in the results files.
+
+    :param paths: The paths of the results files.
+    :return: The parsed dependencies of the repos, one by one.
+    """
+    for path in paths:
+        async with aiofiles.open(path) as results_file:
+            async for line in results_file:
+                if line.strip():
+                    yield RepoDependenciesCreateData.model_validate_json(line)
@@ -33,6 +33,29 @@ FASTAPI_REPOS_QUERY_PARAMS: Final[Mapping[str, str]] = {
     ),
 }
 
+#: The errors of a dropped connection to retry on.
+_RETRY_ON: Final[tuple[type[Exception], ...]] = (
+    httpx.ReadError,
+    httpx.ReadTimeout,
+    httpx.RemoteProtocolError,
+)
+
+
+def decode_fastapi_repos(event: ServerSentEvent) -> list[SourceGraphRepoData] | None:
+    """
+    Decode the repos from an event of the SourceGraph SSE API.
+
+    Only the ``matches`` events have the repos, the others are skipped
+    before their data is decoded. The JSON data is validated as it is,
+    without decoding it into the Python objects first.
+
+    :param event: The event.
+    :return: The repos, or ``None`` if the event has none.
+    """
+    if event.event != "matches":
+        return None
+    return SourceGraphRepoDataListAdapter.validate_json(event.data)
+
 
 class AsyncSourceGraphSSEClient:
     """
@@ -40,13 +63,37 @@ class AsyncSourceGraphSSEClient:
 
     To learn more about the underlying API, see the ``SourceGraph SSE API``
     https://docs.sourcegraph.com/api/stream_api#sourcegraph-stream-api
+
+    The id of the last event received is sent with the ``Last-Event-ID``
+    header on every reconnection, so that the stream continues from there.
     """
 
-    def __init__(self: Self) -> None:
-        """Initialize the client."""
-        self._last_event_id: str | None = None
+    def __init__(
+        self: Self,
+        last_event_id: str | None = None,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ) -> None:
+        """
+        Initialize the client.
+
+        :param last_event_id: The id of the last event received before,
+            to resume the stream after it.
+        :param transport: The transport of the HTTP client, the network by default.
+        """
+        self._last_event_id: str | None = last_event_id
         self._reconnection_delay: float = 0.0
-        self._aclient: httpx.AsyncClient = httpx.AsyncClient()
+        self._events_seen: int = 0
+        self._aclient: httpx.AsyncClient = httpx.AsyncClient(transport=transport)
+
+    @property
+    def last_event_id(self: Self) -> str | None:
+        """The id of the last event received."""
+        return self._last_event_id
+
+    @property
+    def events_seen(self: Self) -> int:
+        """The number of the events received by the client."""
+        return self._events_seen
 
     async def __aenter__(self: Self) -> Self:
         """Enter the async context manager."""
@@ -87,30 +134,51 @@ class AsyncSourceGraphSSEClient:
             async for event in event_source.aiter_sse():
                 yield event
 
+    def _receive(self: Self, event: ServerSentEvent) -> None:
+        """
+        Keep the id and the retry field of the event for the reconnections.
+
+        :param event: The event received.
+        """
+        self._events_seen += 1
+        if event.id:
+            self._last_event_id = event.id
+        if event.retry is not None:
+            logger.error(
+                "Received a retry event from the SourceGraph SSE API. "
+                "Schedule a reconnection in {retry} milliseconds.",
+                retry=event.retry,
+                enqueue=True,
+            )
+            self._reconnection_delay = timedelta(
+                milliseconds=event.retry
+            ).total_seconds()
+        else:
+            self._reconnection_delay = 0.0
+
     async def _aiter_sse_with_retries(
         self: Self, **kwargs: MutableMapping[str, Any]
     ) -> AsyncGenerator[ServerSentEvent, None]:
-        """Iterate over the SourceGraph SSE API with retries."""
-        async for attempt in stamina.retry_context(
-            on=(httpx.ReadError, httpx.ReadTimeout)
-        ):
-            with attempt:
-                await asyncio.sleep(self._reconnection_delay)
-                async for event in self._aiter_sse(**kwargs):
-                    self._last_event_id = event.id
-                    if event.retry is not None:
-                        logger.error(
-                            "Received a retry event from the SourceGraph SSE API. "
-                            "Schedule a reconnection in {retry} milliseconds.",
-                            retry=event.retry,
-                            enqueue=True,
-                        )
-                        self._reconnection_delay = timedelta(
-                            milliseconds=event.retry
-                        ).total_seconds()
-                    else:
-                        self._reconnection_delay = 0.0
-                    yield event
+        """
+        Iterate over the SourceGraph SSE API with retries.
+
+        The retries only give up once all the attempts have failed without
+        receiving any event; otherwise the stream is continued with all the
+        attempts available again, however many times it has been dropped.
+        """
+        while True:
+            events_seen = self._events_seen
+            try:
+                async for attempt in stamina.retry_context(on=_RETRY_ON):
+                    with attempt:
+                        await asyncio.sleep(self._reconnection_delay)
+                        async for event in self._aiter_sse(**kwargs):
+                            self._receive(event)
+                            yield event
+                return
+            except _RETRY_ON:
+                if self._events_seen == events_seen:
+                    raise
 
     async def aiter_fastapi_repos(
         self: Self,
@@ -119,5 +187,5 @@ class AsyncSourceGraphSSEClient:
         async for event in self._aiter_sse_with_retries(
             params=dict(FASTAPI_REPOS_QUERY_PARAMS)
         ):
-            if event.event == "matches":
-                yield SourceGraphRepoDataListAdapter.validate_python(event.json())
+            if (repos := decode_fastapi_repos(event)) is not None:
+                yield repos
@@ -1,6 +1,6 @@
 """The models for the Source Graph data."""
 import datetime
-from typing import Literal, Self
+from typing import Final, Literal, Self
 
 from pydantic import (
     BaseModel,
@@ -13,6 +13,9 @@ from pydantic import (
 
 from app.types import SourceGraphRepoId
 
+#: The type adapter for the URLs, built once instead of for every URL.
+_HTTP_URL_ADAPTER: Final[TypeAdapter[HttpUrl]] = TypeAdapter(HttpUrl)
+
 
 class SourceGraphRepoData(BaseModel):
     """The data of a repository."""
@@ -28,7 +31,7 @@ class SourceGraphRepoData(BaseModel):
     @property
     def repo_url(self: Self) -> HttpUrl:
         """The URL of the repository."""
-        return TypeAdapter(HttpUrl).validate_python(f"https://{self.repo_handle}")
+        return _HTTP_URL_ADAPTER.validate_python(f"https://{self.repo_handle}")
 
 
 #: The type adapter for the SourceGraphRepoData.
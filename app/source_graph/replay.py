@@ -0,0 +1,502 @@
+"""
+Record and replay the SourceGraph SSE stream.
+
+A recording is the raw ``text/event-stream`` body of the API, with a comment
+line before each event telling when it was received::
+
+    : t=0.125
+    event: matches
+    data: [...]
+
+The comments are ignored by the SSE parsers, so a recording is still a valid
+stream. A recording whose path ends with ``.gz`` is compressed with gzip.
+
+The recordings are captured with the :class:`RecordingTransport` of the
+client, and served back with the :class:`ReplayTransport`, or with the ASGI
+app of :func:`create_replay_app` by any ASGI server. The replay continues
+after the event of the ``Last-Event-ID`` header, at the recorded speed or
+faster, and may drop the connection or send the ``retry`` fields
+periodically to exercise the reconnections of the client.
+
+Record a stream with ``python -m app.source_graph.replay PATH``.
+"""
+import asyncio
+import gzip
+import time
+from collections.abc import (
+    AsyncGenerator,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Iterator,
+    MutableMapping,
+    Sequence,
+)
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import IO, Annotated, Any, Final, Self
+
+import httpx
+import typer
+from loguru import logger
+
+from app.source_graph.client import AsyncSourceGraphSSEClient
+
+#: The prefix of the comment line with the time of an event.
+_TIME_PREFIX: Final[bytes] = b": t="
+#: The prefix of the line with the id of an event.
+_ID_PREFIX: Final[bytes] = b"id:"
+#: The default reconnection time sent with the ``retry`` fields in milliseconds.
+DEFAULT_RETRY_MS: Final[int] = 100
+
+#: The ASGI scope, receive and send callables.
+_Scope = MutableMapping[str, Any]
+_Receive = Callable[[], Awaitable[MutableMapping[str, Any]]]
+_Send = Callable[[MutableMapping[str, Any]], Awaitable[None]]
+_ASGIApp = Callable[[_Scope, _Receive, _Send], Awaitable[None]]
+
+
+class ReplayDisconnectError(Exception):
+    """The replay dropped the connection on purpose."""
+
+
+@dataclass(frozen=True, slots=True)
+class RecordedEvent:
+    """An event of a recording."""
+
+    #: The time the event was received at since the recording started in seconds.
+    time: float
+    #: The id of the event, if it has one.
+    id: str | None
+    #: The lines of the event, without the time and the trailing blank line.
+    raw: bytes
+
+
+def _open_recording(path: Path, mode: str) -> IO[bytes]:
+    """
+    Open a recording, compressed with gzip if its path ends with ``.gz``.
+
+    :param path: The path of the recording.
+    :param mode: The mode to open the file in, ``rb`` or ``wb``.
+    :return: The binary file.
+    """
+    if path.suffix == ".gz":
+        return gzip.open(path, mode)  # type: ignore[return-value]
+    return path.open(mode)
+
+
+def _split_events(body: bytes) -> Iterator[bytes]:
+    """
+    Split a ``text/event-stream`` body into the events.
+
+    :param body: The body.
+    :return: The lines of the events, one event at a time.
+    """
+    for block in body.replace(b"\r\n", b"\n").split(b"\n\n"):
+        if block.strip():
+            yield block.strip(b"\n")
+
+
+def parse_recording(body: bytes) -> list[RecordedEvent]:
+    """
+    Parse the events of a recording.
+
+    The events without the time are given the time of the event before them,
+    so that a plain ``text/event-stream`` body is a recording as well.
+
+    :param body: The body of the recording.
+    :return: The events.
+    """
+    events: list[RecordedEvent] = []
+    event_time = 0.0
+    for block in _split_events(body):
+        lines = block.split(b"\n")
+        if lines[0].startswith(_TIME_PREFIX):
+            event_time = float(lines.pop(0)[len(_TIME_PREFIX) :])
+        event_id = next(
+            (
+                line[len(_ID_PREFIX) :].removeprefix(b" ").decode()
+                for line in lines
+                if line.startswith(_ID_PREFIX)
+            ),
+            None,
+        )
+        events.append(
+            RecordedEvent(time=event_time, id=event_id, raw=b"\n".join(lines))
+        )
+    return events
+
+
+def load_recording(path: Path) -> list[RecordedEvent]:
+    """
+    Load the events of a recording.
+
+    :param path: The path of the recording.
+    :return: The events.
+    """
+    with _open_recording(path, "rb") as recording:
+        return parse_recording(recording.read())
+
+
+class _Recorder:
+    """Write the events of a stream into a recording as they arrive."""
+
+    def __init__(self: Self, recording: IO[bytes]) -> None:
+        """
+        Initialize the recorder.
+
+        :param recording: The binary file of the recording.
+        """
+        self._recording = recording
+        self._started_at = time.monotonic()
+        self._buffer = b""
+        self.events = 0
+
+    def feed(self: Self, chunk: bytes) -> None:
+        """
+        Record the complete events of the chunk of the stream.
+
+        :param chunk: The chunk of the stream.
+        """
+        self._buffer = (self._buffer + chunk).replace(b"\r\n", b"\n")
+        *blocks, self._buffer = self._buffer.split(b"\n\n")
+        elapsed = time.monotonic() - self._started_at
+        for block in blocks:
+            if block.strip():
+                self._recording.write(
+                    b"%s%.3f\n%s\n\n" % (_TIME_PREFIX, elapsed, block.strip(b"\n"))
+                )
+                self.events += 1
+
+
+class _RecordingStream(httpx.AsyncByteStream):
+    """A response stream recording the events passing through it."""
+
+    def __init__(
+        self: Self, stream: httpx.AsyncByteStream, recorder: _Recorder
+    ) -> None:
+        """
+        Initialize the stream.
+
+        :param stream: The response stream to record.
+        :param recorder: The recorder of the events.
+        """
+        self._stream = stream
+        self._recorder = recorder
+
+    async def __aiter__(self: Self) -> AsyncIterator[bytes]:
+        """Iterate over the chunks of the stream, recording them."""
+        async for chunk in self._stream:
+            self._recorder.feed(chunk)
+            yield chunk
+
+    async def aclose(self: Self) -> None:
+        """Close the stream."""
+        await self._stream.aclose()
+
+
+class RecordingTransport(httpx.AsyncBaseTransport):
+    """
+    A transport recording the event streams received through it.
+
+    The events of all the responses, e.g. of the reconnections, are appended
+    to the same recording. The recording is closed with the transport.
+    """
+
+    def __init__(
+        self: Self, path: Path, transport: httpx.AsyncBaseTransport | None = None
+    ) -> None:
+        """
+        Initialize the transport.
+
+        :param path: The path of the recording.
+        :param transport: The transport to send the requests with,
+            the network by default.
+        """
+        self._transport = transport or httpx.AsyncHTTPTransport()
+        self._recording = _open_recording(path, "wb")
+        self._recorder = _Recorder(self._recording)
+
+    @property
+    def events(self: Self) -> int:
+        """The number of the events recorded."""
+        return self._recorder.events
+
+    async def handle_async_request(
+        self: Self, request: httpx.Request
+    ) -> httpx.Response:
+        """
+        Send the request, and record the response if it is an event stream.
+
+        :param request: The request.
+        :return: The response.
+        """
+        response = await self._transport.handle_async_request(request)
+        if not response.headers.get("content-type", "").startswith(
+            "text/event-stream"
+        ) or not isinstance(response.stream, httpx.AsyncByteStream):
+            return response
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=_RecordingStream(response.stream, self._recorder),
+            extensions=response.extensions,
+        )
+
+    async def aclose(self: Self) -> None:
+        """Close the transport and the recording."""
+        await self._transport.aclose()
+        self._recording.close()
+
+
+@dataclass(frozen=True, slots=True)
+class ReplayOptions:
+    """The options of a replay."""
+
+    #: The speed relative to the recording, or ``None`` for no delays at all.
+    speed: float | None = None
+    #: Drop the connection after every that many events, or ``None`` for never.
+    disconnect_every: int | None = None
+    #: Send the ``retry`` field with every that many events, or ``None`` for never.
+    retry_every: int | None = None
+    #: The reconnection time sent with the ``retry`` fields in milliseconds.
+    retry_ms: int = DEFAULT_RETRY_MS
+
+    def __post_init__(self: Self) -> None:
+        """Validate the options."""
+        if self.speed is not None and self.speed <= 0:
+            raise ValueError(f"The speed must be positive, got {self.speed}.")
+        for name in ("disconnect_every", "retry_every"):
+            if (value := getattr(self, name)) is not None and value < 1:
+                raise ValueError(f"The {name} must be at least 1, got {value}.")
+
+
+class SSEReplay:
+    """
+    A replay of a recording, shared by all the connections to it.
+
+    The recordings without any event ids are given the indexes of the events
+    as their ids, so that a reconnection continues after the last event
+    received all the same.
+    """
+
+    def __init__(
+        self: Self, events: Sequence[RecordedEvent], options: ReplayOptions
+    ) -> None:
+        """
+        Initialize the replay.
+
+        :param events: The events of the recording.
+        :param options: The options of the replay.
+        """
+        if not any(event.id for event in events):
+            events = [
+                replace(
+                    event,
+                    id=str(index),
+                    raw=b"%s %d\n%s" % (_ID_PREFIX, index, event.raw),
+                )
+                for index, event in enumerate(events)
+            ]
+        self._events = events
+        self._options = options
+        #: The number of the connections to the replay.
+        self.connections = 0
+        #: The number of the events sent over all the connections.
+        self.events_sent = 0
+
+    @classmethod
+    def from_path(
+        cls: type["SSEReplay"], path: Path, options: ReplayOptions
+    ) -> "SSEReplay":
+        """
+        Load the replay of a recording.
+
+        :param path: The path of the recording.
+        :param options: The options of the replay.
+        :return: The replay.
+        """
+        return cls(load_recording(path), options)
+
+    def _start_index(self: Self, last_event_id: str | None) -> int:
+        """
+        Return the index of the event to continue the stream from.
+
+        :param last_event_id: The id of the last event received by the client.
+        :return: The index of the event after it, or zero for an unknown id.
+        """
+        if last_event_id:
+            for index, event in enumerate(self._events):
+                if event.id == last_event_id:
+                    return index + 1
+        return 0
+
+    async def aiter_chunks(
+        self: Self, last_event_id: str | None = None
+    ) -> AsyncGenerator[bytes, None]:
+        """
+        Iterate over the events of a connection.
+
+        :param last_event_id: The id of the last event received by the client.
+        :return: The events, one chunk per event.
+        :raise ReplayDisconnectError: When the connection is dropped on purpose.
+        """
+        self.connections += 1
+        loop = asyncio.get_running_loop()
+        start = self._start_index(last_event_id)
+        started_at = loop.time()
+        speed = self._options.speed
+        disconnect_every = self._options.disconnect_every
+        retry_every = self._options.retry_every
+        for index in range(start, len(self._events)):
+            event = self._events[index]
+            if speed is not None:
+                delay = (event.time - self._events[start].time) / speed
+                await asyncio.sleep(max(started_at + delay - loop.time(), 0))
+            if disconnect_every is not None and index - start == disconnect_every:
+                raise ReplayDisconnectError(
+                    f"Dropped the connection after {disconnect_every} events."
+                )
+            retry = (
+                b"retry: %d\n" % self._options.retry_ms
+                if retry_every is not None and (index + 1) % retry_every == 0
+                else b""
+            )
+            self.events_sent += 1
+            yield b"%s%s\n\n" % (retry, event.raw)
+
+
+class _ReplayStream(httpx.AsyncByteStream):
+    """A response stream of a replay."""
+
+    def __init__(self: Self, chunks: AsyncGenerator[bytes, None]) -> None:
+        """
+        Initialize the stream.
+
+        :param chunks: The chunks of the replay.
+        """
+        self._chunks = chunks
+
+    async def __aiter__(self: Self) -> AsyncIterator[bytes]:
+        """Iterate over the chunks, dropping the connection as a read error."""
+        try:
+            async for chunk in self._chunks:
+                yield chunk
+        except ReplayDisconnectError as error:
+            raise httpx.ReadError(str(error)) from error
+
+    async def aclose(self: Self) -> None:
+        """Close the stream."""
+        await self._chunks.aclose()
+
+
+class ReplayTransport(httpx.AsyncBaseTransport):
+    """A transport serving a replay to every request."""
+
+    def __init__(self: Self, replay: SSEReplay) -> None:
+        """
+        Initialize the transport.
+
+        :param replay: The replay.
+        """
+        self.replay = replay
+
+    async def handle_async_request(
+        self: Self, request: httpx.Request
+    ) -> httpx.Response:
+        """
+        Serve the replay, after the event of the ``Last-Event-ID`` header.
+
+        :param request: The request.
+        :return: The event stream response.
+        """
+        return httpx.Response(
+            status_code=200,
+            headers={"content-type": "text/event-stream"},
+            stream=_ReplayStream(
+                self.replay.aiter_chunks(request.headers.get("Last-Event-ID"))
+            ),
+        )
+
+
+def create_replay_app(replay: SSEReplay) -> _ASGIApp:
+    """
+    Create an ASGI app serving a replay to every request.
+
+    A dropped connection is an exception raised by the app after the response
+    has started, so the server aborts the response.
+
+    :param replay: The replay.
+    :return: The ASGI app.
+    """
+
+    async def _app(scope: _Scope, receive: _Receive, send: _Send) -> None:
+        if scope["type"] != "http":
+            return
+        headers = dict(scope["headers"])
+        last_event_id = headers.get(b"last-event-id", b"").decode() or None
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [
+                    (b"content-type", b"text/event-stream"),
+                    (b"cache-control", b"no-cache"),
+                ],
+            }
+        )
+        async for chunk in replay.aiter_chunks(last_event_id):
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    return _app
+
+
+async def record_fastapi_repos(path: Path) -> int:
+    """
+    Record the stream of the FastAPI repos.
+
+    :param path: The path of the recording.
+    :return: The number of the events recorded.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    transport = RecordingTransport(path)
+    repos = 0
+    async with AsyncSourceGraphSSEClient(transport=transport) as sg_client:
+        async for sg_repos_data in sg_client.aiter_fastapi_repos():
+            repos += len(sg_repos_data)
+    logger.info(
+        "Recorded {events} events with {repos} repos into {path}.",
+        events=transport.events,
+        repos=repos,
+        path=path,
+        enqueue=True,
+    )
+    return transport.events
+
+
+app = typer.Typer()
+
+
+@app.command()
+def record(
+    path: Annotated[
+        Path,
+        typer.Argument(
+            help="The path of the recording, compressed if it ends with .gz.",
+            dir_okay=False,
+            writable=True,
+        ),
+    ],
+) -> None:
+    """
+    Record the stream of the FastAPI repos of the SourceGraph SSE API.
+
+    :param path: The path of the recording.
+    :return: None
+    """
+    asyncio.run(record_fastapi_repos(path))
+
+
+if __name__ == "__main__":
+    app()
@@ -1,10 +1,13 @@
 """Test the client module for the source graph."""
+import json
 from typing import Any
 
 import pytest
 from dirty_equals import HasLen, IsDatetime, IsInstance, IsPositiveInt
+from httpx_sse import ServerSentEvent
 from pydantic import Json, TypeAdapter
 
+from app.source_graph.client import decode_fastapi_repos
 from app.source_graph.models import SourceGraphRepoData
 
 
@@ -118,3 +121,22 @@ def test_source_graph_repo_data(source_graph_matched_repos_data: Json[Any]) -> N
         )
     )
     assert all(repo.last_fetched_at == IsDatetime for repo in repos_parsed)
+
+
+def test_decode_fastapi_repos(source_graph_matched_repos_data: Json[Any]) -> None:
+    """Test decoding the repos from the matches events only."""
+    repos = decode_fastapi_repos(
+        ServerSentEvent(
+            event="matches", data=json.dumps(source_graph_matched_repos_data)
+        )
+    )
+    expected_repos = TypeAdapter(list[SourceGraphRepoData]).validate_python(
+        source_graph_matched_repos_data
+    )
+    assert repos == expected_repos
+    assert repos is not None
+    # Accessing the URL leaves the repos equal to the ones never accessed
+    assert str(repos[0].repo_url) == f"https://{repos[0].repo_handle}"
+    assert repos == expected_repos
+    # The data of the other events is not decoded at all
+    assert decode_fastapi_repos(ServerSentEvent(event="progress", data="{")) is None
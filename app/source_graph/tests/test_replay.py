@@ -0,0 +1,176 @@
+"""Test the recording and the replay of the source graph stream."""
+from collections.abc import AsyncIterator, MutableMapping
+from pathlib import Path
+from typing import Any, Self
+
+import httpx
+import pytest
+from httpx_sse import aconnect_sse
+
+from app.source_graph.client import AsyncSourceGraphSSEClient
+from app.source_graph.factories import SourceGraphRepoDataFactory
+from app.source_graph.models import SourceGraphRepoData, SourceGraphRepoDataListAdapter
+from app.source_graph.replay import (
+    RecordingTransport,
+    ReplayDisconnectError,
+    ReplayOptions,
+    ReplayTransport,
+    SSEReplay,
+    create_replay_app,
+    load_recording,
+    parse_recording,
+)
+
+pytestmark = pytest.mark.anyio
+
+_STREAM_URL = "https://sourcegraph.test/.api/search/stream"
+
+
+class _ChunkedStream(httpx.AsyncByteStream):
+    """A response stream split into the chunks of the given size."""
+
+    def __init__(self: Self, content: bytes, size: int) -> None:
+        self._content = content
+        self._size = size
+
+    async def __aiter__(self: Self) -> AsyncIterator[bytes]:
+        for start in range(0, len(self._content), self._size):
+            yield self._content[start : start + self._size]
+
+
+def _stream(repos_data: list[SourceGraphRepoData]) -> bytes:
+    """Return a stream with a matches event per repo between the progress events."""
+    chunks = [
+        "event: progress\r\ndata: {}\r\n\r\nevent: matches\r\ndata: "
+        f"{SourceGraphRepoDataListAdapter.dump_json([data], by_alias=True).decode()}"
+        "\r\n\r\n"
+        for data in repos_data
+    ]
+    return "".join([*chunks, "event: done\ndata: {}\n\n"]).encode()
+
+
+async def _read_repos(transport: httpx.AsyncBaseTransport) -> list[dict[str, Any]]:
+    """Read the repos of the stream served by the transport."""
+    async with AsyncSourceGraphSSEClient(transport=transport) as sg_client:
+        return [
+            repo_data.model_dump()
+            async for repos_data in sg_client.aiter_fastapi_repos()
+            for repo_data in repos_data
+        ]
+
+
+async def _read_events(
+    client: httpx.AsyncClient,
+    headers: dict[str, str],
+    received: list[tuple[str, int | None]],
+) -> None:
+    """Read the ids and the retry fields of the events of a connection."""
+    async with aconnect_sse(client, "GET", _STREAM_URL, headers=headers) as source:
+        async for event in source.aiter_sse():
+            received.append((event.id, event.retry))
+
+
+async def test_record_and_replay(
+    tmp_path: Path, source_graph_repo_data_factory: SourceGraphRepoDataFactory
+) -> None:
+    """Test that a recorded stream is replayed as it was received."""
+    repos_data = source_graph_repo_data_factory.batch(5)
+    stream = _stream(repos_data)
+    recording_path = tmp_path / "stream.sse.gz"
+    recording_transport = RecordingTransport(
+        recording_path,
+        httpx.MockTransport(
+            lambda _: httpx.Response(
+                200,
+                headers={"content-type": "text/event-stream"},
+                stream=_ChunkedStream(stream, size=7),
+            )
+        ),
+    )
+    assert await _read_repos(recording_transport) == [
+        repo_data.model_dump() for repo_data in repos_data
+    ]
+    assert recording_transport.events == 11
+
+    events = load_recording(recording_path)
+    assert [event.raw for event in events] == [
+        event.raw for event in parse_recording(stream)
+    ]
+    assert all(
+        previous.time <= event.time
+        for previous, event in zip(events, events[1:], strict=False)
+    )
+    replay = SSEReplay(events, ReplayOptions(speed=1000.0))
+    assert await _read_repos(ReplayTransport(replay)) == [
+        repo_data.model_dump() for repo_data in repos_data
+    ]
+    assert (replay.connections, replay.events_sent) == (1, 11)
+
+
+async def test_replay_disconnects(
+    source_graph_repo_data_factory: SourceGraphRepoDataFactory,
+) -> None:
+    """Test that a dropped connection is continued after the last event id."""
+    replay = SSEReplay(
+        parse_recording(_stream(source_graph_repo_data_factory.batch(3))),
+        ReplayOptions(disconnect_every=3, retry_every=3, retry_ms=10),
+    )
+    received: list[tuple[str, int | None]] = []
+    headers: dict[str, str] = {}
+    async with httpx.AsyncClient(transport=ReplayTransport(replay)) as client:
+        for _ in range(2):
+            with pytest.raises(httpx.ReadError):
+                await _read_events(client, headers, received)
+            headers["Last-Event-ID"] = received[-1][0]
+        await _read_events(client, headers, received)
+    # The events of the recording without the ids are numbered
+    assert received == [
+        (str(index), 10 if index % 3 == 2 else None) for index in range(7)
+    ]
+    assert (replay.connections, replay.events_sent) == (3, 7)
+
+
+async def test_client_continues_after_disconnects(
+    source_graph_repo_data_factory: SourceGraphRepoDataFactory,
+) -> None:
+    """Test that the client reads the whole stream dropped many times."""
+    repos_data = source_graph_repo_data_factory.batch(10)
+    replay = SSEReplay(
+        parse_recording(_stream(repos_data)), ReplayOptions(disconnect_every=1)
+    )
+    assert await _read_repos(ReplayTransport(replay)) == [
+        repo_data.model_dump() for repo_data in repos_data
+    ]
+    assert (replay.connections, replay.events_sent) == (21, 21)
+
+
+async def test_replay_app(
+    source_graph_repo_data_factory: SourceGraphRepoDataFactory,
+) -> None:
+    """Test that the ASGI app serves the replay after the last event id."""
+    replay = SSEReplay(
+        parse_recording(_stream(source_graph_repo_data_factory.batch(2))),
+        ReplayOptions(disconnect_every=3),
+    )
+    app = create_replay_app(replay)
+    messages: list[MutableMapping[str, Any]] = []
+
+    async def _receive() -> MutableMapping[str, Any]:
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def _send(message: MutableMapping[str, Any]) -> None:
+        messages.append(message)
+
+    scope = {"type": "http", "headers": [(b"last-event-id", b"1")]}
+    await app(scope, _receive, _send)
+    assert messages[0]["status"] == 200
+    assert [message["body"].split(b"\n")[0] for message in messages[1:]] == [
+        b"id: 2",
+        b"id: 3",
+        b"id: 4",
+        b"",
+    ]
+    assert messages[-1]["more_body"] is False
+
+    with pytest.raises(ReplayDisconnectError):
+        await app({"type": "http", "headers": []}, _receive, _send)
@@ -1,4 +1,6 @@
 """Test the operations on the database models."""
+from pathlib import Path
+
 import pytest
 import sqlalchemy as sa
 import sqlalchemy.orm
@@ -100,3 +102,56 @@ async def test_list_repositories(
         )
         for repo, repo_data in zip(repos_from_db, some_repos, strict=True)
     )
+
+
+@pytest.mark.parametrize(
+    ("profile", "expected_journal_mode"),
+    [
+        (database.EngineProfile.DEFAULT, "delete"),
+        (database.EngineProfile.BULK_WRITE, "wal"),
+    ],
+)
+async def test_engine_profile_writes(
+    tmp_path: Path,
+    profile: database.EngineProfile,
+    expected_journal_mode: str,
+) -> None:
+    """Test that the writable engine profiles configure the connections."""
+    engine = database.create_engine(profile, tmp_path / "db.sqlite3")
+    try:
+        async with engine.begin() as connection:
+            await connection.run_sync(database.Base.metadata.create_all)
+            assert (
+                await connection.scalar(sa.text("PRAGMA journal_mode"))
+            ) == expected_journal_mode
+            await connection.execute(
+                sa.insert(database.Dependency).values(name="fastapi")
+            )
+    finally:
+        await engine.dispose()
+
+
+async def test_engine_profile_read_only(tmp_path: Path) -> None:
+    """Test that the read-only engine profile reads, but does not write."""
+    db_path = tmp_path / "db.sqlite3"
+    engine = database.create_engine(database.EngineProfile.BULK_WRITE, db_path)
+    try:
+        async with engine.begin() as connection:
+            await connection.run_sync(database.Base.metadata.create_all)
+            await connection.execute(
+                sa.insert(database.Dependency).values(name="fastapi")
+            )
+    finally:
+        await engine.dispose()
+    engine = database.create_engine(database.EngineProfile.READ_ONLY, db_path)
+    try:
+        async with engine.connect() as connection:
+            assert (
+                await connection.scalars(sa.select(database.Dependency.name))
+            ).all() == ["fastapi"]
+            with pytest.raises(sa.exc.OperationalError):
+                await connection.execute(
+                    sa.insert(database.Dependency).values(name="pydantic")
+                )
+    finally:
+        await engine.dispose()
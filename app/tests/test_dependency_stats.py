@@ -0,0 +1,51 @@
+"""Test the statistics of the dependencies."""
+import numpy as np
+
+from app.dependency_stats import compute_dependency_stats
+
+
+def test_compute_dependency_stats() -> None:
+    """Test counting the repos and the co-occurrences of the dependencies."""
+    stats = compute_dependency_stats(
+        edges=np.array(
+            # The dependency 4 is ignored, as it is not in the dependencies
+            [[10, 1], [10, 2], [10, 3], [20, 1], [20, 2], [30, 1], [30, 4]],
+            dtype=np.int64,
+        ),
+        repos=np.array([[30, 5], [10, 100], [20, 20], [40, 1]], dtype=np.int64),
+        dependencies={1: "fastapi", 2: "pydantic", 3: "sqlalchemy"},
+        top_k=1,
+    )
+    assert stats.repo_count == 4
+    assert [
+        (
+            dependency.name,
+            dependency.repo_count,
+            dependency.star_count,
+            list(
+                zip(
+                    dependency.co_occurrence_ids,
+                    dependency.co_occurrence_counts,
+                    strict=True,
+                )
+            ),
+        )
+        for dependency in stats.dependencies
+    ] == [
+        ("fastapi", 3, 125, [(2, 2)]),
+        ("pydantic", 2, 120, [(1, 2)]),
+        ("sqlalchemy", 1, 100, [(1, 1)]),
+    ]
+
+
+def test_compute_dependency_stats_without_repos() -> None:
+    """Test computing the statistics of the unused dependencies."""
+    stats = compute_dependency_stats(
+        edges=np.empty((0, 2), dtype=np.int64),
+        repos=np.empty((0, 2), dtype=np.int64),
+        dependencies={1: "fastapi"},
+    )
+    assert [
+        (dependency.repo_count, dependency.co_occurrence_ids)
+        for dependency in stats.dependencies
+    ] == [(0, [])]
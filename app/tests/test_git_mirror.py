@@ -0,0 +1,214 @@
+"""Test the cache of the git mirrors."""
+import asyncio
+import os
+from pathlib import Path, PurePath
+
+import pytest
+from dirty_equals import IsPositiveInt, IsStr
+
+from app.commands import run_command
+from app.git_mirror import (
+    CloneMode,
+    GitMirrorCache,
+    list_tree_blobs,
+    resolve_remote_head,
+)
+
+pytestmark = pytest.mark.anyio
+
+
+async def _commit(repository: Path, file_name: str, content: str) -> str:
+    """Commit a file into the repository and return the revision."""
+    (repository / file_name).write_text(content)
+    await run_command("git", "add", file_name, cwd=str(repository))
+    await run_command(
+        "git",
+        "-c",
+        "user.name=test",
+        "-c",
+        "user.email=test@example.com",
+        "commit",
+        "--quiet",
+        "-m",
+        f"Add {file_name}",
+        cwd=str(repository),
+    )
+    return (await run_command("git", "rev-parse", "HEAD", cwd=str(repository))).strip()
+
+
+@pytest.fixture()
+async def source_repository(tmp_path: Path) -> Path:
+    """Create a local git repository to mirror."""
+    repository = tmp_path / "source"
+    repository.mkdir()
+    await run_command("git", "init", "--quiet", str(repository))
+    # Allow the partial clones over the file protocol
+    await run_command(
+        "git", "config", "uploadpack.allowFilter", "true", cwd=str(repository)
+    )
+    await _commit(repository, "main.py", "import fastapi\n")
+    await _commit(repository, "README.md", "# FastAPI app\n")
+    await _commit(repository, "requirements.txt", "fastapi\n")
+    return repository
+
+
+async def test_resolve_remote_head(source_repository: Path) -> None:
+    """Test resolving the remote HEAD without cloning."""
+    revision = await run_command("git", "rev-parse", "HEAD", cwd=str(source_repository))
+    assert await resolve_remote_head(source_repository.as_uri()) == revision.strip()
+
+
+async def test_list_tree_blobs(source_repository: Path) -> None:
+    """Test listing the blobs of a revision."""
+    blobs = await list_tree_blobs(source_repository, "HEAD")
+    assert set(blobs) == {
+        PurePath("main.py"),
+        PurePath("README.md"),
+        PurePath("requirements.txt"),
+    }
+    assert all(blob_sha == IsStr(regex=r"[0-9a-f]{40}") for blob_sha in blobs.values())
+
+
+async def test_checkout(source_repository: Path, tmp_path: Path) -> None:
+    """Test checking out a repository from the mirror cache."""
+    cache = GitMirrorCache(root=tmp_path / "mirrors", mode=CloneMode.FULL)
+    url = source_repository.as_uri()
+    async with cache.checkout(url) as checkout:
+        assert checkout.revision == IsStr(regex=r"[0-9a-f]{40}")
+        assert (checkout.directory / "main.py").read_text() == "import fastapi\n"
+        assert (checkout.directory / "README.md").exists()
+        assert checkout.bytes_transferred == IsPositiveInt
+        worktree = checkout.directory
+    assert not worktree.exists()
+    assert (cache.mirror_path(url) / "HEAD").exists()
+
+
+@pytest.mark.parametrize(
+    ("include_manifests", "expected_files"),
+    [
+        pytest.param(False, {"main.py"}, id="python-only"),
+        pytest.param(True, {"main.py", "requirements.txt"}, id="with-manifests"),
+    ],
+)
+async def test_sparse_checkout(
+    source_repository: Path,
+    tmp_path: Path,
+    include_manifests: bool,
+    expected_files: set[str],
+) -> None:
+    """Test that only the selected files are checked out in the sparse mode."""
+    cache = GitMirrorCache(
+        root=tmp_path / "mirrors",
+        mode=CloneMode.SPARSE,
+        include_manifests=include_manifests,
+    )
+    async with cache.checkout(source_repository.as_uri()) as checkout:
+        assert {
+            path.name for path in checkout.directory.glob("[!.]*") if path.is_file()
+        } == expected_files
+
+
+async def test_sparse_checkout_skips_other_blobs(
+    source_repository: Path, tmp_path: Path
+) -> None:
+    """Test that the sparse mode does not download the blobs of other files."""
+    # Big enough to tell apart from the commits and the trees
+    large_content = os.urandom(100_000).hex()
+    await _commit(source_repository, "data.txt", large_content)
+    large_blob = (
+        await run_command(
+            "git", "rev-parse", "HEAD:data.txt", cwd=str(source_repository)
+        )
+    ).strip()
+    cache = GitMirrorCache(root=tmp_path / "mirrors", mode=CloneMode.SPARSE)
+    url = source_repository.as_uri()
+    async with cache.checkout(url) as checkout:
+        assert (checkout.directory / "main.py").read_text() == "import fastapi\n"
+        assert not (checkout.directory / "data.txt").exists()
+        assert checkout.bytes_transferred < len(large_content) // 2
+        # Listing the missing objects does not fetch them lazily
+        missing = await run_command(
+            "git",
+            "rev-list",
+            "--objects",
+            "--missing=print",
+            checkout.revision,
+            cwd=str(cache.mirror_path(url)),
+        )
+    assert f"?{large_blob}" in missing.splitlines()
+
+
+async def test_checkout_fetches_new_revisions(
+    source_repository: Path, tmp_path: Path
+) -> None:
+    """Test that the cached mirror is updated with the new revisions."""
+    cache = GitMirrorCache(root=tmp_path / "mirrors")
+    url = source_repository.as_uri()
+    async with cache.checkout(url) as checkout:
+        first_revision = checkout.revision
+    second_revision = await _commit(source_repository, "app.py", "import pydantic\n")
+    async with cache.checkout(url) as checkout:
+        assert checkout.revision == second_revision != first_revision
+        assert (checkout.directory / "app.py").exists()
+
+
+async def test_evict_least_recently_used(
+    source_repository: Path, tmp_path: Path
+) -> None:
+    """Test that the least recently used mirrors are evicted first."""
+    cache = GitMirrorCache(root=tmp_path / "mirrors")
+    urls = [source_repository.as_uri(), f"{source_repository.as_uri()}/.git"]
+    for url in urls:
+        async with cache.checkout(url):
+            pass
+    oldest_mirror, newest_mirror = (cache.mirror_path(url) for url in urls)
+    os.utime(oldest_mirror, (0, 0))
+    newest_mirror_size = sum(
+        path.stat().st_size for path in newest_mirror.rglob("*") if path.is_file()
+    )
+    cache = GitMirrorCache(root=cache.root, max_size=newest_mirror_size)
+    assert await cache.evict() == [oldest_mirror]
+    assert not oldest_mirror.exists()
+    assert newest_mirror.exists()
+
+
+async def test_evict_concurrently(source_repository: Path, tmp_path: Path) -> None:
+    """Test that the concurrent evictions remove each mirror once."""
+    cache = GitMirrorCache(root=tmp_path / "mirrors")
+    url = source_repository.as_uri()
+    async with cache.checkout(url):
+        pass
+    cache = GitMirrorCache(root=cache.root, max_size=0)
+    assert sorted(await asyncio.gather(cache.evict(), cache.evict())) == [
+        [],
+        [cache.mirror_path(url)],
+    ]
+
+
+async def test_checkouts_of_the_same_mirror(
+    source_repository: Path, tmp_path: Path
+) -> None:
+    """Test that a mirror is kept until all its checkouts are finished."""
+    cache = GitMirrorCache(root=tmp_path / "mirrors", max_size=0)
+    url = source_repository.as_uri()
+    async with cache.checkout(url) as checkout:
+        async with cache.checkout(url):
+            pass
+        assert (cache.mirror_path(url) / "HEAD").exists()
+        assert (checkout.directory / "main.py").exists()
+    assert not cache.mirror_path(url).exists()
+
+
+async def test_concurrent_checkouts_of_the_same_mirror(
+    source_repository: Path, tmp_path: Path
+) -> None:
+    """Test that the concurrent checkouts of a mirror do not race for its refs."""
+    cache = GitMirrorCache(root=tmp_path / "mirrors")
+    url = source_repository.as_uri()
+
+    async def _checkout() -> str:
+        async with cache.checkout(url) as checkout:
+            return checkout.revision
+
+    revisions = await asyncio.gather(*(_checkout() for _ in range(8)))
+    assert len(set(revisions)) == 1
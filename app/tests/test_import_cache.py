@@ -0,0 +1,61 @@
+"""Test the cache of the imports per blob."""
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from pathlib import Path
+
+import pytest
+from pytest_mock import MockerFixture
+
+from app.import_cache import BlobImportsCache
+
+
+@pytest.fixture()
+def imports_cache(tmp_path: Path) -> BlobImportsCache:
+    """Create an empty imports cache."""
+    return BlobImportsCache(tmp_path / "imports.sqlite3")
+
+
+def test_get_many(imports_cache: BlobImportsCache) -> None:
+    """Test looking up the cached imports and counting the hits and misses."""
+    imports_cache.put_many({"a" * 40: {"fastapi", "pydantic"}, "b" * 40: set()})
+    assert imports_cache.get_many(["a" * 40, "b" * 40, "c" * 40]) == {
+        "a" * 40: {"fastapi", "pydantic"},
+        "b" * 40: set(),
+    }
+    assert imports_cache.hits == 2
+    assert imports_cache.misses == 1
+
+
+def test_persisted(tmp_path: Path) -> None:
+    """Test that the cache survives reopening."""
+    with BlobImportsCache(tmp_path / "imports.sqlite3") as imports_cache:
+        imports_cache.put_many({"a" * 40: {"fastapi"}})
+    with BlobImportsCache(tmp_path / "imports.sqlite3") as imports_cache:
+        assert imports_cache.get_many(["a" * 40]) == {"a" * 40: {"fastapi"}}
+
+
+def test_evict(imports_cache: BlobImportsCache, mocker: MockerFixture) -> None:
+    """Test that only the entries unused for longer than the max age are evicted."""
+    now = time.time()
+    mocker.patch("app.import_cache.time.time", return_value=now - 3600)
+    imports_cache.put_many({"a" * 40: {"fastapi"}, "b" * 40: {"flask"}})
+    mocker.patch("app.import_cache.time.time", return_value=now)
+    imports_cache.get_many(["b" * 40])
+    assert imports_cache.evict(timedelta(minutes=30)) == 1
+    assert imports_cache.get_many(["a" * 40, "b" * 40]) == {"b" * 40: {"flask"}}
+
+
+def test_used_from_threads(imports_cache: BlobImportsCache) -> None:
+    """Test that the cache is shared by the concurrent worker threads."""
+    blob_shas = [f"{index:040x}" for index in range(100)]
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(
+            executor.map(
+                lambda blob_sha: imports_cache.put_many({blob_sha: {blob_sha}}),
+                blob_shas,
+            )
+        )
+        found = list(executor.map(lambda sha: imports_cache.get_many([sha]), blob_shas))
+    assert found == [{blob_sha: {blob_sha}} for blob_sha in blob_shas]
+    assert (imports_cache.hits, imports_cache.misses) == (100, 0)
@@ -0,0 +1,71 @@
+"""Test the extraction of the third-party imports."""
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path, PurePath
+
+import pytest
+
+from app.imports import (
+    extract_imports_from_source,
+    extract_third_party_imports,
+    filter_third_party_imports,
+)
+
+
+@pytest.mark.parametrize(
+    ("source", "expected_imports"),
+    [
+        pytest.param(
+            b"import os, fastapi.routing as routing\n"
+            b"from pydantic import BaseModel\n"
+            b"from . import models\n"
+            b"def main():\n"
+            b"    import uvicorn\n",
+            {"os", "fastapi", "pydantic", "uvicorn"},
+            id="python3",
+        ),
+        pytest.param(
+            b'print "Hello"\n'
+            b"import flask; import requests as r\n"
+            b"from .views import index\n"
+            b"from jinja2 import Template\n"
+            b"# import commented\n"
+            b'text = "import quoted"\n',
+            {"flask", "requests", "jinja2"},
+            id="python2-fallback",
+        ),
+    ],
+)
+def test_extract_imports_from_source(source: bytes, expected_imports: set[str]) -> None:
+    """Test extracting the imports from the source code."""
+    assert extract_imports_from_source(source) == expected_imports
+
+
+def test_filter_third_party_imports() -> None:
+    """Test dropping the standard library and the first-party imports."""
+    assert filter_third_party_imports(
+        {
+            PurePath("app/main.py"): {"app", "fastapi", "os"},
+            PurePath("src/package/__init__.py"): {"package", "pydantic"},
+            PurePath("scripts/run.py"): {"helpers", "uvicorn"},
+            PurePath("scripts/helpers.py"): {"typing"},
+            PurePath("setup.py"): {"setuptools"},
+        }
+    ) == ["fastapi", "pydantic", "setuptools", "uvicorn"]
+
+
+@pytest.mark.anyio()
+async def test_extract_third_party_imports(tmp_path: Path) -> None:
+    """Test extracting the third-party imports from a directory."""
+    (tmp_path / "app").mkdir()
+    (tmp_path / "app" / "__init__.py").write_text("")
+    (tmp_path / "app" / "main.py").write_text(
+        "import asyncio\nfrom app import models\nfrom fastapi import FastAPI\n"
+    )
+    (tmp_path / "app" / "models.py").write_text("import sqlalchemy\n")
+    (tmp_path / ".venv").mkdir()
+    (tmp_path / ".venv" / "site.py").write_text("import ignored\n")
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        assert await extract_third_party_imports(tmp_path, executor) == [
+            "fastapi",
+            "sqlalchemy",
+        ]
@@ -0,0 +1,371 @@
+"""Test the creation of the indexes."""
+import gzip
+import json
+from collections.abc import AsyncGenerator
+from pathlib import Path
+
+import brotli
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+import sqlalchemy as sa
+from pytest_mock import MockerFixture
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app import database
+from app.index import (
+    ColumnarFormat,
+    IndexFormat,
+    _IndexItem,
+    _serialize_repo,
+    _write_index,
+    create_dependencies_index,
+    create_dependency_stats,
+    create_repos_index,
+    create_search_index,
+    create_sharded_indexes,
+    export_columnar,
+)
+from app.index_manifest import manifest_path_of, open_manifest
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture()
+async def db_with_repos(tmp_path: Path) -> AsyncGenerator[AsyncEngine, None]:
+    """Create a database with some repos and their dependencies."""
+    engine = database.create_engine(
+        database.EngineProfile.DEFAULT, tmp_path / "db.sqlite3"
+    )
+    try:
+        async with engine.begin() as connection:
+            await connection.run_sync(database.Base.metadata.create_all)
+            await connection.execute(
+                sa.insert(database.Dependency),
+                [{"id": 1, "name": "fastapi"}, {"id": 2, "name": "pydantic"}],
+            )
+            await connection.execute(
+                sa.insert(database.Repo),
+                [
+                    {
+                        "id": repo_id,
+                        "url": f"https://github.com/owner/repo-{repo_id}",
+                        "description": f"Repo {repo_id}",
+                        "stars": repo_id,
+                    }
+                    for repo_id in range(1, 51)
+                ],
+            )
+            await connection.execute(
+                sa.insert(database.RepoDependency),
+                [
+                    {"repo_id": repo_id, "dependency_id": dependency_id}
+                    for repo_id in range(1, 51)
+                    for dependency_id in range(1, repo_id % 3)
+                ],
+            )
+        yield engine
+    finally:
+        await engine.dispose()
+
+
+async def test_create_repos_index(
+    db_with_repos: AsyncEngine, tmp_path: Path, mocker: MockerFixture
+) -> None:
+    """Test that the streamed index is the same as the one dumped at once."""
+    mocker.patch("app.index.WRITE_CHUNK_SIZE", 1024)
+    index_path = tmp_path / "repos_index.json"
+    await create_repos_index(database.create_session_maker(db_with_repos), index_path)
+    index = json.loads(index_path.read_text())
+    assert index_path.read_text() == json.dumps(index, indent=4)
+    assert [repo["id"] for repo in index["repos"]] == list(range(1, 51))
+    assert index["repos"][1]["dependencies"] == [{"id": 1, "name": "fastapi"}]
+    assert list(tmp_path.glob(".*.tmp")) == []
+
+
+async def test_create_dependencies_index(
+    db_with_repos: AsyncEngine, tmp_path: Path
+) -> None:
+    """Test creating the dependencies index."""
+    index_path = tmp_path / "dependencies_index.json"
+    await create_dependencies_index(
+        database.create_session_maker(db_with_repos), index_path
+    )
+    assert index_path.read_text() == json.dumps(
+        {
+            "dependencies": [
+                {"id": 1, "name": "fastapi", "repo_id_deltas": [2] + [3] * 16},
+                {"id": 2, "name": "pydantic", "repo_id_deltas": []},
+            ]
+        },
+        indent=4,
+    )
+
+
+async def test_create_compact_indexes(
+    db_with_repos: AsyncEngine, tmp_path: Path
+) -> None:
+    """Test creating the compact indexes with the precompressed variants."""
+    session_maker = database.create_session_maker(db_with_repos)
+    repos_index_path = tmp_path / "repos_index.json"
+    dependencies_index_path = tmp_path / "dependencies_index.json"
+    await create_repos_index(session_maker, repos_index_path, IndexFormat.COMPACT)
+    await create_dependencies_index(
+        session_maker, dependencies_index_path, IndexFormat.COMPACT
+    )
+    repos_index = repos_index_path.read_bytes()
+    assert b"\n" not in repos_index
+    assert json.loads(repos_index)["schema_version"] == 2
+    assert json.loads(repos_index)["repos"][1] == {
+        "i": 2,
+        "u": "https://github.com/owner/repo-2",
+        "d": "Repo 2",
+        "s": 2,
+        "g": None,
+        "p": [1],
+        "r": None,
+    }
+    assert json.loads(dependencies_index_path.read_bytes()) == {
+        "schema_version": 2,
+        "dependencies": [
+            {"i": 1, "n": "fastapi", "q": [2] + [3] * 16},
+            {"i": 2, "n": "pydantic", "q": []},
+        ],
+    }
+    for index_path in (repos_index_path, dependencies_index_path):
+        index = index_path.read_bytes()
+        gzip_path = index_path.with_name(f"{index_path.name}.gz")
+        brotli_path = index_path.with_name(f"{index_path.name}.br")
+        assert gzip.decompress(gzip_path.read_bytes()) == index
+        assert brotli.decompress(brotli_path.read_bytes()) == index
+    assert list(tmp_path.glob(".*.tmp")) == []
+
+
+async def test_create_index_incrementally(
+    db_with_repos: AsyncEngine, tmp_path: Path
+) -> None:
+    """Test that only the changed repos are serialised, and reported."""
+    session_maker = database.create_session_maker(db_with_repos)
+    index_path = tmp_path / "repos_index.json"
+    changes = await create_repos_index(session_maker, index_path)
+    assert (changes.added, changes.written) == (50, True)
+    assert manifest_path_of(index_path).is_file()
+    first_generation = index_path.read_bytes()
+    first_stat = index_path.stat()
+
+    changes = await create_repos_index(session_maker, index_path)
+    assert (changes.added, changes.unchanged, changes.written) == (0, 50, False)
+    assert index_path.stat().st_ino == first_stat.st_ino
+
+    async with db_with_repos.begin() as connection:
+        await connection.execute(
+            sa.update(database.Repo).where(database.Repo.id == 2).values(stars=100)
+        )
+        await connection.execute(
+            sa.delete(database.RepoDependency).where(
+                database.RepoDependency.repo_id == 50
+            )
+        )
+        await connection.execute(sa.delete(database.Repo).where(database.Repo.id == 50))
+        await connection.execute(
+            sa.insert(database.Repo).values(
+                id=51,
+                url="https://github.com/owner/repo-51",
+                description="Repo 51",
+                stars=51,
+            )
+        )
+    changes = await create_repos_index(session_maker, index_path)
+    assert (
+        changes.added,
+        changes.changed,
+        changes.removed,
+        changes.unchanged,
+        changes.written,
+    ) == (1, 1, 1, 48, True)
+    index = json.loads(index_path.read_text())
+    assert index_path.read_text() == json.dumps(index, indent=4)
+    assert [repo["id"] for repo in index["repos"]] == [*range(1, 50), 51]
+    assert index["repos"][1]["stars"] == 100
+    assert index_path.read_bytes() != first_generation
+    with open_manifest(index_path) as manifest:
+        assert manifest is not None
+        assert (manifest.header.generation, manifest.header.count) == (2, 50)
+        # The items are looked up in the order of their ids
+        first_item = manifest.find(1)
+        assert first_item is not None
+        assert manifest.find(50) is None
+        assert manifest.find(51) is not None
+        assert manifest.find(1) is None
+    assert (
+        index_path.read_bytes()[
+            first_item.offset : first_item.offset + first_item.length
+        ]
+        == json.dumps(index["repos"][0], indent=4).replace("\n", "\n        ").encode()
+    )
+
+
+async def test_write_empty_index(tmp_path: Path) -> None:
+    """Test writing an index without any items."""
+
+    async def _aiter_nothing() -> AsyncGenerator[_IndexItem, None]:
+        for item in ():
+            yield item
+
+    index_path = tmp_path / "index.json"
+    changes = await _write_index(index_path, "items", _aiter_nothing())
+    assert (changes.added, changes.written) == (0, True)
+    assert index_path.read_text() == json.dumps({"items": []}, indent=4)
+
+
+async def test_write_index_failure(tmp_path: Path, mocker: MockerFixture) -> None:
+    """Test that a failed write leaves the previous index untouched."""
+    mocker.patch("app.index.WRITE_CHUNK_SIZE", 1)
+
+    async def _aiter_failing() -> AsyncGenerator[_IndexItem, None]:
+        yield _IndexItem(id=1, hash=b"", data=b"1")
+        raise RuntimeError
+
+    index_path = tmp_path / "index.json"
+    index_path.write_text('{"items": []}')
+    with pytest.raises(RuntimeError):
+        await _write_index(index_path, "items", _aiter_failing())
+    assert index_path.read_text() == '{"items": []}'
+    assert list(tmp_path.iterdir()) == [index_path]
+
+
+async def test_create_sharded_indexes(
+    db_with_repos: AsyncEngine, tmp_path: Path
+) -> None:
+    """Test sharding the indexes into the content-addressed files."""
+    session_maker = database.create_session_maker(db_with_repos)
+    directory = tmp_path / "index"
+    manifest = await create_sharded_indexes(session_maker, directory, shard_size=20)
+    assert manifest.repos.count == 50
+    assert [shard.count for shard in manifest.repos.shards] == [20, 20, 10]
+    assert manifest.dependencies.count == 2
+    assert json.loads((directory / "manifest.json").read_bytes()) == json.loads(
+        manifest.model_dump_json()
+    )
+    first_shard = json.loads((directory / manifest.repos.shards[0].path).read_bytes())
+    assert [repo["i"] for repo in first_shard["repos"]] == list(range(50, 30, -1))
+    for number, shard in enumerate(manifest.repos.shards):
+        assert shard.path == f"repos-{number:04d}.{shard.hash}.json"
+        assert (
+            gzip.decompress((directory / f"{shard.path}.gz").read_bytes())
+            == (directory / shard.path).read_bytes()
+        )
+
+    async with db_with_repos.begin() as connection:
+        await connection.execute(
+            sa.update(database.Repo).where(database.Repo.id == 1).values(stars=0)
+        )
+    next_manifest = await create_sharded_indexes(
+        session_maker, directory, shard_size=20
+    )
+    assert next_manifest.repos.shards[:2] == manifest.repos.shards[:2]
+    assert next_manifest.repos.shards[2] != manifest.repos.shards[2]
+    manifest_stat = (directory / "manifest.json").stat()
+    assert (
+        await create_sharded_indexes(session_maker, directory, shard_size=20)
+        == next_manifest
+    )
+    assert (directory / "manifest.json").stat().st_ino == manifest_stat.st_ino
+    assert sorted(path.name for path in directory.iterdir()) == sorted(
+        [
+            "manifest.json",
+            *(
+                f"{shard.path}{suffix}"
+                for sharded_index in (
+                    next_manifest.repos,
+                    next_manifest.dependencies,
+                )
+                for shard in sharded_index.shards
+                for suffix in ("", ".gz", ".br")
+            ),
+        ]
+    )
+
+
+async def test_create_search_index(db_with_repos: AsyncEngine, tmp_path: Path) -> None:
+    """Test creating the search index, and not rewriting an unchanged one."""
+    session_maker = database.create_session_maker(db_with_repos)
+    index_path = tmp_path / "search_index.json"
+    assert await create_search_index(session_maker, index_path)
+    search_index = json.loads(index_path.read_bytes())
+    # The single digits are too short to be terms
+    assert search_index["terms"] == [*map(str, range(10, 51)), "repo"]
+    assert search_index["frequencies"][-1] == [1] * 50
+    assert (
+        gzip.decompress(index_path.with_name(f"{index_path.name}.gz").read_bytes())
+        == index_path.read_bytes()
+    )
+    assert not await create_search_index(session_maker, index_path)
+
+
+async def test_create_dependency_stats(
+    db_with_repos: AsyncEngine, tmp_path: Path
+) -> None:
+    """Test creating the statistics of the dependencies."""
+    session_maker = database.create_session_maker(db_with_repos)
+    stats_path = tmp_path / "dependency_stats.json"
+    assert await create_dependency_stats(session_maker, stats_path)
+    stats = json.loads(stats_path.read_bytes())
+    assert stats["repo_count"] == 50
+    assert [
+        (dependency["name"], dependency["repo_count"], dependency["star_count"])
+        for dependency in stats["dependencies"]
+    ] == [("fastapi", 17, sum(range(2, 51, 3))), ("pydantic", 0, 0)]
+    assert not await create_dependency_stats(session_maker, stats_path)
+
+
+async def test_export_columnar(db_with_repos: AsyncEngine, tmp_path: Path) -> None:
+    """Test exporting the tables into the Arrow IPC and Parquet files."""
+    session_maker = database.create_session_maker(db_with_repos)
+    assert await export_columnar(session_maker, tmp_path) == {
+        "repo": 50,
+        "dependency": 2,
+        "repo_dependency": 17,
+    }
+    tables = {}
+    for table in ("repo", "dependency", "repo_dependency"):
+        with pa.memory_map(str(tmp_path / f"{table}.arrow")) as source:
+            tables[table] = pa.ipc.open_file(source).read_all()
+        assert pq.read_table(tmp_path / f"{table}.parquet").equals(tables[table])
+    repo_dependency = tables["repo_dependency"]
+    assert (
+        tables["repo"]
+        .column("id")
+        .take(repo_dependency.column("repo_index"))
+        .equals(repo_dependency.column("repo_id"))
+    )
+    assert (
+        tables["dependency"]
+        .column("name")
+        .take(repo_dependency.column("dependency_index"))
+        .to_pylist()
+        == ["fastapi"] * 17
+    )
+    assert list(tmp_path.glob(".*.tmp")) == []
+
+    await export_columnar(session_maker, tmp_path / "arrow", [ColumnarFormat.ARROW])
+    assert sorted(path.name for path in (tmp_path / "arrow").iterdir()) == [
+        "dependency.arrow",
+        "repo.arrow",
+        "repo_dependency.arrow",
+    ]
+
+
+def test_serialize_compact_repo_sorts_dependency_ids() -> None:
+    """Test that the ids of the dependencies do not depend on their loading order."""
+    repo = database.Repo(
+        id=1,
+        url="https://github.com/owner/repo-1",
+        description="",
+        stars=0,
+        dependencies=[
+            database.Dependency(id=2, name="pydantic"),
+            database.Dependency(id=1, name="fastapi"),
+        ],
+    )
+    assert json.loads(_serialize_repo(repo, IndexFormat.COMPACT))["p"] == [1, 2]
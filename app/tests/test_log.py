@@ -0,0 +1,69 @@
+"""Test the logging of the repos."""
+from collections.abc import Iterator
+
+import pytest
+from loguru import logger
+
+from app.log import LogMode, RepoLog
+
+
+@pytest.fixture()
+def messages() -> Iterator[list[str]]:
+    """Collect the messages logged while the test runs."""
+    collected: list[str] = []
+    handler_id = logger.add(
+        lambda message: collected.append(message.record["message"]), level="DEBUG"
+    )
+    yield collected
+    logger.remove(handler_id)
+
+
+def _log_repo(repo_log: RepoLog, repo_id: int) -> None:
+    """Log the steps of a repo and finish it."""
+    with repo_log.repo(repo_id):
+        if repo_log.detailed():
+            logger.debug("Parsing the repo {repo_id}.", repo_id=repo_id)
+        repo_log.note(dependencies=repo_id * 2)
+    repo_log.finish(repo_id, "persisted", revision="abc")
+
+
+def test_verbose_mode(messages: list[str]) -> None:
+    """Test that every step is logged, without the summary records."""
+    repo_log = RepoLog()
+    repo_log.configure(LogMode.VERBOSE, progress_every=2, sample_every=10)
+    for repo_id in range(1, 4):
+        _log_repo(repo_log, repo_id)
+    assert messages[:2] == ["Parsing the repo 1.", "Parsing the repo 2."]
+    assert messages[2].startswith("Progress: 2 repos finished (")
+    assert messages[2].endswith("), persisted 2.")
+    assert messages[3:] == ["Parsing the repo 3."]
+
+
+def test_summary_mode(messages: list[str]) -> None:
+    """Test that the steps are collapsed into a summary record per repo."""
+    repo_log = RepoLog()
+    repo_log.configure(LogMode.SUMMARY, progress_every=5, sample_every=3)
+    for repo_id in range(1, 5):
+        _log_repo(repo_log, repo_id)
+    repo_log.finish(5, "unchanged")
+    assert messages[:6] == [
+        "Repo 1 persisted: dependencies=2 revision=abc.",
+        "Repo 2 persisted: dependencies=4 revision=abc.",
+        # Only every third repo is logged in detail
+        "Parsing the repo 3.",
+        "Repo 3 persisted: dependencies=6 revision=abc.",
+        "Repo 4 persisted: dependencies=8 revision=abc.",
+        "Repo 5 unchanged.",
+    ]
+    assert messages[6].startswith("Progress: 5 repos finished (")
+    assert messages[6].endswith("), persisted 4, unchanged 1.")
+    assert repo_log.outcomes == {"persisted": 4, "unchanged": 1}
+    # The steps of no repo are only logged in the verbose mode
+    assert not repo_log.detailed()
+    assert repo_log.detailed(6)
+
+
+def test_configure_rejects_invalid_intervals() -> None:
+    """Test that the progress and the sampling intervals must be positive."""
+    with pytest.raises(ValueError, match="must be positive"):
+        RepoLog().configure(LogMode.SUMMARY, progress_every=0, sample_every=1)
@@ -0,0 +1,98 @@
+"""Test the runtime metrics of the runs."""
+import asyncio
+import json
+from collections.abc import AsyncGenerator
+from pathlib import Path
+
+import pytest
+
+from app.metrics import HISTOGRAM_BUCKETS, Histogram, Metrics, metrics
+from app.pipeline import Stage, run_pipeline
+
+pytestmark = pytest.mark.anyio
+
+
+def test_histogram_quantiles() -> None:
+    """Test that the quantiles are interpolated within the buckets."""
+    histogram = Histogram()
+    for duration in reversed(range(1, 101)):
+        histogram.observe(duration / 1000)
+    assert histogram.count == 100
+    assert histogram.sum == pytest.approx(5.05)
+    assert [histogram.quantile(q) for q in (0.5, 0.95, 0.99, 1.0)] == [
+        0.05,
+        0.095,
+        0.099,
+        0.1,
+    ]
+    assert histogram.max == 0.1
+    assert histogram.cumulative_counts() == [
+        1,
+        5,
+        10,
+        50,
+        *[100] * (len(HISTOGRAM_BUCKETS) - 4),
+    ]
+    assert Histogram().quantile(0.5) == 0.0
+    # The durations above the highest bound are estimated by the longest one
+    histogram.observe(600.0)
+    assert histogram.quantile(1.0) == 600.0
+
+
+async def test_spans() -> None:
+    """Test that the spans are timed, counted as errors and tracked in flight."""
+    span_metrics = Metrics()
+
+    async def _work(fail: bool) -> None:
+        with span_metrics.span("work"):
+            await asyncio.sleep(0.01)
+            if fail:
+                raise ValueError
+
+    results = await asyncio.gather(
+        *(_work(fail=index == 0) for index in range(3)), return_exceptions=True
+    )
+    assert isinstance(results[0], ValueError)
+    span_metrics.count("items", 3)
+    span_metrics.count("items")
+    report = span_metrics.report("test")
+    assert report.run == "test"
+    assert report.counters == {"items": 4}
+    span = report.spans["work"]
+    assert (span.count, span.errors, span.max_in_flight) == (3, 1, 3)
+    assert 0.01 <= span.p50 <= span.p95 <= span.p99 <= span.max
+    assert span_metrics.in_flight("work") == 0
+
+
+async def _aiter_numbers(count: int) -> AsyncGenerator[int, None]:
+    """Iterate over the numbers from zero."""
+    for number in range(count):
+        yield number
+
+
+async def test_pipeline_spans(tmp_path: Path) -> None:
+    """Test that the stages of a pipeline are written out as the spans."""
+
+    async def _drop_odd(number: int) -> int | None:
+        return None if number % 2 else number
+
+    metrics.reset()
+    await run_pipeline(_aiter_numbers(10), [Stage("drop", _drop_odd, 2, 1)])
+    report = metrics.write(tmp_path, "test-run")
+
+    assert report.spans["drop"].count == 10
+    assert report.counters == {"drop_dropped": 5}
+    assert json.loads((tmp_path / "test-run.json").read_text()) == json.loads(
+        report.model_dump_json()
+    )
+    prometheus = (tmp_path / "test-run.prom").read_text().splitlines()
+    name = "awesome_fastapi_projects_span_duration_seconds"
+    assert f"# TYPE {name} histogram" in prometheus
+    assert f'{name}_bucket{{run="test-run",span="drop",le="+Inf"}} 10' in prometheus
+    assert f'{name}_count{{run="test-run",span="drop"}} 10' in prometheus
+    assert (
+        sum(line.startswith(f'{name}_bucket{{run="test-run"') for line in prometheus)
+        == len(HISTOGRAM_BUCKETS) + 1
+    )
+    assert 'awesome_fastapi_projects_drop_dropped_total{run="test-run"} 5' in prometheus
+    assert not list(tmp_path.glob("*.tmp"))
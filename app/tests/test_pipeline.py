@@ -0,0 +1,99 @@
+"""Test the pipeline of stages."""
+import asyncio
+from collections.abc import AsyncGenerator
+
+import pytest
+
+from app.pipeline import BatchStage, Stage, run_pipeline
+
+pytestmark = pytest.mark.anyio
+
+
+async def _aiter_numbers(count: int) -> AsyncGenerator[int, None]:
+    """Iterate over the numbers from zero."""
+    for number in range(count):
+        yield number
+
+
+async def test_run_pipeline() -> None:
+    """Test that the items flow through the stages, dropped or failed on the way."""
+    collected: list[int] = []
+
+    async def _drop_odd(number: int) -> int | None:
+        return None if number % 2 else number
+
+    async def _fail_on_four(number: int) -> int:
+        if number == 4:
+            raise ValueError(number)
+        return number * 10
+
+    async def _collect(number: int) -> int:
+        collected.append(number)
+        return number
+
+    stages = [
+        Stage("drop", _drop_odd, workers=2, queue_size=1),
+        Stage("fail", _fail_on_four, workers=3, queue_size=1),
+        Stage("collect", _collect, workers=1, queue_size=1),
+    ]
+    await run_pipeline(_aiter_numbers(10), stages)
+    assert sorted(collected) == [0, 20, 60, 80]
+    assert [
+        (stage.stats.processed, stage.stats.dropped, stage.stats.failed)
+        for stage in stages
+    ] == [(10, 5, 0), (4, 0, 1), (4, 0, 0)]
+    assert all(stage.stats.in_flight == 0 for stage in stages)
+    assert all(stage.queue_depth == 0 for stage in stages)
+
+
+async def test_run_pipeline_with_batch_stage() -> None:
+    """Test that the batch stage handles the items in bounded batches."""
+    batches: list[list[int]] = []
+
+    async def _collect(batch: list[int]) -> int | None:
+        if 7 in batch:
+            raise ValueError(batch)
+        batches.append(batch)
+        return len(batch)
+
+    stage: BatchStage[int, int] = BatchStage(
+        "collect",
+        _collect,
+        workers=1,
+        queue_size=4,
+        max_batch_size=3,
+        max_batch_delay=60.0,
+    )
+    await run_pipeline(_aiter_numbers(8), [stage])
+    assert batches == [[0, 1, 2], [3, 4, 5]]
+    assert (
+        stage.stats.processed,
+        stage.stats.failed,
+        stage.stats.batches,
+        stage.stats.in_flight,
+    ) == (6, 2, 2, 0)
+
+
+async def test_batch_stage_max_delay() -> None:
+    """Test that a batch is handled once the maximum delay has passed."""
+    batches: list[list[int]] = []
+
+    async def _collect(batch: list[int]) -> None:
+        batches.append(batch)
+
+    async def _aiter_slowly() -> AsyncGenerator[int, None]:
+        yield 0
+        await asyncio.sleep(0.2)
+        yield 1
+
+    stage: BatchStage[int, None] = BatchStage(
+        "collect",
+        _collect,
+        workers=1,
+        queue_size=4,
+        max_batch_size=10,
+        max_batch_delay=0.05,
+    )
+    await run_pipeline(_aiter_slowly(), [stage])
+    assert batches == [[0], [1]]
+    assert stage.stats.dropped == 2
@@ -0,0 +1,16 @@
+"""Test the delta-encoded postings lists."""
+from app.postings import decode_postings, encode_postings
+
+
+def test_encode_postings() -> None:
+    """Test that the ids are sorted, deduplicated and delta-encoded."""
+    assert encode_postings([10, 3, 4, 10, 20]) == [3, 1, 6, 10]
+    assert encode_postings([]) == []
+
+
+def test_decode_postings() -> None:
+    """Test that the decoded postings list is the sorted unique ids."""
+    assert decode_postings([3, 1, 6, 10]) == [3, 4, 10, 20]
+    assert decode_postings(encode_postings(range(100, 0, -7))) == sorted(
+        range(100, 0, -7)
+    )
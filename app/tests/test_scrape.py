@@ -0,0 +1,366 @@
+"""Test the persistence of the parsed dependencies."""
+from collections.abc import AsyncGenerator
+from pathlib import Path
+
+import httpx
+import pytest
+import sqlalchemy as sa
+from pytest_mock import MockerFixture
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app import database
+from app.metrics import metrics
+from app.models import DependencyCreateData, RepoDependenciesCreateData
+from app.scrape import (
+    _aiter_repos,
+    _create_dependencies_for_repos,
+    merge_results,
+    scrape_source_graph_repos,
+)
+from app.sharding import write_results
+from app.source_graph.factories import SourceGraphRepoDataFactory
+from app.source_graph.models import SourceGraphRepoData, SourceGraphRepoDataListAdapter
+from app.source_graph.replay import (
+    ReplayOptions,
+    ReplayTransport,
+    SSEReplay,
+    parse_recording,
+)
+from app.types import RepoId, RevisionHash, SourceGraphRepoId
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_create_dependencies_for_repos(
+    db_session: AsyncSession,
+    some_repos: list[database.Repo],
+) -> None:
+    """Test creating the dependencies for a batch of repos."""
+    first_repo, second_repo, third_repo = some_repos[:3]
+    existing_dependency = (await first_repo.awaitable_attrs.dependencies)[0]
+    await _create_dependencies_for_repos(
+        db_session,
+        [
+            RepoDependenciesCreateData(
+                repo_id=RepoId(first_repo.id),
+                revision=RevisionHash("a" * 40),
+                dependencies=[
+                    DependencyCreateData(name="shared"),
+                    DependencyCreateData(name=existing_dependency.name),
+                ],
+            ),
+            RepoDependenciesCreateData(
+                repo_id=RepoId(second_repo.id),
+                revision=RevisionHash("b" * 40),
+                dependencies=[
+                    DependencyCreateData(name="shared"),
+                    DependencyCreateData(name="other"),
+                ],
+            ),
+            RepoDependenciesCreateData(
+                repo_id=RepoId(third_repo.id),
+                revision=RevisionHash("c" * 40),
+                dependencies=[],
+            ),
+        ],
+    )
+    revisions = dict(
+        (
+            await db_session.execute(
+                sa.select(database.Repo.id, database.Repo.last_checked_revision)
+            )
+        )
+        .tuples()
+        .all()
+    )
+    assert [revisions[repo.id] for repo in some_repos[:4]] == [
+        "a" * 40,
+        "b" * 40,
+        "c" * 40,
+        None,
+    ]
+    dependency_names = {
+        repo_id: set(names.split("\n"))
+        for repo_id, names in (
+            await db_session.execute(
+                sa.select(
+                    database.RepoDependency.repo_id,
+                    sa.func.group_concat(database.Dependency.name, "\n"),
+                )
+                .join(database.Dependency)
+                .group_by(database.RepoDependency.repo_id)
+            )
+        ).tuples()
+    }
+    assert dependency_names[first_repo.id] >= {"shared", existing_dependency.name}
+    assert dependency_names[second_repo.id] >= {"shared", "other"}
+    assert (
+        await db_session.scalar(
+            sa.select(sa.func.count()).where(database.Dependency.name == "shared")
+        )
+    ) == 1
+
+
+async def test_aiter_repos(tmp_path: Path) -> None:
+    """Test streaming the repos page by page, the never checked ones first."""
+    engine = database.create_engine(
+        database.EngineProfile.DEFAULT, tmp_path / "db.sqlite3"
+    )
+    try:
+        async with engine.begin() as connection:
+            await connection.run_sync(database.Base.metadata.create_all)
+            await connection.execute(
+                sa.insert(database.Repo),
+                [
+                    {
+                        "id": repo_id,
+                        "url": f"https://github.com/owner/repo-{repo_id}",
+                        "description": "",
+                        "stars": 0,
+                        "last_checked_revision": None if repo_id % 3 else "a" * 40,
+                    }
+                    for repo_id in range(1, 8)
+                ],
+            )
+        session_maker = database.create_session_maker(engine)
+        repo_ids: list[int] = []
+        async for repo in _aiter_repos(session_maker, page_size=2):
+            repo_ids.append(repo.id)
+            if repo_ids == [1]:
+                async with engine.begin() as connection:
+                    # A repo checked while streaming is streamed again
+                    await connection.execute(
+                        sa.update(database.Repo)
+                        .where(database.Repo.id == 1)
+                        .values(last_checked_revision="b" * 40)
+                    )
+                    # A repo added while streaming is left for the next run
+                    await connection.execute(
+                        sa.insert(database.Repo).values(
+                            id=8,
+                            url="https://github.com/owner/repo-8",
+                            description="",
+                            stars=0,
+                        )
+                    )
+        assert repo_ids == [1, 2, 4, 5, 7, 1, 3, 6]
+    finally:
+        await engine.dispose()
+
+
+async def test_merge_results(tmp_path: Path) -> None:
+    """Test that merging the results of the shards is idempotent."""
+    engine = database.create_engine(
+        database.EngineProfile.DEFAULT, tmp_path / "db.sqlite3"
+    )
+    try:
+        async with engine.begin() as connection:
+            await connection.run_sync(database.Base.metadata.create_all)
+            await connection.execute(
+                sa.insert(database.Repo),
+                [
+                    {
+                        "id": repo_id,
+                        "url": f"https://github.com/owner/repo-{repo_id}",
+                        "description": "",
+                        "stars": 0,
+                    }
+                    for repo_id in range(1, 4)
+                ],
+            )
+        results_paths = [
+            tmp_path / "shard-0-of-2.jsonl",
+            tmp_path / "shard-1-of-2.jsonl",
+        ]
+        for repo_id, results_path in zip((1, 2), results_paths, strict=True):
+            await write_results(
+                results_path,
+                [
+                    RepoDependenciesCreateData(
+                        repo_id=RepoId(repo_id),
+                        revision=RevisionHash(f"{repo_id:040x}"),
+                        dependencies=[
+                            DependencyCreateData(name="fastapi"),
+                            DependencyCreateData(name=f"dependency-{repo_id}"),
+                        ],
+                    )
+                ],
+            )
+        session_maker = database.create_session_maker(engine)
+        for _ in range(2):
+            assert await merge_results(results_paths, session_maker, batch_size=1) == 2
+        async with engine.connect() as connection:
+            assert (
+                await connection.execute(
+                    sa.select(
+                        database.Repo.id, database.Repo.last_checked_revision
+                    ).order_by(database.Repo.id)
+                )
+            ).all() == [(1, f"{1:040x}"), (2, f"{2:040x}"), (3, None)]
+            assert (
+                await connection.scalar(
+                    sa.select(sa.func.count()).select_from(database.RepoDependency)
+                )
+            ) == 4
+            assert (
+                await connection.scalar(
+                    sa.select(sa.func.count()).select_from(database.Dependency)
+                )
+            ) == 3
+    finally:
+        await engine.dispose()
+
+
+def _source_graph_stream(
+    events: list[tuple[str, list[SourceGraphRepoData]]],
+) -> bytes:
+    """Return the ``text/event-stream`` body with the matches events, then done."""
+    chunks = [
+        f"id: {event_id}\nevent: matches\ndata: "
+        f"{SourceGraphRepoDataListAdapter.dump_json(repos, by_alias=True).decode()}\n\n"
+        for event_id, repos in events
+    ]
+    return "".join([*chunks, "id: done\nevent: done\ndata: {}\n\n"]).encode()
+
+
+def _mock_transport(
+    stream: bytes, requests: list[httpx.Request]
+) -> httpx.MockTransport:
+    """Return the transport serving the stream, recording the requests."""
+
+    def _respond(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(
+            200, headers={"content-type": "text/event-stream"}, content=stream
+        )
+
+    return httpx.MockTransport(_respond)
+
+
+@pytest.fixture()
+async def file_session_maker(
+    tmp_path: Path,
+) -> AsyncGenerator[async_sessionmaker[AsyncSession], None]:
+    """Return the session maker of a database file shared by the sessions."""
+    engine = database.create_engine(
+        database.EngineProfile.DEFAULT, tmp_path / "db.sqlite3"
+    )
+    async with engine.begin() as connection:
+        await connection.run_sync(database.Base.metadata.create_all)
+    yield database.create_session_maker(engine)
+    await engine.dispose()
+
+
+async def test_scrape_source_graph_repos(
+    file_session_maker: async_sessionmaker[AsyncSession],
+    mocker: MockerFixture,
+    source_graph_repo_data_factory: SourceGraphRepoDataFactory,
+) -> None:
+    """Test that the scraped repos are saved in batches, deduplicated."""
+    repos_data = [
+        source_graph_repo_data_factory.build(
+            repositoryID=SourceGraphRepoId(repo_id), repoStars=repo_id
+        )
+        for repo_id in range(1, 11)
+    ]
+    # The repo 1 is received again with more stars in the last event
+    updated_repo_data = repos_data[0].model_copy(update={"stars": 100})
+    requests: list[httpx.Request] = []
+    transport = _mock_transport(
+        _source_graph_stream(
+            [("1", repos_data[:3]), ("2", repos_data[3:]), ("3", [updated_repo_data])]
+        ),
+        requests,
+    )
+    metrics.reset()
+    await scrape_source_graph_repos(
+        file_session_maker,
+        save_batch_size=4,
+        save_batch_delay=60.0,
+        sg_transport=transport,
+    )
+    async with file_session_maker() as session:
+        stars = dict(
+            (
+                await session.execute(
+                    sa.select(database.Repo.source_graph_repo_id, database.Repo.stars)
+                )
+            )
+            .tuples()
+            .all()
+        )
+        checkpoint = await session.get(database.ScrapeCheckpoint, "source-graph-repos")
+    assert stars == {repo_id: repo_id for repo_id in range(1, 11)} | {1: 100}
+    assert len(requests) == 1
+    assert checkpoint is not None
+    assert (
+        checkpoint.last_event_id,
+        checkpoint.events_seen,
+        checkpoint.repos_upserted,
+        checkpoint.completed,
+    ) == ("done", 4, 11, True)
+    report = metrics.report("scrape-repos")
+    assert {"save", "upsert_repos", "commit", "save_checkpoint"} <= set(report.spans)
+    assert report.spans["save"].count == 3
+    assert report.counters == {
+        "matches_events_received": 3,
+        "repos_received": 11,
+        "repos_saved": 11,
+        "save_items": 11,
+    }
+
+
+async def test_scrape_source_graph_repos_resume(
+    file_session_maker: async_sessionmaker[AsyncSession],
+    mocker: MockerFixture,
+    source_graph_repo_data_factory: SourceGraphRepoDataFactory,
+) -> None:
+    """Test that a failed batch holds the checkpoint back, and is resumed from."""
+    repos_data = source_graph_repo_data_factory.batch(6)
+    stream = _source_graph_stream(
+        [("1", repos_data[:2]), ("2", repos_data[2:4]), ("3", repos_data[4:])]
+    )
+    requests: list[httpx.Request] = []
+    save = mocker.patch(
+        "app.scrape._save_scraped_repos_from_source_graph_repos_data",
+        side_effect=[None, RuntimeError("The database is gone."), None],
+    )
+    await scrape_source_graph_repos(
+        file_session_maker,
+        save_batch_size=2,
+        save_batch_delay=60.0,
+        sg_transport=_mock_transport(stream, requests),
+    )
+    assert save.call_count == 3
+    async with file_session_maker() as session:
+        checkpoint = await session.get(database.ScrapeCheckpoint, "source-graph-repos")
+    assert checkpoint is not None
+    assert (
+        checkpoint.last_event_id,
+        checkpoint.events_seen,
+        checkpoint.repos_upserted,
+        checkpoint.completed,
+    ) == ("1", 1, 2, False)
+
+    assert "Last-Event-ID" not in requests[0].headers
+
+    mocker.stopall()
+    # The replay continues the stream after the last event id
+    replay = SSEReplay(parse_recording(stream), ReplayOptions())
+    await scrape_source_graph_repos(
+        file_session_maker,
+        save_batch_size=2,
+        save_batch_delay=60.0,
+        resume=True,
+        sg_transport=ReplayTransport(replay),
+    )
+    assert (replay.connections, replay.events_sent) == (1, 3)
+    async with file_session_maker() as session:
+        checkpoint = await session.get(database.ScrapeCheckpoint, "source-graph-repos")
+    assert checkpoint is not None
+    assert (
+        checkpoint.last_event_id,
+        checkpoint.events_seen,
+        checkpoint.repos_upserted,
+        checkpoint.completed,
+    ) == ("done", 4, 6, True)
@@ -0,0 +1,45 @@
+"""Test the full-text search index."""
+import math
+
+from app.postings import decode_postings
+from app.search_index import BM25_B, BM25_K1, build_search_index, tokenize
+
+
+def test_tokenize() -> None:
+    """Test that the text is normalised, and the stop words are dropped."""
+    assert tokenize("A FastAPI template, with SQLAlchemy_2 and ＤＢ!") == [
+        "fastapi",
+        "template",
+        "sqlalchemy",
+        "db",
+    ]
+
+
+def test_build_search_index() -> None:
+    """Test building the postings lists with the frequencies and the norms."""
+    search_index = build_search_index(
+        [
+            (3, "FastAPI template"),
+            (7, "A template for the FastAPI template"),
+            (10, ""),
+        ]
+    )
+    assert decode_postings(search_index.document_id_deltas) == [3, 7, 10]
+    assert search_index.terms == ["fastapi", "template"]
+    assert [decode_postings(deltas) for deltas in search_index.posting_deltas] == [
+        [0, 1],
+        [0, 1],
+    ]
+    assert search_index.frequencies == [[1, 1], [1, 2]]
+    assert search_index.average_length == round(5 / 3, 4)
+    assert math.isclose(
+        search_index.norms[1],
+        BM25_K1 * (1 - BM25_B + BM25_B * 3 / (5 / 3)),
+        abs_tol=1e-4,
+    )
+
+
+def test_build_empty_search_index() -> None:
+    """Test building the search index without any documents."""
+    search_index = build_search_index([])
+    assert (search_index.terms, search_index.norms) == ([], [])
@@ -0,0 +1,59 @@
+"""Test the sharding of the dependencies parsing."""
+from pathlib import Path
+
+import pytest
+
+from app.models import DependencyCreateData, RepoDependenciesCreateData
+from app.sharding import (
+    Shard,
+    aiter_results,
+    create_results_file,
+    shard_index_of,
+    write_results,
+)
+from app.types import RepoId, RevisionHash
+
+
+def test_parse_shard() -> None:
+    """Test parsing the shard from the I/N notation."""
+    shard = Shard.parse("1/4")
+    assert shard == Shard(index=1, count=4)
+    assert str(shard) == "1/4"
+
+
+@pytest.mark.parametrize("value", ["1", "4/4", "-1/4", "a/4"])
+def test_parse_invalid_shard(value: str) -> None:
+    """Test that the invalid shards are rejected."""
+    with pytest.raises(ValueError, match=r".+"):
+        Shard.parse(value)
+
+
+def test_shards_partition_repos() -> None:
+    """Test that every repo belongs to exactly one shard, and they are balanced."""
+    repo_ids = [RepoId(repo_id) for repo_id in range(1, 10_001)]
+    shards = [Shard(index=index, count=4) for index in range(4)]
+    sizes = [sum(shard.includes(repo_id) for repo_id in repo_ids) for shard in shards]
+    assert sum(sizes) == len(repo_ids)
+    assert all(2_250 < size < 2_750 for size in sizes)
+    # The assignment does not depend on the process or the platform
+    shard_indexes = [shard_index_of(RepoId(repo_id), 4) for repo_id in range(1, 9)]
+    assert shard_indexes == [2, 0, 1, 2, 0, 0, 2, 2]
+
+
+@pytest.mark.anyio()
+async def test_results_file(tmp_path: Path) -> None:
+    """Test writing the results and reading them back."""
+    results = [
+        RepoDependenciesCreateData(
+            repo_id=RepoId(repo_id),
+            revision=RevisionHash(f"{repo_id:040x}"),
+            dependencies=[DependencyCreateData(name="fastapi")],
+        )
+        for repo_id in range(1, 4)
+    ]
+    results_path = tmp_path / "shard-0-of-1.jsonl"
+    results_path.write_text("stale\n")
+    await create_results_file(results_path)
+    await write_results(results_path, results[:2])
+    await write_results(results_path, results[2:])
+    assert [result async for result in aiter_results([results_path])] == results
@@ -0,0 +1 @@
+"""Benchmarks of the performance-sensitive parts of the application."""
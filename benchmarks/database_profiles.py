@@ -0,0 +1,228 @@
+"""
+Benchmark the database engine profiles on their workloads.
+
+- The write workload persists the parsed dependencies of the repos,
+  one transaction per repo, as the scraper does.
+- The read workload loads all the repos with their dependencies,
+  as the repos index does.
+
+Run with ``python -m benchmarks.database_profiles``.
+"""
+import asyncio
+import tempfile
+import time
+from collections.abc import Sequence
+from pathlib import Path
+from typing import Annotated, Final
+
+import sqlalchemy.orm
+import typer
+from loguru import logger
+
+from app.database import (
+    Base,
+    EngineProfile,
+    Repo,
+    create_engine,
+    create_session_maker,
+)
+from app.models import DependencyCreateData, RepoDependenciesCreateData
+from app.scrape import _create_dependencies_for_repos
+from app.types import RepoId, RevisionHash
+from app.uow import async_session_uow
+
+#: The default number of the repos in the database.
+DEFAULT_REPOS: Final[int] = 1000
+#: The default number of the dependencies per repo.
+DEFAULT_DEPENDENCIES_PER_REPO: Final[int] = 20
+#: The default number of the concurrent writers.
+DEFAULT_WRITERS: Final[int] = 4
+#: The default number of the reads of all the repos.
+DEFAULT_READS: Final[int] = 5
+
+app = typer.Typer()
+
+
+def _repos_dependencies_create_data(
+    repos: int, dependencies_per_repo: int
+) -> list[RepoDependenciesCreateData]:
+    """
+    Generate the parsed dependencies of the repos.
+
+    :param repos: The number of the repos.
+    :param dependencies_per_repo: The number of the dependencies per repo.
+    :return: The parsed dependencies of the repos.
+    """
+    return [
+        RepoDependenciesCreateData(
+            repo_id=RepoId(repo_id),
+            revision=RevisionHash(f"{repo_id:040x}"),
+            dependencies=[
+                # Overlapping, as the popular dependencies are shared by the repos
+                DependencyCreateData(name=f"dependency-{(repo_id + index) % 500}")
+                for index in range(dependencies_per_repo)
+            ],
+        )
+        for repo_id in range(1, repos + 1)
+    ]
+
+
+async def _create_database(db_path: Path, repos: int) -> None:
+    """
+    Create the database with the repos without the dependencies.
+
+    :param db_path: The path of the database file.
+    :param repos: The number of the repos.
+    """
+    engine = create_engine(EngineProfile.DEFAULT, db_path)
+    try:
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+            await connection.execute(
+                sqlalchemy.insert(Repo),
+                [
+                    {
+                        "id": repo_id,
+                        "url": f"https://github.com/owner/repo-{repo_id}",
+                        "description": "",
+                        "stars": repo_id,
+                    }
+                    for repo_id in range(1, repos + 1)
+                ],
+            )
+    finally:
+        await engine.dispose()
+
+
+async def _benchmark_writes(
+    db_path: Path,
+    profile: EngineProfile,
+    repos_dependencies_create_data: Sequence[RepoDependenciesCreateData],
+    writers: int,
+) -> float:
+    """
+    Persist the dependencies of the repos, one transaction per repo.
+
+    :param db_path: The path of the database file.
+    :param profile: The engine profile.
+    :param repos_dependencies_create_data: The parsed dependencies of the repos.
+    :param writers: The number of the concurrent writers.
+    :return: The throughput in repos per second.
+    """
+    engine = create_engine(profile, db_path)
+    session_maker = create_session_maker(engine)
+
+    async def _write(offset: int) -> None:
+        for data in repos_dependencies_create_data[offset::writers]:
+            async with session_maker() as session, async_session_uow(session):
+                await _create_dependencies_for_repos(session, [data])
+                await session.commit()
+
+    try:
+        started_at = time.perf_counter()
+        async with asyncio.TaskGroup() as tg:
+            for offset in range(writers):
+                tg.create_task(_write(offset))
+        elapsed = time.perf_counter() - started_at
+    finally:
+        await engine.dispose()
+    return len(repos_dependencies_create_data) / elapsed
+
+
+async def _benchmark_reads(db_path: Path, profile: EngineProfile, reads: int) -> float:
+    """
+    Load all the repos with their dependencies, as the repos index does.
+
+    :param db_path: The path of the database file.
+    :param profile: The engine profile.
+    :param reads: The number of the reads of all the repos.
+    :return: The throughput in repos per second.
+    """
+    engine = create_engine(profile, db_path)
+    session_maker = create_session_maker(engine)
+    loaded = 0
+    try:
+        started_at = time.perf_counter()
+        for _ in range(reads):
+            async with session_maker() as session:
+                loaded += len(
+                    (
+                        await session.scalars(
+                            sqlalchemy.select(Repo)
+                            .order_by(Repo.id)
+                            .options(sqlalchemy.orm.selectinload(Repo.dependencies))
+                        )
+                    ).all()
+                )
+        elapsed = time.perf_counter() - started_at
+    finally:
+        await engine.dispose()
+    return loaded / elapsed
+
+
+async def benchmark_database_profiles(
+    repos: int, dependencies_per_repo: int, writers: int, reads: int
+) -> dict[str, dict[EngineProfile, float]]:
+    """
+    Benchmark the engine profiles on the write and the read workloads.
+
+    Each write run starts with a fresh database, and the read runs use
+    the database written by the last write run.
+
+    :param repos: The number of the repos.
+    :param dependencies_per_repo: The number of the dependencies per repo.
+    :param writers: The number of the concurrent writers.
+    :param reads: The number of the reads of all the repos.
+    :return: The throughput in repos per second, per workload and profile.
+    """
+    repos_dependencies_create_data = _repos_dependencies_create_data(
+        repos, dependencies_per_repo
+    )
+    results: dict[str, dict[EngineProfile, float]] = {"write": {}, "read": {}}
+    with tempfile.TemporaryDirectory() as directory:
+        for profile in (EngineProfile.DEFAULT, EngineProfile.BULK_WRITE):
+            db_path = Path(directory) / f"{profile}.sqlite3"
+            await _create_database(db_path, repos)
+            results["write"][profile] = await _benchmark_writes(
+                db_path, profile, repos_dependencies_create_data, writers
+            )
+        for profile in (EngineProfile.DEFAULT, EngineProfile.READ_ONLY):
+            results["read"][profile] = await _benchmark_reads(db_path, profile, reads)
+    return results
+
+
+@app.command()
+def main(
+    repos: Annotated[
+        int, typer.Option(help="The number of the repos in the database.")
+    ] = DEFAULT_REPOS,
+    dependencies_per_repo: Annotated[
+        int, typer.Option(help="The number of the dependencies per repo.")
+    ] = DEFAULT_DEPENDENCIES_PER_REPO,
+    writers: Annotated[
+        int, typer.Option(help="The number of the concurrent writers.")
+    ] = DEFAULT_WRITERS,
+    reads: Annotated[
+        int, typer.Option(help="The number of the reads of all the repos.")
+    ] = DEFAULT_READS,
+) -> None:
+    """
+    Benchmark the database engine profiles and print the throughput.
+
+    :param repos: The number of the repos in the database.
+    :param dependencies_per_repo: The number of the dependencies per repo.
+    :param writers: The number of the concurrent writers.
+    :param reads: The number of the reads of all the repos.
+    """
+    # The per-repo logging would dominate the write workload
+    logger.disable("app")
+    results = asyncio.run(
+        benchmark_database_profiles(repos, dependencies_per_repo, writers, reads)
+    )
+    for workload, throughputs in results.items():
+        for profile, throughput in throughputs.items():
+            typer.echo(f"{workload:<6} {profile:<11} {throughput:>10.1f} repos/s")
+
+
+if __name__ == "__main__":
+    app()
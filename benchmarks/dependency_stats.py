@@ -0,0 +1,96 @@
+"""
+Benchmark the computation of the statistics of the dependencies.
+
+The repos use the dependencies drawn from a Zipf distribution, so a few
+dependencies are used by most of the repos, as ``fastapi`` and ``pydantic``
+are, and the co-occurrence matrix is as dense as the real one.
+
+Run with ``python -m benchmarks.dependency_stats``.
+"""
+import time
+from typing import Annotated, Final
+
+import numpy as np
+import numpy.typing as npt
+import typer
+
+from app.dependency_stats import DEFAULT_TOP_K, compute_dependency_stats
+
+#: The default number of the repos.
+DEFAULT_REPOS: Final[int] = 100_000
+#: The default number of the dependencies.
+DEFAULT_DEPENDENCIES: Final[int] = 10_000
+#: The default number of the dependencies per repo.
+DEFAULT_DEPENDENCIES_PER_REPO: Final[int] = 20
+#: The exponent of the Zipf distribution of the dependencies.
+ZIPF_EXPONENT: Final[float] = 1.2
+
+app = typer.Typer()
+
+
+def _generate_edges(
+    repos: int, dependencies: int, dependencies_per_repo: int
+) -> npt.NDArray[np.int64]:
+    """
+    Generate the ids of the repos and of their dependencies.
+
+    :param repos: The number of the repos.
+    :param dependencies: The number of the dependencies.
+    :param dependencies_per_repo: The number of the dependencies per repo.
+    :return: The ids of the repos and of their dependencies, in two columns.
+    """
+    rng = np.random.default_rng(0)
+    repo_ids = np.repeat(np.arange(1, repos + 1), dependencies_per_repo)
+    dependency_ids = (
+        rng.zipf(ZIPF_EXPONENT, size=len(repo_ids)) - 1
+    ) % dependencies + 1
+    return np.unique(np.column_stack((repo_ids, dependency_ids)), axis=0)
+
+
+@app.command()
+def main(
+    repos: Annotated[
+        int, typer.Option(help="The number of the repos.")
+    ] = DEFAULT_REPOS,
+    dependencies: Annotated[
+        int, typer.Option(help="The number of the dependencies.")
+    ] = DEFAULT_DEPENDENCIES,
+    dependencies_per_repo: Annotated[
+        int, typer.Option(help="The number of the dependencies per repo.")
+    ] = DEFAULT_DEPENDENCIES_PER_REPO,
+    top_k: Annotated[
+        int,
+        typer.Option(
+            help="The maximum number of the co-occurring dependencies "
+            "per dependency."
+        ),
+    ] = DEFAULT_TOP_K,
+) -> None:
+    """
+    Benchmark the statistics of the dependencies and print the time taken.
+
+    :param repos: The number of the repos.
+    :param dependencies: The number of the dependencies.
+    :param dependencies_per_repo: The number of the dependencies per repo.
+    :param top_k: The maximum number of the co-occurring dependencies
+        per dependency.
+    """
+    edges = _generate_edges(repos, dependencies, dependencies_per_repo)
+    repo_stars = np.column_stack(
+        (np.arange(1, repos + 1), np.random.default_rng(1).integers(0, 1000, repos))
+    )
+    names = {
+        dependency_id: f"dependency-{dependency_id}"
+        for dependency_id in range(1, dependencies + 1)
+    }
+    started_at = time.perf_counter()
+    stats = compute_dependency_stats(edges, repo_stars, names, top_k)
+    elapsed = time.perf_counter() - started_at
+    typer.echo(
+        f"{len(edges)} edges, {stats.repo_count} repos, "
+        f"{len(stats.dependencies)} dependencies: {elapsed:.2f} s"
+    )
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,177 @@
+"""
+Benchmark the scraping of the source graph repos end to end, offline.
+
+The scraper reads a replay of a recorded stream, or of a synthetic one, and
+saves the repos into a fresh database, as ``scrape-repos`` does. The replay
+may be slowed down to the recorded speed, and may drop the connection or
+send the ``retry`` fields to exercise the reconnections.
+
+Run with ``python -m benchmarks.scrape_replay``.
+"""
+import asyncio
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Annotated, Final, Optional
+
+import sqlalchemy
+import typer
+from loguru import logger
+
+from app.database import Base, EngineProfile, Repo, create_engine, create_session_maker
+from app.scrape import (
+    DEFAULT_SAVE_BATCH_DELAY,
+    DEFAULT_SAVE_BATCH_SIZE,
+    scrape_source_graph_repos,
+)
+from app.source_graph.replay import (
+    ReplayOptions,
+    ReplayTransport,
+    SSEReplay,
+    load_recording,
+    parse_recording,
+)
+from benchmarks.source_graph_decode import (
+    DEFAULT_EVENTS,
+    DEFAULT_PROGRESS_PER_EVENT,
+    DEFAULT_REPOS_PER_EVENT,
+    synthetic_stream,
+)
+
+#: The default number of the scraping runs.
+DEFAULT_RUNS: Final[int] = 3
+
+app = typer.Typer()
+
+
+@dataclass(frozen=True, slots=True)
+class ScrapeReplayResult:
+    """The throughput of a scraping run."""
+
+    #: The number of the events sent by the replay per second.
+    events_per_second: float
+    #: The number of the repos in the database per second.
+    rows_per_second: float
+    #: The number of the connections to the replay.
+    connections: int
+
+
+async def benchmark_scrape_replay(
+    replay: SSEReplay,
+    db_path: Path,
+    save_batch_size: int,
+) -> ScrapeReplayResult:
+    """
+    Scrape the replay into a fresh database.
+
+    :param replay: The replay of the stream.
+    :param db_path: The path of the database file.
+    :param save_batch_size: The maximum number of the repos upserted
+        in a single transaction.
+    :return: The throughput of the run.
+    """
+    engine = create_engine(EngineProfile.BULK_WRITE, db_path)
+    try:
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+        session_maker = create_session_maker(engine)
+        started_at = time.perf_counter()
+        await scrape_source_graph_repos(
+            session_maker,
+            save_batch_size=save_batch_size,
+            save_batch_delay=DEFAULT_SAVE_BATCH_DELAY,
+            sg_transport=ReplayTransport(replay),
+        )
+        elapsed = time.perf_counter() - started_at
+        async with session_maker() as session:
+            rows = await session.scalar(sqlalchemy.func.count(Repo.id))
+    finally:
+        await engine.dispose()
+    return ScrapeReplayResult(
+        events_per_second=replay.events_sent / elapsed,
+        rows_per_second=(rows or 0) / elapsed,
+        connections=replay.connections,
+    )
+
+
+@app.command()
+def main(
+    recording_path: Annotated[
+        Optional[Path],  # noqa: UP007 - typer does not support the union syntax
+        typer.Option(
+            "--recording",
+            help="The recorded stream; a synthetic one is generated if not given.",
+        ),
+    ] = None,
+    events: Annotated[
+        int, typer.Option(help="The number of the matches events to generate.")
+    ] = DEFAULT_EVENTS,
+    repos_per_event: Annotated[
+        int, typer.Option(help="The number of the repos per matches event.")
+    ] = DEFAULT_REPOS_PER_EVENT,
+    speed: Annotated[
+        Optional[float],  # noqa: UP007 - typer does not support the union syntax
+        typer.Option(help="The speed relative to the recording; no delays if not set."),
+    ] = None,
+    disconnect_every: Annotated[
+        Optional[int],  # noqa: UP007 - typer does not support the union syntax
+        typer.Option(help="Drop the connection after every that many events."),
+    ] = None,
+    retry_every: Annotated[
+        Optional[int],  # noqa: UP007 - typer does not support the union syntax
+        typer.Option(help="Send the retry field with every that many events."),
+    ] = None,
+    save_batch_size: Annotated[
+        int,
+        typer.Option(help="The maximum number of the repos upserted per transaction."),
+    ] = DEFAULT_SAVE_BATCH_SIZE,
+    runs: Annotated[
+        int, typer.Option(help="The number of the scraping runs.")
+    ] = DEFAULT_RUNS,
+) -> None:
+    """
+    Benchmark the scraping of a replay and print the best throughput.
+
+    :param recording_path: The recorded stream.
+    :param events: The number of the matches events to generate.
+    :param repos_per_event: The number of the repos per matches event.
+    :param speed: The speed relative to the recording.
+    :param disconnect_every: Drop the connection after every that many events.
+    :param retry_every: Send the retry field with every that many events.
+    :param save_batch_size: The maximum number of the repos upserted
+        per transaction.
+    :param runs: The number of the scraping runs.
+    """
+    # The per-event logging would dominate the scraping
+    logger.disable("app")
+    recorded_events = (
+        load_recording(recording_path)
+        if recording_path is not None
+        else parse_recording(
+            synthetic_stream(events, repos_per_event, DEFAULT_PROGRESS_PER_EVENT)
+        )
+    )
+    options = ReplayOptions(
+        speed=speed, disconnect_every=disconnect_every, retry_every=retry_every
+    )
+    results: list[ScrapeReplayResult] = []
+    with tempfile.TemporaryDirectory() as directory:
+        for run in range(runs):
+            results.append(
+                asyncio.run(
+                    benchmark_scrape_replay(
+                        SSEReplay(recorded_events, options),
+                        Path(directory) / f"{run}.sqlite3",
+                        save_batch_size,
+                    )
+                )
+            )
+    best = max(results, key=lambda result: result.rows_per_second)
+    typer.echo(f"{len(recorded_events)} events, {best.connections} connections")
+    typer.echo(f"events {best.events_per_second:>10.1f} events/s")
+    typer.echo(f"rows   {best.rows_per_second:>10.1f} rows/s")
+
+
+if __name__ == "__main__":
+    app()
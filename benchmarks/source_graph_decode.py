@@ -0,0 +1,190 @@
+"""
+Benchmark the decoding of the events of the SourceGraph SSE API.
+
+The events are read from a recording of the stream, see
+:mod:`app.source_graph.replay`, or from a synthetic one shaped like it: the ``matches``
+events with the repos, interleaved with the ``progress`` events.
+
+Two decoding paths are compared on the same events:
+
+- the baseline decodes the JSON into the Python objects and validates them,
+  then builds a URL adapter for every repo, as the scraper used to;
+- the fast path validates the raw JSON, and reuses the URL adapter.
+
+Run with ``python -m benchmarks.source_graph_decode``.
+"""
+import asyncio
+import json
+import time
+from collections.abc import Callable
+from pathlib import Path
+from typing import Annotated, Final, Optional
+
+import httpx
+import typer
+from httpx_sse import ServerSentEvent, aconnect_sse
+from pydantic import HttpUrl, TypeAdapter
+
+from app.source_graph.client import decode_fastapi_repos
+from app.source_graph.models import SourceGraphRepoData, SourceGraphRepoDataListAdapter
+from app.source_graph.replay import load_recording
+
+#: The default number of the matches events in the synthetic stream.
+DEFAULT_EVENTS: Final[int] = 200
+#: The default number of the repos per matches event.
+DEFAULT_REPOS_PER_EVENT: Final[int] = 100
+#: The default number of the progress events per matches event.
+DEFAULT_PROGRESS_PER_EVENT: Final[int] = 5
+#: The default number of the decoding runs.
+DEFAULT_RUNS: Final[int] = 5
+
+app = typer.Typer()
+
+
+def synthetic_stream(
+    events: int, repos_per_event: int, progress_per_event: int
+) -> bytes:
+    """
+    Generate a stream of the SourceGraph SSE API.
+
+    :param events: The number of the matches events.
+    :param repos_per_event: The number of the repos per matches event.
+    :param progress_per_event: The number of the progress events per matches event.
+    :return: The ``text/event-stream`` body.
+    """
+    chunks: list[str] = []
+    for event in range(events):
+        progress = json.dumps(
+            {"done": False, "repositoriesCount": event, "matchCount": event}
+        )
+        chunks.extend(
+            f"event: progress\ndata: {progress}\n\n" for _ in range(progress_per_event)
+        )
+        repos = [
+            {
+                "type": "repo",
+                "repositoryID": event * repos_per_event + repo,
+                "repository": f"github.com/owner-{event}/repo-{repo}",
+                "repoStars": repo,
+                "repoLastFetched": "2023-07-31T18:47:22.875731Z",
+                "description": f"A FastAPI project number {repo} of the event {event}.",
+                "metadata": {"fastapi": "null", "python": "null"},
+            }
+            for repo in range(repos_per_event)
+        ]
+        chunks.append(f"event: matches\ndata: {json.dumps(repos)}\n\n")
+    chunks.append("event: done\ndata: {}\n\n")
+    return "".join(chunks).encode()
+
+
+async def _read_events(stream: bytes) -> list[ServerSentEvent]:
+    """
+    Read the events from the stream, as the client does.
+
+    :param stream: The ``text/event-stream`` body.
+    :return: The events.
+    """
+    transport = httpx.MockTransport(
+        lambda _: httpx.Response(
+            200, headers={"content-type": "text/event-stream"}, content=stream
+        )
+    )
+    async with httpx.AsyncClient(transport=transport) as client, aconnect_sse(
+        client, "GET", "https://sourcegraph.test/.api/search/stream"
+    ) as event_source:
+        return [event async for event in event_source.aiter_sse()]
+
+
+def _decode_baseline(event: ServerSentEvent) -> list[SourceGraphRepoData] | None:
+    """
+    Decode the repos as the scraper used to.
+
+    :param event: The event.
+    :return: The repos, or ``None`` if the event has none.
+    """
+    if event.event != "matches":
+        return None
+    repos = SourceGraphRepoDataListAdapter.validate_python(event.json())
+    for repo in repos:
+        TypeAdapter(HttpUrl).validate_python(f"https://{repo.repo_handle}")
+    return repos
+
+
+def _decode_fast(event: ServerSentEvent) -> list[SourceGraphRepoData] | None:
+    """
+    Decode the repos with the fast path, reading their URLs.
+
+    :param event: The event.
+    :return: The repos, or ``None`` if the event has none.
+    """
+    repos = decode_fastapi_repos(event)
+    for repo in repos or ():
+        repo.repo_url  # noqa: B018 - the URL is read by the mapper
+    return repos
+
+
+def _benchmark(
+    decode: Callable[[ServerSentEvent], list[SourceGraphRepoData] | None],
+    events: list[ServerSentEvent],
+    runs: int,
+) -> float:
+    """
+    Decode the events, and return the best throughput of the runs.
+
+    :param decode: The function decoding an event.
+    :param events: The events.
+    :param runs: The number of the runs.
+    :return: The throughput in repos per second.
+    """
+    best = 0.0
+    for _ in range(runs):
+        started_at = time.perf_counter()
+        repos = sum(len(decode(event) or ()) for event in events)
+        best = max(best, repos / (time.perf_counter() - started_at))
+    return best
+
+
+@app.command()
+def main(
+    stream_path: Annotated[
+        Optional[Path],  # noqa: UP007 - typer does not support the union syntax
+        typer.Option(
+            "--stream",
+            help="The recorded stream; a synthetic one is generated if not given.",
+        ),
+    ] = None,
+    events: Annotated[
+        int, typer.Option(help="The number of the matches events to generate.")
+    ] = DEFAULT_EVENTS,
+    repos_per_event: Annotated[
+        int, typer.Option(help="The number of the repos per matches event.")
+    ] = DEFAULT_REPOS_PER_EVENT,
+    progress_per_event: Annotated[
+        int, typer.Option(help="The number of the progress events per matches event.")
+    ] = DEFAULT_PROGRESS_PER_EVENT,
+    runs: Annotated[
+        int, typer.Option(help="The number of the decoding runs.")
+    ] = DEFAULT_RUNS,
+) -> None:
+    """
+    Benchmark the decoding paths and print their throughput.
+
+    :param stream_path: The recorded stream.
+    :param events: The number of the matches events to generate.
+    :param repos_per_event: The number of the repos per matches event.
+    :param progress_per_event: The number of the progress events per matches event.
+    :param runs: The number of the decoding runs.
+    """
+    stream = (
+        b"".join(b"%s\n\n" % event.raw for event in load_recording(stream_path))
+        if stream_path is not None
+        else synthetic_stream(events, repos_per_event, progress_per_event)
+    )
+    sse_events = asyncio.run(_read_events(stream))
+    typer.echo(f"{len(sse_events)} events, {len(stream)} bytes")
+    for name, decode in (("baseline", _decode_baseline), ("fast", _decode_fast)):
+        typer.echo(f"{name:<8} {_benchmark(decode, sse_events, runs):>10.1f} repos/s")
+
+
+if __name__ == "__main__":
+    app()
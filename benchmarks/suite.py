@@ -0,0 +1,530 @@
+"""
+The benchmark suite of the hot paths, gated against the baselines.
+
+The cases run on the datasets of 1k, 10k and 100k repos, generated with
+the factories of the models:
+
+- ``upsert-repos``: the upsert of the scraped repos, in the batches
+  of the scraper, into an empty database;
+- ``create-dependencies``: the creation of the parsed dependencies
+  of the repos, in the batches of the scraper;
+- ``index-repos`` and ``index-dependencies``: the indexes of the repos
+  and of the dependencies, from scratch;
+- ``decode-events``: the decoding of the repos from the matches events
+  of the SourceGraph SSE API, with their URLs.
+
+The latency of a case is the best of its runs; the peak memory is the peak
+of the Python allocations while the case runs, traced in an extra run so
+that the tracing does not slow down the timed runs. Each run starts from
+a fresh copy of the database it needs.
+
+The results are compared with the baselines, and a case slower or using more
+memory than its baseline beyond the threshold fails the suite. The baselines
+are machine-specific: update them on the machine the suite is gated on.
+
+Run with ``python -m benchmarks.suite``, or ``make bench``; update the
+baselines with ``--update-baselines``.
+"""
+import asyncio
+import contextlib
+import random
+import shutil
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Awaitable, Callable, Iterator, Mapping, Sequence
+from dataclasses import dataclass
+from enum import StrEnum
+from pathlib import Path
+from typing import Annotated, Final, Optional, Self
+
+import typer
+from httpx_sse import ServerSentEvent
+from loguru import logger
+from pydantic import BaseModel, NonNegativeFloat, NonNegativeInt
+
+from app.database import Base, EngineProfile, create_engine, create_session_maker
+from app.factories import DependencyCreateDataFactory
+from app.index import create_dependencies_index, create_repos_index
+from app.models import DependencyCreateData, RepoDependenciesCreateData
+from app.scrape import (
+    DEFAULT_PERSIST_BATCH_SIZE,
+    DEFAULT_SAVE_BATCH_SIZE,
+    _chunks,
+    _create_dependencies_for_repos,
+)
+from app.source_graph.client import decode_fastapi_repos
+from app.source_graph.factories import SourceGraphRepoDataFactory
+from app.source_graph.mapper import create_or_update_repos_from_source_graph_repos_data
+from app.source_graph.models import SourceGraphRepoData, SourceGraphRepoDataListAdapter
+from app.types import RepoId, RevisionHash, SourceGraphRepoId
+from app.uow import async_session_uow
+
+#: The default numbers of the repos of the datasets.
+DEFAULT_SIZES: Final[tuple[int, ...]] = (1_000, 10_000, 100_000)
+#: The default number of the timed runs of a case.
+DEFAULT_RUNS: Final[int] = 3
+#: The default path of the baselines.
+DEFAULT_BASELINES_PATH: Final[Path] = Path(__file__).parent / "baselines.json"
+#: The default relative latency increase failing the suite.
+DEFAULT_LATENCY_THRESHOLD: Final[float] = 0.25
+#: The default relative peak memory increase failing the suite.
+DEFAULT_MEMORY_THRESHOLD: Final[float] = 0.10
+#: The seed of the random data of the datasets.
+DATASET_SEED: Final[int] = 42
+#: The number of the repos built by the factory; the rest are copies of them.
+REPO_TEMPLATES: Final[int] = 1_000
+#: The number of the dependencies of each repo.
+DEPENDENCIES_PER_REPO: Final[int] = 10
+#: The number of the repos per matches event.
+REPOS_PER_EVENT: Final[int] = 100
+
+app = typer.Typer()
+
+
+class BenchmarkCase(StrEnum):
+    """A case of the benchmark suite."""
+
+    UPSERT_REPOS = "upsert-repos"
+    CREATE_DEPENDENCIES = "create-dependencies"
+    INDEX_REPOS = "index-repos"
+    INDEX_DEPENDENCIES = "index-dependencies"
+    DECODE_EVENTS = "decode-events"
+
+
+class BenchmarkResult(BaseModel):
+    """The result of a case on a dataset."""
+
+    #: The best latency of the runs in seconds.
+    latency: NonNegativeFloat
+    #: The peak of the Python allocations in bytes.
+    peak_memory: NonNegativeInt
+
+
+class BenchmarkResults(BaseModel):
+    """The results of the suite, per ``case/size`` key."""
+
+    results: dict[str, BenchmarkResult] = {}
+
+
+@dataclass(frozen=True, slots=True)
+class Dataset:
+    """A dataset of the repos and of their dependencies."""
+
+    #: The scraped repos.
+    repos: Sequence[SourceGraphRepoData]
+    #: The parsed dependencies of the repos, by their ids in the database.
+    repos_dependencies: Sequence[RepoDependenciesCreateData]
+
+
+def generate_dataset(size: int) -> Dataset:
+    """
+    Generate a dataset with the factories, the same for the same size.
+
+    The factories build up to :data:`REPO_TEMPLATES` repos; the others are
+    copies of them with their own ids and URLs. The dependencies are drawn
+    from a pool a tenth as large as the dataset, so they are shared by
+    the repos as the popular ones are.
+
+    :param size: The number of the repos.
+    :return: The dataset.
+    """
+    SourceGraphRepoDataFactory.seed_random(DATASET_SEED)
+    DependencyCreateDataFactory.seed_random(DATASET_SEED)
+    templates = SourceGraphRepoDataFactory.batch(min(size, REPO_TEMPLATES))
+    repos = [
+        templates[index % len(templates)].model_copy(
+            update={
+                "repo_id": SourceGraphRepoId(index + 1),
+                "repo_handle": f"github.com/owner-{index % 97}/repo-{index}",
+            }
+        )
+        for index in range(size)
+    ]
+    names = sorted(
+        {data.name for data in DependencyCreateDataFactory.batch(max(size // 10, 100))}
+    )
+    rng = random.Random(DATASET_SEED)
+    repos_dependencies = [
+        RepoDependenciesCreateData(
+            # The repos are inserted into an empty database in order
+            repo_id=RepoId(index + 1),
+            revision=RevisionHash(f"{index:040x}"),
+            dependencies=[
+                DependencyCreateData(name=name)
+                for name in rng.sample(names, DEPENDENCIES_PER_REPO)
+            ],
+        )
+        for index in range(size)
+    ]
+    return Dataset(repos=repos, repos_dependencies=repos_dependencies)
+
+
+@dataclass(slots=True)
+class Measurement:
+    """The measurement of a run of a case."""
+
+    #: The latency of the measured part of the run in seconds.
+    latency: float = 0.0
+    #: The peak of the Python allocations of the measured part, if traced.
+    peak_memory: int = 0
+
+    @contextlib.contextmanager
+    def measure(self: Self) -> Iterator[None]:
+        """Measure the latency, and the peak memory if it is traced."""
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+            allocated, _ = tracemalloc.get_traced_memory()
+        started_at = time.perf_counter()
+        yield
+        self.latency = time.perf_counter() - started_at
+        if tracemalloc.is_tracing():
+            self.peak_memory = tracemalloc.get_traced_memory()[1] - allocated
+
+
+async def _upsert_repos(
+    dataset: Dataset, db_path: Path, measurement: Measurement
+) -> None:
+    """
+    Upsert the repos into an empty database, in the batches of the scraper.
+
+    :param dataset: The dataset.
+    :param db_path: The path of the database file to create.
+    :param measurement: The measurement of the run.
+    """
+    engine = create_engine(EngineProfile.BULK_WRITE, db_path)
+    try:
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+        session_maker = create_session_maker(engine)
+        with measurement.measure():
+            for batch in _chunks(dataset.repos, DEFAULT_SAVE_BATCH_SIZE):
+                async with session_maker() as session, async_session_uow(session):
+                    await create_or_update_repos_from_source_graph_repos_data(
+                        session, batch
+                    )
+                    await session.commit()
+    finally:
+        await engine.dispose()
+
+
+async def _create_dependencies(
+    dataset: Dataset, db_path: Path, measurement: Measurement
+) -> None:
+    """
+    Create the dependencies of the repos, in the batches of the scraper.
+
+    :param dataset: The dataset.
+    :param db_path: The path of the database file with the repos.
+    :param measurement: The measurement of the run.
+    """
+    engine = create_engine(EngineProfile.BULK_WRITE, db_path)
+    try:
+        session_maker = create_session_maker(engine)
+        with measurement.measure():
+            for batch in _chunks(
+                dataset.repos_dependencies, DEFAULT_PERSIST_BATCH_SIZE
+            ):
+                async with session_maker() as session, async_session_uow(session):
+                    await _create_dependencies_for_repos(session, batch)
+                    await session.commit()
+    finally:
+        await engine.dispose()
+
+
+async def _index(
+    create_index: Callable[..., Awaitable[object]],
+    db_path: Path,
+    measurement: Measurement,
+) -> None:
+    """
+    Create an index from scratch, from the database with the dependencies.
+
+    :param create_index: The function creating the index.
+    :param db_path: The path of the database file with the dependencies.
+    :param measurement: The measurement of the run.
+    """
+    engine = create_engine(EngineProfile.READ_ONLY, db_path)
+    try:
+        with measurement.measure():
+            await create_index(
+                session_maker=create_session_maker(engine),
+                index_path=db_path.with_name("index.json"),
+            )
+    finally:
+        await engine.dispose()
+
+
+def _decode_events(events: Sequence[ServerSentEvent], measurement: Measurement) -> None:
+    """
+    Decode the repos of the events with their URLs, as the scraper does.
+
+    :param events: The matches events.
+    :param measurement: The measurement of the run.
+    """
+    with measurement.measure():
+        for event in events:
+            for repo in decode_fastapi_repos(event) or ():
+                repo.repo_url  # noqa: B018 - the URL is read by the mapper
+
+
+class _Snapshots:
+    """The databases of a dataset, built once and copied for each run."""
+
+    def __init__(self: Self, dataset: Dataset, directory: Path) -> None:
+        """
+        Initialize the snapshots.
+
+        :param dataset: The dataset.
+        :param directory: The directory of the snapshots.
+        """
+        self._dataset = dataset
+        self._directory = directory
+        self._repos: Path | None = None
+        self._dependencies: Path | None = None
+
+    async def repos(self: Self) -> Path:
+        """Return the database with the repos, built on the first call."""
+        if self._repos is None:
+            self._repos = self._directory / "repos.sqlite3"
+            await _upsert_repos(self._dataset, self._repos, Measurement())
+        return self._repos
+
+    async def dependencies(self: Self) -> Path:
+        """Return the database with the dependencies, built on the first call."""
+        if self._dependencies is None:
+            self._dependencies = self._directory / "dependencies.sqlite3"
+            shutil.copyfile(await self.repos(), self._dependencies)
+            await _create_dependencies(self._dataset, self._dependencies, Measurement())
+        return self._dependencies
+
+
+async def _run_case(
+    case: BenchmarkCase,
+    dataset: Dataset,
+    snapshots: _Snapshots,
+    directory: Path,
+    measurement: Measurement,
+) -> None:
+    """
+    Run a case once, on a fresh copy of the database it needs.
+
+    :param case: The case.
+    :param dataset: The dataset.
+    :param snapshots: The databases of the dataset.
+    :param directory: The empty directory of the run.
+    :param measurement: The measurement of the run.
+    """
+    db_path = directory / "db.sqlite3"
+    match case:
+        case BenchmarkCase.UPSERT_REPOS:
+            await _upsert_repos(dataset, db_path, measurement)
+        case BenchmarkCase.CREATE_DEPENDENCIES:
+            shutil.copyfile(await snapshots.repos(), db_path)
+            await _create_dependencies(dataset, db_path, measurement)
+        case BenchmarkCase.INDEX_REPOS | BenchmarkCase.INDEX_DEPENDENCIES:
+            shutil.copyfile(await snapshots.dependencies(), db_path)
+            await _index(
+                create_repos_index
+                if case == BenchmarkCase.INDEX_REPOS
+                else create_dependencies_index,
+                db_path,
+                measurement,
+            )
+        case BenchmarkCase.DECODE_EVENTS:
+            _decode_events(
+                [
+                    ServerSentEvent(
+                        event="matches",
+                        data=SourceGraphRepoDataListAdapter.dump_json(
+                            list(repos), by_alias=True
+                        ).decode(),
+                    )
+                    for repos in _chunks(dataset.repos, REPOS_PER_EVENT)
+                ],
+                measurement,
+            )
+
+
+async def benchmark_case(
+    case: BenchmarkCase, dataset: Dataset, snapshots: _Snapshots, runs: int
+) -> BenchmarkResult:
+    """
+    Benchmark a case on a dataset.
+
+    :param case: The case.
+    :param dataset: The dataset.
+    :param snapshots: The databases of the dataset.
+    :param runs: The number of the timed runs.
+    :return: The best latency of the timed runs, and the peak memory
+        of an extra traced run.
+    """
+    latencies: list[float] = []
+    for traced in [False] * runs + [True]:
+        measurement = Measurement()
+        with tempfile.TemporaryDirectory() as directory:
+            if traced:
+                tracemalloc.start()
+            try:
+                await _run_case(case, dataset, snapshots, Path(directory), measurement)
+            finally:
+                tracemalloc.stop()
+        if not traced:
+            latencies.append(measurement.latency)
+    return BenchmarkResult(latency=min(latencies), peak_memory=measurement.peak_memory)
+
+
+async def run_suite(
+    cases: Sequence[BenchmarkCase], sizes: Sequence[int], runs: int
+) -> BenchmarkResults:
+    """
+    Run the cases on the datasets of the sizes.
+
+    :param cases: The cases.
+    :param sizes: The numbers of the repos of the datasets.
+    :param runs: The number of the timed runs of each case.
+    :return: The results.
+    """
+    results = BenchmarkResults()
+    for size in sizes:
+        dataset = generate_dataset(size)
+        with tempfile.TemporaryDirectory() as directory:
+            snapshots = _Snapshots(dataset, Path(directory))
+            for case in cases:
+                result = await benchmark_case(case, dataset, snapshots, runs)
+                results.results[f"{case}/{size}"] = result
+                typer.echo(
+                    f"{case:<20} {size:>7} {result.latency * 1000:>10.1f} ms "
+                    f"{result.peak_memory / 2**20:>8.1f} MiB"
+                )
+    return results
+
+
+def find_regressions(
+    results: Mapping[str, BenchmarkResult],
+    baselines: Mapping[str, BenchmarkResult],
+    latency_threshold: float,
+    memory_threshold: float,
+) -> list[str]:
+    """
+    Find the results regressed beyond the thresholds of their baselines.
+
+    The results without a baseline are not compared.
+
+    :param results: The results per ``case/size`` key.
+    :param baselines: The baselines per ``case/size`` key.
+    :param latency_threshold: The relative latency increase to fail on.
+    :param memory_threshold: The relative peak memory increase to fail on.
+    :return: The descriptions of the regressions.
+    """
+    regressions: list[str] = []
+    for key, result in results.items():
+        if (baseline := baselines.get(key)) is None:
+            continue
+        for metric, value, baseline_value, threshold in (
+            ("latency", result.latency, baseline.latency, latency_threshold),
+            (
+                "peak memory",
+                result.peak_memory,
+                baseline.peak_memory,
+                memory_threshold,
+            ),
+        ):
+            if value > baseline_value * (1 + threshold):
+                regressions.append(
+                    f"{key}: the {metric} {value:.4g} exceeds the baseline "
+                    f"{baseline_value:.4g} by more than {threshold:.0%}"
+                )
+    return regressions
+
+
+def _load_baselines(path: Path) -> BenchmarkResults:
+    """
+    Load the baselines, if there are any.
+
+    :param path: The path of the baselines.
+    :return: The baselines, or none if the file does not exist.
+    """
+    try:
+        return BenchmarkResults.model_validate_json(path.read_bytes())
+    except FileNotFoundError:
+        return BenchmarkResults()
+
+
+@app.command()
+def main(
+    cases: Annotated[
+        Optional[  # noqa: UP007 - typer does not support the union syntax
+            list[BenchmarkCase]
+        ],
+        typer.Option(
+            "--case", help="The case to run; repeat for more cases. All by default."
+        ),
+    ] = None,
+    sizes: Annotated[
+        Optional[list[int]],  # noqa: UP007 - typer does not support the union syntax
+        typer.Option(
+            "--size",
+            help="The number of the repos of a dataset; repeat for more datasets. "
+            "1k, 10k and 100k by default.",
+        ),
+    ] = None,
+    runs: Annotated[
+        int, typer.Option(help="The number of the timed runs of each case.")
+    ] = DEFAULT_RUNS,
+    baselines_path: Annotated[
+        Path, typer.Option("--baselines", help="The path of the baselines.")
+    ] = DEFAULT_BASELINES_PATH,
+    update_baselines: Annotated[
+        bool,
+        typer.Option(help="Save the results as the baselines instead of the gate."),
+    ] = False,
+    latency_threshold: Annotated[
+        float, typer.Option(help="The relative latency increase to fail on.")
+    ] = DEFAULT_LATENCY_THRESHOLD,
+    memory_threshold: Annotated[
+        float, typer.Option(help="The relative peak memory increase to fail on.")
+    ] = DEFAULT_MEMORY_THRESHOLD,
+    output: Annotated[
+        Optional[Path],  # noqa: UP007 - typer does not support the union syntax
+        typer.Option(help="The path to save the results to."),
+    ] = None,
+) -> None:
+    """
+    Run the benchmark suite, and fail on the regressions from the baselines.
+
+    :param cases: The cases to run.
+    :param sizes: The numbers of the repos of the datasets.
+    :param runs: The number of the timed runs of each case.
+    :param baselines_path: The path of the baselines.
+    :param update_baselines: Whether to save the results as the baselines.
+    :param latency_threshold: The relative latency increase to fail on.
+    :param memory_threshold: The relative peak memory increase to fail on.
+    :param output: The path to save the results to.
+    """
+    # The per-batch logging would be measured with the cases
+    logger.disable("app")
+    results = asyncio.run(
+        run_suite(cases or list(BenchmarkCase), sizes or DEFAULT_SIZES, runs)
+    )
+    if output is not None:
+        output.write_text(results.model_dump_json(indent=2))
+    baselines = _load_baselines(baselines_path)
+    if update_baselines:
+        baselines.results.update(results.results)
+        baselines.results = dict(sorted(baselines.results.items()))
+        baselines_path.write_text(baselines.model_dump_json(indent=2) + "\n")
+        typer.echo(f"Saved {len(results.results)} baselines to {baselines_path}.")
+        return
+    regressions = find_regressions(
+        results.results, baselines.results, latency_threshold, memory_threshold
+    )
+    for regression in regressions:
+        typer.echo(f"Regression: {regression}", err=True)
+    if regressions:
+        raise typer.Exit(code=1)
+    typer.echo("No regressions from the baselines.")
+
+
+if __name__ == "__main__":
+    app()
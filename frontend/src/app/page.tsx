@@ -1,22 +1,25 @@
 import {
   loadDependenciesIndexServerOnly,
   loadReposIndexServerOnly,
+  loadSearchIndexServerOnly,
 } from "@/lib/indexes";
 import { ReposTable } from "./repos-table";
-import { ReposSearchProvider } from "./repos-search-provider";
 import { DependenciesSearchProvider } from "./dependencies-search-provider";
 
 export default async function Home() {
   const { repos } = await loadReposIndexServerOnly();
   const { dependencies } = await loadDependenciesIndexServerOnly();
+  const searchIndex = await loadSearchIndexServerOnly();
   // refactor repos and dependencies to be loaded from the context
   return (
     <section className="py-10">
-      <ReposSearchProvider repos={repos}>
-        <DependenciesSearchProvider dependencies={dependencies}>
-          <ReposTable repos={repos} dependencies={dependencies} />
-        </DependenciesSearchProvider>
-      </ReposSearchProvider>
+      <DependenciesSearchProvider dependencies={dependencies}>
+        <ReposTable
+          repos={repos}
+          dependencies={dependencies}
+          searchIndex={searchIndex}
+        />
+      </DependenciesSearchProvider>
     </section>
   );
 }
@@ -1,25 +1,45 @@
 "use client";
-import { Repo, Dependency } from "@/lib/schemas";
-import { search } from "@orama/orama";
+import {
+  Repo,
+  Dependency,
+  IndexedDependency,
+  SearchIndex,
+} from "@/lib/schemas";
 import { SearchForm } from "./search-form";
 import { columns } from "./columns";
 import { DataTable } from "./data-table";
-import { useReposOrama } from "@/lib/search";
+import { searchRepoIds } from "@/lib/search-index";
 import { useState } from "react";
 import { useQuerySearchFormData } from "@/lib/hooks";
+import { decodePostings, intersectPostings } from "@/lib/postings";
 import React from "react";
 
 export function ReposTable({
   repos,
   dependencies,
+  searchIndex,
 }: {
   repos: Repo[];
-  dependencies: Dependency[];
+  dependencies: IndexedDependency[];
+  searchIndex: SearchIndex;
 }) {
-  const reposOrama = useReposOrama();
   const [searchedRepos, setSearchedRepos] = useState<Repo[]>(repos);
   const { searchQueryFromQueryParam, dependenciesQueryFromQueryParam } =
     useQuerySearchFormData(dependencies);
+  const postingsByDependencyId = React.useMemo(
+    () =>
+      new Map(
+        dependencies.map((dependency) => [
+          dependency.id,
+          dependency.repo_id_deltas,
+        ]),
+      ),
+    [dependencies],
+  );
+  const reposById = React.useMemo(
+    () => new Map(repos.map((repo) => [repo.id, repo])),
+    [repos],
+  );
 
   const onSearchSubmit = React.useCallback(
     async ({
@@ -29,46 +49,44 @@ export function ReposTable({
       search: string;
       dependencies: Dependency[];
     }) => {
-      if (!reposOrama.isIndexed || !reposOrama.orama) {
-        throw new Error("Repos Orama is not initialized");
+      // The search index is built at the index time, the best match first
+      const searchedRepoIds = searchRepoIds(searchIndex, description);
+      const searchedRepos =
+        searchedRepoIds === null
+          ? repos
+          : searchedRepoIds.flatMap((repoId) => {
+              const repo = reposById.get(repoId);
+              return repo ? [repo] : [];
+            });
+      if (dependencies.length === 0) {
+        setSearchedRepos(searchedRepos);
+        return;
       }
-      const results = await search<Repo>(reposOrama.orama, {
-        term: description,
-        properties: ["description"],
-        limit: repos.length,
-      });
-      const searchedRepos = results.hits.map((hit) => hit.document as Repo);
-      // Workaround because Orama doesn't support filtering by properties of objects in arrays
-      const filteredRepos = searchedRepos.filter((repo) => {
-        return dependencies.every((dependency) => {
-          return repo.dependencies.some(
-            (repoDependency) => repoDependency.id === dependency.id,
-          );
-        });
-      });
-      setSearchedRepos(filteredRepos);
+      // The repos are filtered by the postings lists of the dependencies
+      const matchingRepoIds = new Set(
+        intersectPostings(
+          dependencies.map((dependency) =>
+            decodePostings(postingsByDependencyId.get(dependency.id) ?? []),
+          ),
+        ).map(String),
+      );
+      setSearchedRepos(
+        searchedRepos.filter((repo) => matchingRepoIds.has(repo.id)),
+      );
     },
-    [repos, reposOrama.isIndexed, reposOrama.orama],
+    [postingsByDependencyId, repos, reposById, searchIndex],
   );
 
   const _ref = React.useCallback(
     (node: HTMLDivElement | null) => {
       if (node !== null) {
-        if (reposOrama.isIndexed && reposOrama.orama) {
-          onSearchSubmit({
-            search: searchQueryFromQueryParam(),
-            dependencies: dependenciesQueryFromQueryParam(),
-          });
-        }
+        onSearchSubmit({
+          search: searchQueryFromQueryParam(),
+          dependencies: dependenciesQueryFromQueryParam(),
+        });
       }
     },
-    [
-      dependenciesQueryFromQueryParam,
-      onSearchSubmit,
-      reposOrama.isIndexed,
-      reposOrama.orama,
-      searchQueryFromQueryParam,
-    ],
+    [dependenciesQueryFromQueryParam, onSearchSubmit, searchQueryFromQueryParam],
   );
 
   return (
@@ -2,7 +2,16 @@ import { cache } from "react";
 import "server-only";
 import * as fs from "fs";
 import * as path from "path";
-import { dependenciesIndexSchema, reposIndexSchema } from "./schemas";
+import {
+  compactDependenciesIndexSchema,
+  compactReposIndexSchema,
+  dependenciesIndexSchema,
+  reposIndexSchema,
+  searchIndexSchema,
+  type DependenciesIndex,
+  type Dependency,
+  type RepoIndex,
+} from "./schemas";
 import { ZodError } from "zod";
 
 // TODO: docstrings
@@ -15,13 +24,67 @@ export const DEPENDENCIES_INDEX_FILE_PATH = path.normalize(
   path.join(__dirname, "..", "..", "..", "..", "dependencies_index.json"),
 );
 
+export const SEARCH_INDEX_FILE_PATH = path.normalize(
+  path.join(__dirname, "..", "..", "..", "..", "search_index.json"),
+);
+
 export const preload = () => {
   void loadReposIndexServerOnly();
   void loadDependenciesIndexServerOnly();
+  void loadSearchIndexServerOnly();
 };
 
 // TODO: tests
 
+// The compact indexes are detected by their schema version,
+// the verbose ones have none.
+const isCompactIndex = (indexData: unknown) =>
+  typeof indexData === "object" &&
+  indexData !== null &&
+  "schema_version" in indexData;
+
+const parseReposIndex = async (indexData: unknown): Promise<RepoIndex> => {
+  if (!isCompactIndex(indexData)) {
+    return await reposIndexSchema.parseAsync(indexData);
+  }
+  const { repos } = await compactReposIndexSchema.parseAsync(indexData);
+  const { dependencies } = await loadDependenciesIndexServerOnly();
+  const dependenciesById = new Map<string, Dependency>(
+    dependencies.map((dependency) => [dependency.id, dependency]),
+  );
+  return {
+    repos: repos.map((repo) => ({
+      id: String(repo.i),
+      url: repo.u,
+      description: repo.d,
+      stars: repo.s,
+      source_graph_repo_id: String(repo.g),
+      dependencies: repo.p.flatMap((dependencyId) => {
+        const dependency = dependenciesById.get(String(dependencyId));
+        return dependency ? [dependency] : [];
+      }),
+      last_checked_revision: repo.r,
+    })),
+  };
+};
+
+const parseDependenciesIndex = async (
+  indexData: unknown,
+): Promise<DependenciesIndex> => {
+  if (!isCompactIndex(indexData)) {
+    return await dependenciesIndexSchema.parseAsync(indexData);
+  }
+  const { dependencies } =
+    await compactDependenciesIndexSchema.parseAsync(indexData);
+  return {
+    dependencies: dependencies.map((dependency) => ({
+      id: String(dependency.i),
+      name: dependency.n,
+      repo_id_deltas: dependency.q,
+    })),
+  };
+};
+
 export const loadReposIndexServerOnly = cache(async () => {
   try {
     const indexData = JSON.parse(
@@ -33,7 +96,7 @@ export const loadReposIndexServerOnly = cache(async () => {
         return value;
       },
     );
-    return await reposIndexSchema.parseAsync(indexData);
+    return await parseReposIndex(indexData);
   } catch (err) {
     if (err instanceof ZodError) {
       throw new Error(
@@ -55,7 +118,7 @@ export const loadDependenciesIndexServerOnly = cache(async () => {
         return value;
       },
     );
-    return await dependenciesIndexSchema.parseAsync(indexData);
+    return await parseDependenciesIndex(indexData);
   } catch (err) {
     if (err instanceof ZodError) {
       throw new Error(
@@ -67,3 +130,18 @@ export const loadDependenciesIndexServerOnly = cache(async () => {
     throw new Error(`Failed to load the dependencies index: ${err}`);
   }
 });
+
+export const loadSearchIndexServerOnly = cache(async () => {
+  try {
+    return await searchIndexSchema.parseAsync(
+      JSON.parse(await fs.promises.readFile(SEARCH_INDEX_FILE_PATH, "utf-8")),
+    );
+  } catch (err) {
+    if (err instanceof ZodError) {
+      throw new Error(
+        `Failed to parse the search index: ${JSON.stringify(err.format())}`,
+      );
+    }
+    throw new Error(`Failed to load the search index: ${err}`);
+  }
+});
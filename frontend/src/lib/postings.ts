@@ -0,0 +1,39 @@
+// The postings lists are the sorted ids of the repos depending on
+// a dependency, delta-encoded: the first id followed by the differences
+// between the consecutive ids.
+
+export const decodePostings = (deltas: number[]): number[] => {
+  const ids = new Array<number>(deltas.length);
+  let previous = 0;
+  deltas.forEach((delta, index) => {
+    previous += delta;
+    ids[index] = previous;
+  });
+  return ids;
+};
+
+// Intersect the sorted lists, starting from the shortest one,
+// so the work is bounded by the rarest dependency.
+export const intersectPostings = (lists: number[][]): number[] => {
+  if (lists.length === 0) {
+    return [];
+  }
+  const [shortest, ...rest] = [...lists].sort((a, b) => a.length - b.length);
+  return rest.reduce((intersection, list) => {
+    const result: number[] = [];
+    let i = 0;
+    let j = 0;
+    while (i < intersection.length && j < list.length) {
+      if (intersection[i] === list[j]) {
+        result.push(intersection[i]);
+        i++;
+        j++;
+      } else if (intersection[i] < list[j]) {
+        i++;
+      } else {
+        j++;
+      }
+    }
+    return result;
+  }, shortest);
+};
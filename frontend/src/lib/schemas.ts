@@ -19,11 +19,85 @@ export const reposIndexSchema = z.object({
   repos: z.array(repoSchema),
 });
 
+// The dependencies in the dependencies index have the delta-encoded
+// sorted ids of the repos depending on them.
+export const indexedDependencySchema = dependencySchema.extend({
+  repo_id_deltas: z.array(z.number()).default(() => []),
+});
+
 export const dependenciesIndexSchema = z.object({
-  dependencies: z.array(dependencySchema),
+  dependencies: z.array(indexedDependencySchema),
+});
+
+// The compact indexes have a schema version,
+// and the repos reference the dependencies by their ids.
+export const COMPACT_SCHEMA_VERSION = 2;
+
+export const compactDependencySchema = z.object({
+  i: z.number(),
+  n: z.string(),
+  q: z.array(z.number()).default(() => []),
+});
+
+export const compactRepoSchema = z.object({
+  i: z.number(),
+  u: z.string(),
+  d: z.string(),
+  s: z.number().min(0),
+  g: z.nullable(z.number()),
+  p: z.array(z.number()),
+  r: z.nullable(z.string()),
+});
+
+export const compactReposIndexSchema = z.object({
+  schema_version: z.literal(COMPACT_SCHEMA_VERSION),
+  repos: z.array(compactRepoSchema),
+});
+
+export const compactDependenciesIndexSchema = z.object({
+  schema_version: z.literal(COMPACT_SCHEMA_VERSION),
+  dependencies: z.array(compactDependencySchema),
+});
+
+// The sharded indexes are listed in the manifest,
+// the shard files are named after the hashes of their content.
+export const indexShardSchema = z.object({
+  path: z.string(),
+  count: z.number().min(0),
+  hash: z.string(),
+});
+
+export const shardedIndexSchema = z.object({
+  count: z.number().min(0),
+  shards: z.array(indexShardSchema),
+});
+
+export const indexShardsManifestSchema = z.object({
+  schema_version: z.literal(COMPACT_SCHEMA_VERSION),
+  shard_size: z.number().min(0),
+  repos: shardedIndexSchema,
+  dependencies: shardedIndexSchema,
+});
+
+// The search index of the repo descriptions, built at the index time.
+export const SEARCH_INDEX_SCHEMA_VERSION = 1;
+
+export const searchIndexSchema = z.object({
+  schema_version: z.literal(SEARCH_INDEX_SCHEMA_VERSION),
+  k1: z.number(),
+  b: z.number(),
+  average_length: z.number(),
+  document_id_deltas: z.array(z.number()),
+  norms: z.array(z.number()),
+  terms: z.array(z.string()),
+  posting_deltas: z.array(z.array(z.number())),
+  frequencies: z.array(z.array(z.number())),
 });
 
 export type Dependency = z.infer<typeof dependencySchema>;
+export type IndexedDependency = z.infer<typeof indexedDependencySchema>;
 export type Repo = z.infer<typeof repoSchema>;
 export type RepoIndex = z.infer<typeof reposIndexSchema>;
 export type DependenciesIndex = z.infer<typeof dependenciesIndexSchema>;
+export type IndexShardsManifest = z.infer<typeof indexShardsManifestSchema>;
+export type SearchIndex = z.infer<typeof searchIndexSchema>;
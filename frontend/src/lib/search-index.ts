@@ -0,0 +1,96 @@
+import { decodePostings } from "./postings";
+import type { SearchIndex } from "./schemas";
+
+// The query is tokenised the same way the descriptions are
+// at the index time, see app/search_index.py.
+const STOP_WORDS = new Set([
+  "an",
+  "and",
+  "are",
+  "as",
+  "at",
+  "be",
+  "by",
+  "for",
+  "from",
+  "in",
+  "is",
+  "it",
+  "of",
+  "on",
+  "or",
+  "that",
+  "the",
+  "this",
+  "to",
+  "with",
+]);
+
+export const tokenize = (text: string): string[] => {
+  const tokens = text.normalize("NFKC").toLowerCase().match(/[\p{L}\p{N}]+/gu);
+  return (tokens ?? []).filter(
+    (token) => token.length > 1 && !STOP_WORDS.has(token),
+  );
+};
+
+// Find the range of the terms starting with the prefix
+// in the sorted term dictionary.
+const findTermsWithPrefix = (terms: string[], prefix: string): number[] => {
+  let low = 0;
+  let high = terms.length;
+  while (low < high) {
+    const middle = (low + high) >>> 1;
+    if (terms[middle] < prefix) {
+      low = middle + 1;
+    } else {
+      high = middle;
+    }
+  }
+  const found: number[] = [];
+  for (let i = low; i < terms.length && terms[i].startsWith(prefix); i++) {
+    found.push(i);
+  }
+  return found;
+};
+
+// Rank the repos matching the query with BM25, the best match first.
+// The last term of the query is matched as a prefix, as it may be incomplete.
+// Returns the ids of the repos, or null for an empty query.
+export const searchRepoIds = (
+  searchIndex: SearchIndex,
+  query: string,
+): string[] | null => {
+  const queryTerms = tokenize(query);
+  if (queryTerms.length === 0) {
+    return null;
+  }
+  const documentIds = decodePostings(searchIndex.document_id_deltas);
+  const scores = new Map<number, number>();
+  queryTerms.forEach((queryTerm, queryTermIndex) => {
+    const termIndexes =
+      queryTermIndex === queryTerms.length - 1
+        ? findTermsWithPrefix(searchIndex.terms, queryTerm)
+        : findTermsWithPrefix(searchIndex.terms, queryTerm).filter(
+            (termIndex) => searchIndex.terms[termIndex] === queryTerm,
+          );
+    termIndexes.forEach((termIndex) => {
+      const documents = decodePostings(searchIndex.posting_deltas[termIndex]);
+      const frequencies = searchIndex.frequencies[termIndex];
+      const idf = Math.log(
+        1 +
+          (documentIds.length - documents.length + 0.5) /
+            (documents.length + 0.5),
+      );
+      documents.forEach((document, i) => {
+        const frequency = frequencies[i];
+        const score =
+          (idf * frequency * (searchIndex.k1 + 1)) /
+          (frequency + searchIndex.norms[document]);
+        scores.set(document, (scores.get(document) ?? 0) + score);
+      });
+    });
+  });
+  return [...scores.entries()]
+    .sort(([, a], [, b]) => b - a)
+    .map(([document]) => String(documentIds[document]));
+};
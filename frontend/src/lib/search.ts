@@ -4,7 +4,7 @@ import {
   create,
   insertMultiple,
 } from "@orama/orama";
-import { DependenciesIndex, RepoIndex } from "./schemas";
+import { DependenciesIndex } from "./schemas";
 import { Context, createContext, useContext } from "react";
 
 export interface IOramaContext<
@@ -23,37 +23,6 @@ export function createOramaContext<
   });
 }
 
-export interface ReposOramaParameters extends Partial<OramaProvidedTypes> {
-  Index: { description: string };
-}
-
-export type ReposOrama = Orama<ReposOramaParameters>;
-
-export async function createReposOrama(): Promise<ReposOrama> {
-  const orama = await create({
-    schema: {
-      description: "string",
-    },
-    id: "repos-index",
-  });
-  return orama;
-}
-
-export async function prepareReposOramaIndex(
-  orama: ReposOrama,
-  data: RepoIndex["repos"],
-): Promise<ReposOrama> {
-  await insertMultiple(orama, data, 100);
-  return orama;
-}
-
-export const ReposOramaContext = createOramaContext<ReposOramaParameters>();
-ReposOramaContext.displayName = "ReposOramaContext";
-
-export const useReposOrama = () => {
-  return useContext(ReposOramaContext);
-};
-
 export interface DependenciesOramaParameters
   extends Partial<OramaProvidedTypes> {
   Index: { name: string };